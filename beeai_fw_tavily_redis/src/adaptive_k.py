@@ -0,0 +1,123 @@
+"""How many internal_document_search results to return, from their scores and their size.
+
+A fixed k gives the agent too little context for broad questions and padding for narrow
+ones, and every padded chunk costs prompt tokens and LLM latency. The tools search for up
+to RAG_MAX_K results within a cosine distance of RAG_DISTANCE_THRESHOLD and then:
+
+* cut the ranking at the first large score gap (gap_cutoff): a result whose cosine similarity
+  drops by more than RAG_SCORE_GAP (a fraction) below the result before it, and every result
+  after it, are left out, but RAG_MIN_K results are always kept. Vector mode only: hybrid
+  scores come from the ranks alone (reciprocal rank fusion, see hybrid_search.py), so their
+  gaps tell whether the vector and the text rankings agree, not how relevant a result is.
+  A top result found by both rankings scores about twice the next one, which would always
+  cut the results to RAG_MIN_K. Hybrid results are only limited by the token budget
+* keep the best results that fit in RAG_TOKEN_BUDGET tokens (fit_token_budget), counting the
+  content and the metadata of every result the way the agent receives them
+
+The distances depend on the vector storage: PCA centering and INT8 quantization spread them
+differently than full float32 vectors, so the same threshold keeps more or fewer chunks.
+After changing VECTOR_DATATYPE, VECTOR_DIMS or VECTOR_REDUCTION, pick RAG_DISTANCE_THRESHOLD
+from the distances of the relevant chunks that src/bench_vector_storage.py reports.
+
+Tokens are counted with the tiktoken RAG_TOKEN_ENCODING encoding when tiktoken and the
+encoding are available, otherwise estimated as 4 characters per token.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import math
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+RAG_MAX_K = int(os.getenv("RAG_MAX_K", "8"))  # candidates per search
+RAG_MIN_K = int(os.getenv("RAG_MIN_K", "2"))  # results kept whatever the scores
+RAG_DISTANCE_THRESHOLD = float(os.getenv("RAG_DISTANCE_THRESHOLD", "0.6"))  # largest cosine distance of a vector result
+RAG_SCORE_GAP = float(os.getenv("RAG_SCORE_GAP", "0.15"))  # relative relevance drop that ends the results
+RAG_TOKEN_BUDGET = int(os.getenv("RAG_TOKEN_BUDGET", "1500"))  # tokens per tool call, 0 for no budget
+RAG_TOKEN_ENCODING = os.getenv("RAG_TOKEN_ENCODING", "cl100k_base")
+CHARS_PER_TOKEN = 4
+
+
+def gap_cutoff(
+    results: list[tuple[Document, float]],
+    mode: str,
+    min_k: int = RAG_MIN_K,
+    gap: float = RAG_SCORE_GAP,
+) -> list[tuple[Document, float]]:
+    """The results before the first similarity drop larger than gap, at least min_k of them. Hybrid results are kept as they are."""
+    if mode != "vector":
+        return results
+    for i in range(1, len(results)):
+        previous, current = 1.0 - results[i - 1][1], 1.0 - results[i][1]
+        if previous > 0 and (previous - current) / previous > gap:
+            return results[:max(i, min_k)]
+    return results
+
+
+# =============================================================================
+# TOKEN BUDGET
+# =============================================================================
+
+@functools.cache
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(RAG_TOKEN_ENCODING)
+    except Exception as e:  # not installed, or the encoding cannot be downloaded
+        print(f"Estimating tokens as {CHARS_PER_TOKEN} characters each, the {RAG_TOKEN_ENCODING} encoding is not available: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def result_tokens(doc: Document) -> int:
+    """Tokens of a result as the agent receives it: its content and its metadata."""
+    return count_tokens(doc.page_content) + count_tokens(json.dumps(doc.metadata, default=str))
+
+
+def fit_token_budget(
+    results: list[tuple[Document, float]],
+    budget: int = RAG_TOKEN_BUDGET,
+) -> list[tuple[Document, float, int]]:
+    """The best results that fit in budget tokens, each with its token count. The best result is always kept."""
+    return fit_token_budget_many([results], budget)[0]
+
+
+def fit_token_budget_many(
+    results_per_query: list[list[tuple[Document, float]]],
+    budget: int = RAG_TOKEN_BUDGET,
+) -> list[list[tuple[Document, float, int]]]:
+    """fit_token_budget() for the results of several queries sharing one budget.
+
+    Results are taken rank by rank across the queries (every query's best result first, then
+    every second best, ...), so one query with long results does not crowd out the others.
+    The best result of every query is always kept. A result that does not fit is skipped, a
+    shorter result of a lower rank may still fit.
+    """
+    kept: list[list[tuple[Document, float, int]]] = [[] for _ in results_per_query]
+    used = 0
+    for rank in range(max((len(results) for results in results_per_query), default=0)):
+        for query_index, results in enumerate(results_per_query):
+            if rank >= len(results):
+                continue
+            doc, score = results[rank]
+            tokens = result_tokens(doc)
+            if rank == 0 or not budget or used + tokens <= budget:
+                kept[query_index].append((doc, score, tokens))
+                used += tokens
+    return kept
@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from redis_retriever import internal_document_search
+from redis_retriever import internal_document_multi_search, internal_document_search, retriever_pool
 from beeai_framework.agents.base import BaseAgent
 from beeai_framework.agents.experimental.requirements.requirement import Requirement
 from beeai_framework.agents.experimental import RequirementAgent
@@ -16,7 +16,7 @@ from beeai_framework.agents import AgentExecutionConfig
 from beeai_framework.middleware.trajectory import GlobalTrajectoryMiddleware
 from beeai_framework.agents.experimental.requirements.conditional import ConditionalRequirement
 from beeai_framework.tools.think import ThinkTool, Tool
-from tavily_mcp_tool import Tavily
+from tavily_mcp_tool import Tavily, tavily_cache, tavily_pool
 
 httpx_logger = logging.getLogger("httpx")
 httpx_logger.setLevel(logging.WARNING)
@@ -33,6 +33,7 @@ notes = [
     "You perform better when you use the ThinkTool tool first. Use it to plan your reasoning and determine which other tools to use next.",
     "Use the internal_document_search tool to search internal private documents that are not otherwise accessible.",
     "Use the internal_document_search tool to supplement or validate information you already know or have found elsewhere.",
+    "When a question has several parts, use the internal_document_multi_search tool with one query per part instead of calling internal_document_search several times.",
     "Information from the `internal_document_search` tool takes precedence over any information found using the Tavily tool.",
     "If internal documents do not provide the necessary information to answer the question, you **must** follow up with a Tavily search to ensure full coverage. Do **not** stop at `internal_document_search` if the response would be incomplete.",
     "Information found online by the Tavily tool may not always be reliable. Cross-check with `internal_document_search` when possible.",
@@ -50,6 +51,9 @@ Your response should be:
 # Core function that sets up the agent with memory, tools, requirements, and runs test scenarios
 
 async def main():
+    # Load the embeddings model in the background so the first prompt shows up right away
+    retriever_pool.start_warmup()
+
     # Create memory instance
     memory = UnconstrainedMemory()
 
@@ -149,5 +153,13 @@ async def main():
         except Exception as e:
             print(f"Error: {str(e)}\n")
 
+    cache = tavily_cache.metrics()
+    print(f"Tavily searches: {cache['api_calls']} API calls, {cache['api_calls_saved']} answered from the cache"
+          f" ({cache['saved_seconds']:.1f}s saved)")
+
+    # The async Redis connections of the RAG tool and the Tavily MCP server belong to this event loop
+    await retriever_pool.aclose()
+    await tavily_pool.aclose()
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+# Latency, throughput and cosine drift of the embeddings backends
+#
+# Embeds the example_docs chunks and the labeled questions in benchmarks/internal_docs_queries.json
+# with every EMBEDDINGS_BACKEND (torch, onnx, onnx-int8) in this process. No Redis is needed.
+# The first run exports the ONNX models to EMBEDDINGS_MODEL_DIR, which shows up in load seconds.
+#
+#   uv run src/bench_embedding_backends.py
+#   uv run src/bench_embedding_backends.py --backends torch onnx-int8 --repeat 3 --json embedding_backends.json
+#
+# For every backend it reports:
+# * load seconds, and query latency (p50/p95 of embed_query, one question at a time)
+# * document throughput (chunks/s of embed_documents over the whole corpus)
+# * cosine drift against the torch vectors of the same texts (mean and max of 1 - cosine)
+# * overlap@k: share of the torch top-k that the backend's query vectors return from the torch
+#   document vectors, i.e. how an index ingested with torch answers queries embedded by the backend
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+import numpy as np
+
+from bench_vector_storage import DOCS_PATH, QUERIES_PATH, load_corpus, overlap, top_k
+from embedding_backends import EMBEDDINGS_BACKENDS, load_embeddings
+from retriever_pool import EMBEDDINGS_MODEL_NAME
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q))
+
+
+def cosine_drift(vectors: np.ndarray, baseline: np.ndarray) -> np.ndarray:
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    baseline = baseline / np.maximum(np.linalg.norm(baseline, axis=1, keepdims=True), 1e-12)
+    return np.maximum(1.0 - np.sum(vectors * baseline, axis=1), 0.0)  # no negative rounding noise
+
+
+def run_backend(backend: str, texts: list[str], queries: list[str], repeat: int) -> dict:
+    start = time.perf_counter()
+    embeddings = load_embeddings(EMBEDDINGS_MODEL_NAME, backend)
+    embeddings.embed_query("warm up")
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+    query_vectors = np.asarray([embeddings.embed_query(query) for query in queries], dtype=np.float32)
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        doc_vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        seconds.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "query_p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "query_p95_ms": round(1000 * percentile(latencies, 95), 2),
+        "docs_per_second": round(len(texts) / statistics.median(seconds), 1),
+        "doc_vectors": doc_vectors,
+        "query_vectors": query_vectors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the latency, throughput and drift of the embeddings backends.")
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDINGS_BACKENDS, default=list(EMBEDDINGS_BACKENDS),
+                        help="backends to compare, the torch baseline is always included")
+    parser.add_argument("--docs", default=DOCS_PATH, help=f"documents to embed (default: {DOCS_PATH})")
+    parser.add_argument("--queries", default=QUERIES_PATH, help=f"labeled questions (default: {QUERIES_PATH})")
+    parser.add_argument("-k", type=int, default=4, help="results per query for overlap@k")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the questions and the corpus")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    texts, _documents = load_corpus(args.docs)
+    with open(args.queries) as f:
+        queries = [q["query"] for q in json.load(f)["queries"]]
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+
+    rows = []
+    for backend in backends:
+        print(f"Embedding {len(texts)} chunks and {len(queries)} questions with the {backend} backend...")
+        rows.append(run_backend(backend, texts, queries, args.repeat))
+
+    baseline = rows[0]
+    baseline_results = top_k(baseline["doc_vectors"], baseline["query_vectors"], args.k)
+    for row in rows:
+        drift = np.concatenate([
+            cosine_drift(row["doc_vectors"], baseline["doc_vectors"]),
+            cosine_drift(row["query_vectors"], baseline["query_vectors"]),
+        ])
+        row["drift_mean"] = float(drift.mean())
+        row["drift_max"] = float(drift.max())
+        row["overlap_at_k"] = round(overlap(top_k(baseline["doc_vectors"], row["query_vectors"], args.k), baseline_results), 4)
+        del row["doc_vectors"], row["query_vectors"]
+
+    print()
+    print(f"{len(texts)} chunks, {len(queries)} questions, k={args.k}, {args.repeat} timed passes")
+    print(f"{'backend':<10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'docs/s':>8} {'drift mean':>11} {'drift max':>10} {'overlap@k':>9}")
+    for row in rows:
+        print(f"{row['backend']:<10} {row['load_seconds']:>7.2f} {row['query_p50_ms']:>7.2f} {row['query_p95_ms']:>7.2f}"
+              f" {row['docs_per_second']:>8.1f} {row['drift_mean']:>11.2e} {row['drift_max']:>10.2e} {row['overlap_at_k']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "chunks": len(texts), "queries": len(queries), "repeat": args.repeat, "results": rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
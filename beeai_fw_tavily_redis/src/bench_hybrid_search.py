@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# Hops per answer with vector and hybrid retrieval
+#
+# Runs the labeled questions in benchmarks/internal_docs_queries.json against the internal_docs
+# index (ingest example_docs with src/redis_vector_db.py first) in vector and in hybrid mode.
+#
+#   uv run src/bench_hybrid_search.py
+#   uv run src/bench_hybrid_search.py -k 4 --max-hops 3 --json hybrid_search.json
+#
+# The agent is modelled as reading k results per internal_document_search call and searching
+# again until it sees a chunk with the answer, for at most --max-hops calls. A question whose
+# answer is at rank r therefore costs ceil(r / k) calls. Unanswered questions cost --max-hops.
+# hops/answer is the total number of calls divided by the number of answered questions.
+
+import argparse
+import json
+import math
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from redis_retriever import retriever_pool
+
+QUERIES_PATH = "benchmarks/internal_docs_queries.json"
+
+
+def first_relevant_rank(results: list, question: dict) -> int | None:
+    for rank, (doc, _score) in enumerate(results, start=1):
+        if doc.metadata.get("document") == question["document"] and question["answer"] in doc.page_content:
+            return rank
+    return None
+
+
+def run_mode(retriever, questions: list[dict], mode: str, k: int, max_hops: int) -> dict:
+    hops, ranks, latencies = [], [], []
+    for question in questions:
+        # Distinct k per mode keeps the result cache from answering for the other mode
+        start = time.perf_counter()
+        results = retriever.search(question["query"], k=k * max_hops, distance_threshold=None, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        rank = first_relevant_rank(results, question)
+        ranks.append(rank)
+        hops.append(math.ceil(rank / k) if rank else max_hops)
+
+    answered = [rank for rank in ranks if rank]
+    return {
+        "mode": mode,
+        "answered": len(answered),
+        "answered_first_hop": sum(1 for rank in answered if rank <= k),
+        "hops_per_answer": round(sum(hops) / len(answered), 3) if answered else None,
+        "mrr": round(sum(1 / rank for rank in answered) / len(questions), 4),
+        "p50_ms": round(1000 * statistics.median(latencies), 2),
+        "ranks": {question["query"]: rank for question, rank in zip(questions, ranks)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare hops per answer of vector and hybrid retrieval.")
+    parser.add_argument("--queries", default=QUERIES_PATH, help=f"labeled questions (default: {QUERIES_PATH})")
+    parser.add_argument("-k", type=int, default=4, help="results per search call")
+    parser.add_argument("--max-hops", type=int, default=3, help="search calls before the agent gives up")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        questions = json.load(f)["queries"]
+    retriever = retriever_pool.get()
+    # Load the model before timing anything
+    retriever.vector_store.embeddings.embed_query("warm up")
+
+    rows = [run_mode(retriever, questions, mode, args.k, args.max_hops) for mode in ("vector", "hybrid")]
+
+    print()
+    print(f"{len(questions)} questions, k={args.k}, at most {args.max_hops} searches per question")
+    print(f"{'mode':<8} {'answered':>8} {'1st hop':>8} {'hops/answer':>12} {'MRR':>7} {'p50 ms':>8}")
+    for row in rows:
+        print(f"{row['mode']:<8} {row['answered']:>8} {row['answered_first_hop']:>8}"
+              f" {row['hops_per_answer'] or float('nan'):>12.2f} {row['mrr']:>7.3f} {row['p50_ms']:>8.2f}")
+
+    print()
+    print("Rank of the first relevant chunk (vector -> hybrid):")
+    for question in questions:
+        ranks = [row["ranks"][question["query"]] or "-" for row in rows]
+        print(f"  {ranks[0]!s:>2} -> {ranks[1]!s:<2} {question['query']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "max_hops": args.max_hops, "results": rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+# Retrieval quality and latency of the internal_document_search configurations
+#
+# Runs the labeled questions in benchmarks/internal_docs_queries.json against one or more indexes
+# of example_docs (ingest them with src/redis_vector_db.py first) for every combination of
+# embeddings backend, index, search mode, k and distance threshold.
+#
+#   uv run src/bench_retrieval.py
+#   uv run src/bench_retrieval.py -k 2 4 8 --thresholds 0.6 none --modes vector hybrid
+#   uv run src/bench_retrieval.py --indexes internal_docs internal_docs_hnsw --backends torch onnx-int8 --json retrieval.json
+#   uv run src/bench_retrieval.py -k 8 --adaptive
+#   uv run src/bench_retrieval.py --stores redis local      # Redis vs the in-process index of the same documents
+#
+# To compare index types, ingest the same documents into a second index with other settings, e.g.
+#   VECTOR_ALGORITHM=HNSW uv run src/redis_vector_db.py ingest --index internal_docs_hnsw
+# The storage settings of every index are read from Redis, so its queries are encoded like its documents.
+# --stores local searches the local index of the same name (src/local_vector_index.py) instead, no Redis needed.
+#
+# For every configuration it reports:
+# * recall@k: share of the questions with a relevant chunk in the results
+# * MRR: mean of 1 / rank of the first relevant chunk (0 when there is none)
+# * p50/p95/p99 latency of the query embedding, of the Redis search and of both together
+# * the mean number of results and their mean size in tokens
+#
+# --adaptive adds every configuration once more with the score gap cutoff and the token budget
+# of the tools (adaptive_k.py), with k as the most results. The cutoff only applies to vector
+# mode, so the adaptive hybrid rows are limited by the token budget alone:
+#   uv run src/bench_retrieval.py -k 8 --adaptive --modes vector hybrid
+#
+# The result and query embedding caches of the tool are not used, every search is a cold search.
+# --history appends one JSON line per run to follow the numbers over time.
+
+import argparse
+import json
+import time
+from typing import Callable
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+import numpy as np
+import redis
+
+from adaptive_k import RAG_DISTANCE_THRESHOLD, fit_token_budget, gap_cutoff, result_tokens
+from bench_hybrid_search import QUERIES_PATH, first_relevant_rank
+from embedding_backends import EMBEDDINGS_BACKEND, EMBEDDINGS_BACKENDS, load_embeddings
+from hybrid_search import SEARCH_MODES, hybrid_search
+from index_config import (
+    ConfiguredRedisVectorStore,
+    VectorStorage,
+    VectorTransform,
+    create_vector_store,
+    projection_key,
+    transformed,
+)
+from index_stats import get_index_stats
+from local_vector_index import LocalVectorIndex, local_index_path
+from retriever_pool import EMBEDDINGS_MODEL_NAME, INDEX_NAME, REDIS_URL
+
+
+def threshold(value: str) -> float | None:
+    return None if value.lower() == "none" else float(value)
+
+
+def percentiles(seconds: list[float]) -> dict[str, float]:
+    return {f"p{q}_ms": round(1000 * float(np.percentile(seconds, q)), 2) for q in (50, 95, 99)}
+
+
+def index_storage(client: redis.Redis, index_name: str, model_dims: int) -> VectorStorage:
+    """The VectorStorage an existing index was built with."""
+    field = get_index_stats(client, index_name)["vector_fields"][0]
+    dims = field["dims"] if field["dims"] != model_dims else None
+    defaults = VectorStorage()
+    return VectorStorage(
+        datatype=field["datatype"],
+        dims=dims,
+        reduction="pca" if dims and client.exists(projection_key(index_name)) else "truncate",
+        algorithm=str(field["algorithm"]).upper(),
+        distance_metric=str(field["distance_metric"]).upper(),
+        m=field["m"] or defaults.m,
+        ef_construction=field["ef_construction"] or defaults.ef_construction,
+        ef_runtime=field["ef_runtime"] or defaults.ef_runtime,
+    )
+
+
+def search(vector_store: ConfiguredRedisVectorStore, query: str, embedding: list[float], mode: str, k: int,
+           distance_threshold: float | None) -> list:
+    """The uncached search RAGRetriever.search() runs for an already embedded query."""
+    if mode == "hybrid":
+        return hybrid_search(vector_store, query, embedding, k=k, distance_threshold=distance_threshold)
+    rows = vector_store.index.query(vector_store.vector_query(embedding, k, distance_threshold))
+    return [vector_store.to_scored_document(row) for row in rows]
+
+
+def run_index(
+    embed_query: Callable[[str], list[float]],
+    search_fn: Callable[[str, list[float], str, int, float | None], list],
+    questions: list[dict],
+    configs: list[tuple],
+    repeat: int,
+) -> list[dict]:
+    """Metrics of every (mode, k, threshold, adaptive) configuration on one index with one embeddings backend."""
+    # Embedding does not depend on the search settings: time it once per pass and question
+    embeddings, embed_seconds = [], []
+    for _ in range(repeat):
+        for question in questions:
+            start = time.perf_counter()
+            embedding = embed_query(question["query"])
+            embed_seconds.append(time.perf_counter() - start)
+            embeddings.append(embedding)
+
+    rows = []
+    for mode, k, distance_threshold, adaptive in configs:
+        search_seconds, ranks, returned, tokens = [], [], [], []
+        for i, embedding in enumerate(embeddings):
+            question = questions[i % len(questions)]
+            start = time.perf_counter()
+            results = search_fn(question["query"], embedding, mode, k, distance_threshold)
+            if adaptive:
+                results = [(doc, score) for doc, score, _tokens in fit_token_budget(gap_cutoff(results, mode))]
+            search_seconds.append(time.perf_counter() - start)
+            if i < len(questions):
+                ranks.append(first_relevant_rank(results, question))
+                returned.append(len(results))
+                tokens.append(sum(result_tokens(doc) for doc, _score in results))
+
+        answered = [rank for rank in ranks if rank]
+        rows.append({
+            "mode": mode,
+            "k": k,
+            "distance_threshold": distance_threshold,
+            "adaptive": adaptive,
+            "recall_at_k": round(len(answered) / len(questions), 4),
+            "mrr": round(sum(1 / rank for rank in answered) / len(questions), 4),
+            "mean_results": round(sum(returned) / len(returned), 2),
+            "mean_tokens": round(sum(tokens) / len(tokens), 1),
+            "embed": percentiles(embed_seconds),
+            "search": percentiles(search_seconds),
+            "total": percentiles([e + s for e, s in zip(embed_seconds, search_seconds)]),
+            "ranks": {question["query"]: rank for question, rank in zip(questions, ranks)},
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall, MRR and latency of internal document search configurations.")
+    parser.add_argument("--queries", default=QUERIES_PATH, help=f"labeled questions (default: {QUERIES_PATH})")
+    parser.add_argument("--indexes", nargs="+", default=[INDEX_NAME], help=f"indexes to search (default: {INDEX_NAME})")
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDINGS_BACKENDS, default=[EMBEDDINGS_BACKEND],
+                        help=f"embeddings backends (default: {EMBEDDINGS_BACKEND})")
+    parser.add_argument("--stores", nargs="+", choices=("redis", "local"), default=["redis"],
+                        help="search the Redis index, the local index of the same name or both (default: redis)")
+    parser.add_argument("--modes", nargs="+", choices=SEARCH_MODES, default=["vector"], help="search modes (default: vector)")
+    parser.add_argument("-k", nargs="+", type=int, default=[4], help="results per search (default: 4)")
+    parser.add_argument("--thresholds", nargs="+", type=threshold, default=[RAG_DISTANCE_THRESHOLD, None],
+                        help=f"cosine distance thresholds of vector searches, none for no threshold (default: {RAG_DISTANCE_THRESHOLD} none)")
+    parser.add_argument("--adaptive", action="store_true", help="also run every configuration with the score gap cutoff and the token budget")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the questions")
+    parser.add_argument("--redis-url", default=REDIS_URL, help="Redis server (default: REDIS_URL)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--history", help="also append the results as one JSON line to this file")
+    parser.add_argument("--label", help="name of this run in the JSON output, e.g. a branch or a commit")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        questions = json.load(f)["queries"]
+    client = redis.from_url(args.redis_url) if "redis" in args.stores else None
+    configs = [
+        (mode, k, t, adaptive)
+        for mode in args.modes
+        for k in args.k
+        for t in args.thresholds
+        for adaptive in ([False, True] if args.adaptive else [False])
+    ]
+
+    rows = []
+    for backend in args.backends:
+        start = time.perf_counter()
+        embeddings = load_embeddings(EMBEDDINGS_MODEL_NAME, backend)
+        model_dims = len(embeddings.embed_query("warm up"))
+        print(f"Loaded the {backend} backend in {time.perf_counter() - start:.2f}s.")
+        for index_name in args.indexes:
+            if "local" in args.stores:
+                path = local_index_path(index_name)
+                if not LocalVectorIndex.exists(path):
+                    raise SystemExit(f"There is no local index in {path}. Run: uv run src/local_vector_index.py ingest --index {index_name}")
+                local = LocalVectorIndex.open(path)
+                print(f"Searching the local {index_name} index with {len(configs)} configurations...")
+                search_local = lambda query, embedding, mode, k, t: local.search_many([query], [embedding], k, t, mode)[0]
+                for row in run_index(embeddings.embed_query, search_local, questions, configs, args.repeat):
+                    rows.append({
+                        "backend": backend,
+                        "index": f"{index_name} (local)",
+                        "vector_index": "local/COSINE",
+                        "vector_storage": "float32/full",
+                        **row,
+                    })
+            if client is None:
+                continue
+            try:
+                storage = index_storage(client, index_name, model_dims)
+            except redis.ResponseError:
+                raise SystemExit(f"There is no {index_name} index. Run: uv run src/redis_vector_db.py ingest --index {index_name}")
+            transform = VectorTransform.load(client, index_name, storage)
+            if transform.needs_fit:
+                raise SystemExit(f"No PCA projection is saved for {index_name}. Run: uv run src/redis_vector_db.py reindex --index {index_name}")
+            vector_store = create_vector_store(transformed(embeddings, transform), index_name, client, storage)
+            print(f"Searching {index_name} ({storage.index_label}, {storage.label}) with {len(configs)} configurations...")
+            search_redis = lambda query, embedding, mode, k, t: search(vector_store, query, embedding, mode, k, t)
+            for row in run_index(vector_store.embeddings.embed_query, search_redis, questions, configs, args.repeat):
+                rows.append({
+                    "backend": backend,
+                    "index": index_name,
+                    "vector_index": storage.index_label,
+                    "vector_storage": storage.label,
+                    **row,
+                })
+
+    print()
+    print(f"{len(questions)} questions, {args.repeat} timed passes")
+    print(f"{'backend':<10} {'index':<28} {'mode':<7} {'k':>3} {'thresh':>6} {'adapt':>5} {'recall':>7} {'MRR':>6} {'results':>7} {'tokens':>7}"
+          f" {'embed p50/p95/p99 ms':>22} {'search p50/p95/p99 ms':>23} {'total p95 ms':>12}")
+    for row in rows:
+        embed, search_ms = row["embed"], row["search"]
+        thresh = "none" if row["distance_threshold"] is None else f"{row['distance_threshold']:.2f}"
+        print(f"{row['backend']:<10} {row['index']:<28} {row['mode']:<7} {row['k']:>3} {thresh:>6} {'yes' if row['adaptive'] else 'no':>5}"
+              f" {row['recall_at_k']:>7.3f} {row['mrr']:>6.3f} {row['mean_results']:>7.2f} {row['mean_tokens']:>7.1f}"
+              f" {embed['p50_ms']:>8.2f}/{embed['p95_ms']:.2f}/{embed['p99_ms']:.2f}"
+              f" {search_ms['p50_ms']:>9.2f}/{search_ms['p95_ms']:.2f}/{search_ms['p99_ms']:.2f}"
+              f" {row['total']['p95_ms']:>12.2f}")
+
+    report = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model": EMBEDDINGS_MODEL_NAME,
+        "queries": len(questions),
+        "repeat": args.repeat,
+        "results": rows,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"Results appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+# Cold start of the Tavily MCP server: pinned launch vs npx tavily-mcp@latest
+#
+# Starts the server --repeat times with every launch command and measures the time from the
+# launch until the first search returned (with --search) or until the tools were listed. See
+# src/tavily_server.py for how to pin the server with TAVILY_MCP_COMMAND and TAVILY_MCP_VERSION.
+#
+#   uv run src/bench_tavily_launch.py
+#   uv run src/bench_tavily_launch.py --repeat 10 --search "Python async programming"
+#   uv run src/bench_tavily_launch.py --launch installed="mcp_servers/node_modules/.bin/tavily-mcp" --json launch.json
+#
+# Launches compared by default:
+# * npx-latest: npx -y tavily-mcp@latest, what the tool used to run on every search
+# * configured: TAVILY_MCP_COMMAND / TAVILY_MCP_VERSION from .env, when one of them is set
+#
+# --search runs one search per start, every one uses a Tavily API credit.
+
+import argparse
+import asyncio
+import json
+import shlex
+import statistics
+import time
+
+import numpy as np
+
+from tavily_mcp_tool import Settings
+from tavily_server import LATEST, launch_command, probe, server_params
+
+
+def percentiles(seconds: list[float]) -> dict[str, float]:
+    if not seconds:
+        return {}
+    return {f"p{q}_s": round(float(np.percentile(seconds, q)), 3) for q in (50, 95)}
+
+
+def launch(value: str) -> tuple[str, str]:
+    name, _, command = value.partition("=")
+    if not command:
+        raise argparse.ArgumentTypeError("use NAME=COMMAND")
+    return name, command
+
+
+async def run_launch(name: str, params, repeat: int, search: str | None, timeout: float) -> dict:
+    results = []
+    for run in range(repeat):
+        result = await probe(params, search, timeout)
+        results.append(result)
+        status = f"ready after {result.ready_seconds:.2f}s" if result.ok else f"failed: {result.error}"
+        print(f"{name} run {run + 1}: {status}")
+    ok = [r for r in results if r.ok]
+    return {
+        "launch": name,
+        "command": shlex.join([params.command, *params.args]),
+        "server_version": sorted({r.server_version for r in ok if r.server_version}),
+        "runs": repeat,
+        "failures": len(results) - len(ok),
+        "errors": sorted({r.error for r in results if r.error}),
+        "initialize": percentiles([r.initialize_seconds for r in ok]),
+        "first_search": percentiles([r.first_search_seconds for r in ok if r.first_search_seconds is not None]),
+        "ready": percentiles([r.ready_seconds for r in ok]),
+        "ready_mean_s": round(statistics.mean(r.ready_seconds for r in ok), 3) if ok else None,
+    }
+
+
+def main():
+    settings = Settings()
+    parser = argparse.ArgumentParser(description="Compare the cold start of Tavily MCP server launches.")
+    parser.add_argument("--launch", type=launch, action="append", default=[], metavar="NAME=COMMAND",
+                        help="another server command line to compare, can be repeated")
+    parser.add_argument("--no-defaults", action="store_true", help="only compare the --launch commands")
+    parser.add_argument("--repeat", type=int, default=5, help="cold starts per launch")
+    parser.add_argument("--search", metavar="QUERY", help="time to the first search of QUERY instead of to the tool list")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for each step")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    launches = []
+    if not args.no_defaults:
+        launches.append(("npx-latest", launch_command(version=LATEST)))
+        if settings.TAVILY_MCP_COMMAND or settings.TAVILY_MCP_VERSION:
+            launches.append(("configured", launch_command(settings.TAVILY_MCP_COMMAND, settings.TAVILY_MCP_VERSION)))
+    launches += [(name, launch_command(command)) for name, command in args.launch]
+    if not launches:
+        raise SystemExit("Nothing to compare: set TAVILY_MCP_COMMAND or TAVILY_MCP_VERSION in .env, or pass --launch NAME=COMMAND")
+
+    rows = []
+    for name, argv in launches:
+        params = server_params(settings.TAVILY_API_KEY, shlex.join(argv))
+        rows.append(asyncio.run(run_launch(name, params, args.repeat, args.search, args.timeout)))
+
+    step = "first search" if args.search else "tools listed"
+    print()
+    print(f"{args.repeat} cold starts per launch, time from the launch until the {step}")
+    print(f"{'launch':<14} {'version':<10} {'fail':>4} {'init p50/p95 s':>15} {'ready p50/p95 s':>16}  command")
+    for row in rows:
+        init, ready = row["initialize"], row["ready"]
+        print(f"{row['launch']:<14} {','.join(row['server_version']) or '-':<10} {row['failures']:>4}"
+              f" {init.get('p50_s', float('nan')):>7.2f}/{init.get('p95_s', float('nan')):<7.2f}"
+              f" {ready.get('p50_s', float('nan')):>8.2f}/{ready.get('p95_s', float('nan')):<7.2f}  {row['command']}")
+        for error in row["errors"]:
+            print(f"{'':<14} {error}")
+
+    if args.json:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": args.repeat,
+            "search": bool(args.search),
+            "results": rows,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
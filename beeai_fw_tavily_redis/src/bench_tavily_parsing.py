@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+# Decoding of tavily-search results: the structured decoder vs the text re-parsing it replaced
+#
+# Decodes every payload in benchmarks/tavily_payloads.jsonl (a CallToolResult of the tavily-search
+# MCP tool per line) with both paths and reports their time per payload and where their results differ:
+# * text: the JSONToolOutput of the tool turned into a string, ast.literal_eval, json.loads of the
+#   nested text and parse_search_results() splitting it on "Title:", as TavilySearch.search did
+# * structured: decode_search_result() reading the content blocks of the CallToolResult (tavily_results.py)
+#
+#   uv run src/bench_tavily_parsing.py
+#   uv run src/bench_tavily_parsing.py --repeat 2000 --json parsing.json
+#   uv run src/bench_tavily_parsing.py --record "store count news" "competitor earnings"
+#
+# The payloads in the repo are samples in the text format of tavily-mcp. --record runs real searches
+# (one Tavily API credit each) on the configured server and appends their results as "recorded".
+
+import argparse
+import ast
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+from beeai_framework.tools import JSONToolOutput
+from mcp.types import CallToolResult
+
+from tavily_results import decode_search_result
+
+PAYLOADS_PATH = str(Path(__file__).resolve().parent.parent / "benchmarks" / "tavily_payloads.jsonl")
+
+
+def parse_search_results(text_content: str, query: str) -> Dict[str, Any]:
+    """Parse Tavily text results into structured format (the parser of the tool before tavily_results.py)"""
+    results = []
+    for section in text_content.split("Title:")[1:]:
+        lines = section.strip().split('\n')
+        title = lines[0].strip() if lines else ""
+        url = ""
+        content = ""
+        for i, line in enumerate(lines):
+            if line.startswith("URL:"):
+                url = line.replace("URL:", "").strip()
+            elif line.startswith("Content:"):
+                content = " ".join(line.replace("Content:", "").strip() for line in lines[i:] if line.strip())
+                break
+        if title and url:
+            results.append({"title": title, "url": url, "content": content.strip(), "score": 1.0 - (len(results) * 0.1)})
+    return {"query": query, "results": results, "total_results": len(results)}
+
+
+def text_decode(result: CallToolResult, query: str) -> Dict[str, Any]:
+    """What TavilySearch.search did with the JSONToolOutput of MCPTool.run()."""
+    output = JSONToolOutput(result.content)
+    result_str = str(output)
+    try:
+        try:
+            result_data = ast.literal_eval(result_str)
+        except Exception:
+            result_data = [{"type": "text", "text": result_str}]
+        text_content = str(output)
+        if isinstance(result_data, list) and result_data:
+            first_item = result_data[0]
+            if isinstance(first_item, dict) and "text" in first_item:
+                nested_text = first_item["text"]
+                nested_data = json.loads(nested_text)
+                text_content = nested_text
+                if isinstance(nested_data, list) and nested_data:
+                    nested_item = nested_data[0]
+                    if isinstance(nested_item, dict) and "text" in nested_item:
+                        text_content = nested_item["text"]
+    except Exception:
+        text_content = str(output)
+    return parse_search_results(text_content, query)
+
+
+def percentiles_us(seconds: list[float]) -> dict[str, float]:
+    return {f"p{q}_us": round(1e6 * float(np.percentile(seconds, q)), 1) for q in (50, 95)}
+
+
+def compare(text: Dict[str, Any], structured: Dict[str, Any]) -> list[str]:
+    """How the results of the two decoders differ."""
+    differences = []
+    if text["total_results"] != structured["total_results"]:
+        differences.append(f"{text['total_results']} vs {structured['total_results']} results")
+    for i, (a, b) in enumerate(zip(text["results"], structured["results"])):
+        for key in ("title", "url", "content", "score"):
+            if a[key] != b[key]:
+                differences.append(f"result {i + 1} {key}")
+    return differences
+
+
+async def record(queries: list[str], path: str) -> None:
+    from tavily_mcp_tool import TavilySearch
+
+    async with TavilySearch() as tavily:
+        with open(path, "a") as f:
+            for query in queries:
+                arguments = {"query": query, "max_results": 5, "search_depth": "basic", "topic": "general"}
+                result = await tavily.session.call_tool(tavily.search_tool.name, arguments=arguments)
+                row = {"query": query, "source": "recorded", "arguments": arguments,
+                       "result": result.model_dump(mode="json", exclude_none=True)}
+                f.write(json.dumps(row) + "\n")
+                print(f"Recorded {query!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the structured and the text decoding of tavily-search results.")
+    parser.add_argument("--payloads", default=PAYLOADS_PATH, help=f"recorded results (default: {PAYLOADS_PATH})")
+    parser.add_argument("--repeat", type=int, default=500, help="decodes per payload and decoder")
+    parser.add_argument("--record", nargs="+", metavar="QUERY", help="search the queries and append their results to the payloads")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.record, os.path.abspath(args.payloads)))
+
+    with open(args.payloads) as f:
+        payloads = [json.loads(line) for line in f if line.strip()]
+
+    rows = []
+    for payload in payloads:
+        result = CallToolResult.model_validate(payload["result"])
+        query = payload["query"]
+        row = {"query": query, "source": payload.get("source"), "bytes": len(json.dumps(payload["result"]))}
+        decoded = {}
+        for name, decode in (("text", text_decode), ("structured", decode_search_result)):
+            seconds = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                decoded[name] = decode(result, query)
+                seconds.append(time.perf_counter() - start)
+            row[name] = percentiles_us(seconds)
+            row[f"{name}_results"] = decoded[name]["total_results"]
+        row["scores"] = [r["score"] for r in decoded["structured"]["results"]]
+        row["differences"] = compare(decoded["text"], decoded["structured"])
+        rows.append(row)
+
+    print(f"{len(payloads)} payloads, {args.repeat} decodes each")
+    print(f"{'query':<32} {'source':<9} {'KB':>6} {'text p50/p95 us':>18} {'structured p50/p95 us':>22} {'speedup':>7} {'results':>8}  differences")
+    for row in rows:
+        text, structured = row["text"], row["structured"]
+        speedup = text["p50_us"] / structured["p50_us"] if structured["p50_us"] else float("nan")
+        print(f"{row['query'][:32]:<32} {row['source'] or '-':<9} {row['bytes'] / 1024:>6.1f}"
+              f" {text['p50_us']:>9.1f}/{text['p95_us']:<8.1f} {structured['p50_us']:>12.1f}/{structured['p95_us']:<9.1f}"
+              f" {speedup:>6.1f}x {row['text_results']:>3}/{row['structured_results']:<4}  {', '.join(row['differences']) or 'none'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"repeat": args.repeat, "results": rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
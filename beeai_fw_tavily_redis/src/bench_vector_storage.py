@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# Recall vs memory of the vector storage settings
+#
+# Embeds example_docs and the labeled questions in benchmarks/internal_docs_queries.json once,
+# then applies every VECTOR_DATATYPE / VECTOR_DIMS / VECTOR_REDUCTION combination with the same
+# VectorTransform the ingestion script uses and runs an exact cosine search in-process (what a
+# FLAT index returns). No Redis is needed.
+#
+#   uv run src/bench_vector_storage.py
+#   uv run src/bench_vector_storage.py -k 4 --corpus-size 2000000 --json vector_storage.json
+#   uv run src/bench_vector_storage.py -k 8 --threshold 0.5
+#
+# For every setting it reports:
+# * overlap@k: share of the float32 full-dimension top-k that the setting also returns, over
+#   the labeled questions plus every chunk used as a query
+# * answer@k: share of the labeled questions with a relevant chunk in the top-k
+# * answer@k within the threshold: the same, counting only results within --threshold cosine
+#   distance (default RAG_DISTANCE_THRESHOLD), like the search tools return them
+# * the median and the largest cosine distance of the best relevant chunk of each question.
+#   PCA centering and INT8 quantization shift the distances, so a setting may need another
+#   RAG_DISTANCE_THRESHOLD: one a bit above its largest relevant distance keeps every answer
+# * bytes per vector and the vector memory for --corpus-size chunks (the HNSW graph and the
+#   document text come on top of that)
+
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+import numpy as np
+
+from adaptive_k import RAG_DISTANCE_THRESHOLD
+from doc_ingest import discover_files, prepare_file
+from embedding_backends import load_embeddings
+from index_config import DATATYPES, VectorStorage, VectorTransform
+from retriever_pool import EMBEDDINGS_MODEL_NAME
+
+DOCS_PATH = "example_docs"
+QUERIES_PATH = "benchmarks/internal_docs_queries.json"
+DIMS = [None, 384, 256, 128, 64]
+
+
+def load_corpus(path: str) -> tuple[list[str], list[str]]:
+    texts, documents = [], []
+    for file in discover_files(path):
+        for text in prepare_file(file, None).texts:
+            texts.append(text)
+            documents.append(file)
+    return texts, documents
+
+
+def cosine_distances(docs: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Cosine distance of every query to every doc, computed on the stored (possibly quantized) values like RediSearch does."""
+    docs = docs.astype(np.float64)
+    queries = queries.astype(np.float64)
+    docs /= np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    return 1.0 - queries @ docs.T
+
+
+def top_k(docs: np.ndarray, queries: np.ndarray, k: int, exclude_self: bool = False) -> np.ndarray:
+    """Exact cosine top-k."""
+    distances = cosine_distances(docs, queries)
+    if exclude_self:
+        np.fill_diagonal(distances, np.inf)
+    return np.argsort(distances, axis=1, kind="stable")[:, :k]
+
+
+def overlap(results: np.ndarray, baseline: np.ndarray) -> float:
+    return float(np.mean([len(set(r) & set(b)) / len(b) for r, b in zip(results, baseline)]))
+
+
+def settings() -> list[VectorStorage]:
+    storages = []
+    for datatype in DATATYPES:
+        for dims in DIMS:
+            for reduction in (("truncate",) if dims is None else ("truncate", "pca")):
+                storages.append(VectorStorage(datatype, dims, reduction))
+    return storages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall and memory of the vector storage settings.")
+    parser.add_argument("--docs", default=DOCS_PATH, help=f"documents to index (default: {DOCS_PATH})")
+    parser.add_argument("--queries", default=QUERIES_PATH, help=f"labeled questions (default: {QUERIES_PATH})")
+    parser.add_argument("-k", type=int, default=4, help="results per query")
+    parser.add_argument("--threshold", type=float, default=RAG_DISTANCE_THRESHOLD,
+                        help=f"cosine distance threshold of the search tools (default: RAG_DISTANCE_THRESHOLD, {RAG_DISTANCE_THRESHOLD})")
+    parser.add_argument("--corpus-size", type=int, default=1_000_000, help="chunks to project the vector memory for")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    texts, documents = load_corpus(args.docs)
+    with open(args.queries) as f:
+        labeled = json.load(f)["queries"]
+    print(f"Embedding {len(texts)} chunks and {len(labeled)} questions with {EMBEDDINGS_MODEL_NAME}...")
+    embeddings = load_embeddings(EMBEDDINGS_MODEL_NAME)
+    doc_vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    query_vectors = np.asarray([embeddings.embed_query(q["query"]) for q in labeled], dtype=np.float32)
+    model_dims = doc_vectors.shape[1]
+
+    relevant = [
+        {i for i, (text, document) in enumerate(zip(texts, documents)) if document == q["document"] and q["answer"] in text}
+        for q in labeled
+    ]
+    baseline_queries = top_k(doc_vectors, query_vectors, args.k)
+    baseline_chunks = top_k(doc_vectors, doc_vectors, args.k, exclude_self=True)
+
+    rows = []
+    for storage in settings():
+        transform = VectorTransform(storage)
+        if transform.needs_fit:
+            if len(doc_vectors) < storage.dims:
+                print(f"Skipping {storage.label}: PCA needs at least {storage.dims} chunks, the corpus has {len(doc_vectors)}")
+                continue
+            transform.fit(doc_vectors)
+        docs = transform.transform(doc_vectors)
+        query_distances = cosine_distances(docs, transform.transform(query_vectors))
+        query_results = np.argsort(query_distances, axis=1, kind="stable")[:, :args.k]
+        # Distance of the closest relevant chunk of every question that has one in the corpus
+        relevant_distances = [float(query_distances[q, list(rel)].min()) for q, rel in enumerate(relevant) if rel]
+        chunk_results = top_k(docs, docs, args.k, exclude_self=True)
+        vector_bytes = storage.vector_bytes(model_dims)
+        rows.append({
+            "setting": storage.label,
+            "datatype": storage.datatype,
+            "dims": storage.dims or model_dims,
+            "reduction": storage.reduction if storage.dims else None,
+            "overlap_at_k": round(
+                (overlap(query_results, baseline_queries) * len(labeled) + overlap(chunk_results, baseline_chunks) * len(texts))
+                / (len(labeled) + len(texts)), 4
+            ),
+            "answer_at_k": round(float(np.mean([bool(set(r) & rel) for r, rel in zip(query_results, relevant)])), 4),
+            "answer_at_k_threshold": round(float(np.mean([
+                any(i in rel and query_distances[q, i] <= args.threshold for i in r)
+                for q, (r, rel) in enumerate(zip(query_results, relevant))
+            ])), 4),
+            "relevant_distance_p50": round(float(np.median(relevant_distances)), 4) if relevant_distances else None,
+            "relevant_distance_max": round(max(relevant_distances), 4) if relevant_distances else None,
+            "bytes_per_vector": vector_bytes,
+            "corpus_vector_mb": round(vector_bytes * args.corpus_size / 2**20, 1),
+        })
+
+    print()
+    print(f"k={args.k}, threshold {args.threshold}, {len(texts)} chunks, {len(labeled)} labeled questions,"
+          f" memory for {args.corpus_size:,} chunks")
+    print(f"{'setting':<22} {'overlap@k':>9} {'answer@k':>9} {'<=thresh':>9} {'relevant dist p50/max':>22} {'bytes':>7} {'vector MB':>10}")
+    for row in rows:
+        distances = "-" if row["relevant_distance_p50"] is None else f"{row['relevant_distance_p50']:.3f}/{row['relevant_distance_max']:.3f}"
+        print(f"{row['setting']:<22} {row['overlap_at_k']:>9.3f} {row['answer_at_k']:>9.3f} {row['answer_at_k_threshold']:>9.3f}"
+              f" {distances:>22} {row['bytes_per_vector']:>7} {row['corpus_vector_mb']:>10,.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "threshold": args.threshold, "chunks": len(texts), "queries": len(labeled), "corpus_size": args.corpus_size, "results": rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Small caching building blocks shared by the RAG and search tools.
+
+* LRUCache: bounded, thread-safe, in-process LRU cache with a per-entry time-to-live
+* RedisCacheTier: optional second tier in Redis so several processes share entries
+* CacheStats: hit/miss counters reported by the tools and the health checks
+* normalize_query(): case and whitespace insensitive cache keys for search queries
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+def normalize_query(text: str) -> str:
+    """Case and whitespace insensitive cache key text."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    redis_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+class LRUCache(Generic[V]):
+    """Least recently used cache holding at most max_entries values for at most ttl seconds each."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self._entries[key]
+                self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheTier(Generic[V]):
+    """Shared cache tier stored as plain Redis keys with an expiry.
+
+    Redis errors are logged and treated as misses so a flaky cache never fails a tool call.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        namespace: str,
+        encode: Callable[[V], bytes],
+        decode: Callable[[bytes], V],
+        ttl: float | None = None,
+    ):
+        self.client = client
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> V | None:
+        try:
+            data = self.client.get(self._key(key))
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache read failed: {e}")
+            return None
+        return None if data is None else self.decode(data)
+
+    def get_with_ttl(self, key: str) -> tuple[V | None, float | None]:
+        """The value and the seconds until it expires (None without an expiry), in one round trip."""
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.get(self._key(key))
+        pipeline.pttl(self._key(key))
+        try:
+            data, pttl = pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache read failed: {e}")
+            return None, None
+        if data is None:
+            return None, None
+        return self.decode(data), pttl / 1000 if pttl > 0 else None
+
+    def set(self, key: str, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.client.set(self._key(key), self.encode(value), ex=max(1, int(ttl)) if ttl else None)
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache write failed: {e}")
@@ -0,0 +1,565 @@
+"""Incremental ingestion of markdown documents into the Redis vector store.
+
+A manifest in Redis records a content hash for every ingested file and the ids of the
+chunks each file produced. Chunk ids are derived from the file path and the chunk text,
+so on the next run only new or changed chunks are embedded, and the vectors of removed or
+changed chunks are deleted. Re-indexing costs time in proportion to what changed, not to
+the size of the corpus.
+
+Ingestion streams: a few files at a time are read and split on a thread pool, and chunks
+are embedded and written to Redis in fixed-size batches, so memory use does not grow with
+the number of documents.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from typing import Any, Callable, Iterable, Iterator
+
+import redis
+from langchain_redis import RedisVectorStore
+from langchain_text_splitters import MarkdownHeaderTextSplitter
+from redisvl.redis.utils import array_to_buffer
+
+from index_config import recreate_index
+
+HEADERS_TO_SPLIT_ON = [
+    ("#", "Header_1"),
+    ("##", "Header_2"),
+    ("###", "Header_3"),
+]
+
+
+def make_splitter() -> MarkdownHeaderTextSplitter:
+    return MarkdownHeaderTextSplitter(headers_to_split_on=HEADERS_TO_SPLIT_ON, strip_headers=True)
+
+
+def clean_header(header: str) -> str:
+    """Header text without the leading emoji, so it can be typed in a search filter."""
+    return re.sub(r"^[^\w(]+", "", header).strip()
+
+
+def header_path(headers: dict[str, str]) -> list[str]:
+    """The headers enclosing a chunk, outermost first."""
+    return [clean_header(headers[name]) for _, name in HEADERS_TO_SPLIT_ON if headers.get(name)]
+
+
+def chunk_spans(text: str, chunks: list[str]) -> list[tuple[int, int]]:
+    """Byte offsets (start, end) of every chunk in the file text.
+
+    The splitter strips the header lines and the whitespace around every line, so the lines
+    of a chunk are found one after the other, starting at the end of the previous chunk.
+    """
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        start = end = None
+        for line in chunk.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            found = text.find(line, cursor)
+            if found < 0:
+                continue
+            start = found if start is None else start
+            end = cursor = found + len(line)
+        if start is None:
+            start = end = cursor
+        spans.append((start, end))
+
+    # Character to byte offsets. The offsets never decrease, so each stretch of text is encoded once.
+    byte_offsets = []
+    position = offset = 0
+    for char_offset in [value for span in spans for value in span]:
+        offset += len(text[position:char_offset].encode("utf-8"))
+        position = char_offset
+        byte_offsets.append(offset)
+    return list(zip(byte_offsets[::2], byte_offsets[1::2]))
+
+
+def position_metadata(headers: dict[str, str], index: int, span: tuple[int, int]) -> dict[str, Any]:
+    """Where a chunk sits in its file. Refreshed for every chunk of a changed file."""
+    return {
+        **{name: headers[name] for _, name in HEADERS_TO_SPLIT_ON if name in headers},
+        "header_path": header_path(headers),
+        "chunk_index": index,
+        "byte_start": span[0],
+        "byte_end": span[1],
+    }
+
+
+def chunk_metadata(path: str, position: dict[str, Any], ingested_at: int) -> dict[str, Any]:
+    """Metadata stored with every chunk. document, document_name, header_path and ingested_at are indexed for filtering."""
+    return {
+        "document": path,
+        "document_name": os.path.basename(path),
+        **position,
+        "ingested_at": ingested_at,
+    }
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_ids(path: str, texts: list[str]) -> list[str]:
+    """Stable ids for the chunks of one file.
+
+    The id only depends on the file path and the chunk text (plus a counter for repeated
+    text), so an unchanged chunk keeps its id and its vector when other parts of the file change.
+    """
+    seen: Counter[str] = Counter()
+    ids = []
+    for text in texts:
+        ids.append(content_hash(f"{path}\0{seen[text]}\0{text}".encode("utf-8"))[:32])
+        seen[text] += 1
+    return ids
+
+
+# =============================================================================
+# MANIFEST
+# =============================================================================
+# rag:<index>:manifest:files         hash  path -> file content hash
+# rag:<index>:manifest:chunks:<path> set   chunk ids currently stored for the file
+
+class IngestManifest:
+
+    def __init__(self, client: redis.Redis, index_name: str):
+        self.client = client
+        self.prefix = f"rag:{index_name}:manifest"
+        self.files_key = f"{self.prefix}:files"
+
+    def _chunks_key(self, path: str) -> str:
+        return f"{self.prefix}:chunks:{path}"
+
+    def file_hashes(self) -> dict[str, str]:
+        return {k.decode(): v.decode() for k, v in self.client.hgetall(self.files_key).items()}
+
+    def chunk_ids(self, path: str) -> set[str]:
+        return {member.decode() for member in self.client.smembers(self._chunks_key(path))}
+
+    def save_file(self, path: str, file_hash: str, ids: list[str]) -> None:
+        with self.client.pipeline() as pipe:
+            pipe.hset(self.files_key, path, file_hash)
+            pipe.delete(self._chunks_key(path))
+            if ids:
+                pipe.sadd(self._chunks_key(path), *ids)
+            pipe.execute()
+
+    def remove_file(self, path: str) -> None:
+        with self.client.pipeline() as pipe:
+            pipe.hdel(self.files_key, path)
+            pipe.delete(self._chunks_key(path))
+            pipe.execute()
+
+    def clear(self) -> None:
+        for path in self.file_hashes():
+            self.remove_file(path)
+
+
+# =============================================================================
+# STREAMING INGEST PIPELINE
+# =============================================================================
+# read files -> split into changed chunks -> fixed-size batches -> embed -> write
+#
+# Every stage is a generator, so only one file and a few batches are in memory at a time.
+# Writes run on a background thread fed through a bounded queue: embedding of the next
+# batch overlaps with the Redis pipeline write of the previous one, and when Redis falls
+# behind the embedding stage blocks instead of piling up batches (back-pressure).
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_PENDING_BATCHES = 2
+DEFAULT_FILE_WORKERS = 4
+DEFAULT_INCLUDE = ["*.md"]
+
+
+@dataclass
+class IngestReport:
+    files_total: int = 0
+    bytes_read: int = 0
+    files_added: list[str] = field(default_factory=list)
+    files_changed: list[str] = field(default_factory=list)
+    files_removed: list[str] = field(default_factory=list)
+    files_unchanged: int = 0
+    chunks_added: int = 0
+    chunks_removed: int = 0
+    chunks_unchanged: int = 0
+    batches: int = 0
+    read_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.chunks_added or self.chunks_removed or self.files_removed)
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks_added / self.embed_seconds if self.embed_seconds else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "chunks_per_second": round(self.chunks_per_second, 2)}
+
+    def summary(self) -> str:
+        return (
+            f"{self.files_total} files ({self.bytes_read} bytes): {len(self.files_added)} added, {len(self.files_changed)} changed, "
+            f"{len(self.files_removed)} removed, {self.files_unchanged} unchanged; "
+            f"chunks: {self.chunks_added} embedded, {self.chunks_removed} deleted, "
+            f"{self.chunks_unchanged} unchanged; "
+            f"{self.batches} batches, embed {self.embed_seconds:.2f}s ({self.chunks_per_second:.1f} chunks/s), "
+            f"write {self.write_seconds:.2f}s, total {self.total_seconds:.2f}s"
+        )
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: dict[str, Any]
+
+
+@dataclass
+class FileCommit:
+    """Manifest update for one file, applied once all of its chunks have been written."""
+    path: str
+    file_hash: str
+    ids: list[str]
+    stale_ids: list[str]
+    moved: dict[str, dict[str, Any]] = field(default_factory=dict)  # unchanged chunk id -> new position
+
+
+@dataclass
+class Batch:
+    chunks: list[Chunk] = field(default_factory=list)
+    commits: list[FileCommit] = field(default_factory=list)
+    vectors: list[list[float]] = field(default_factory=list)
+
+
+@dataclass
+class PreparedFile:
+    path: str
+    size: int
+    file_hash: str
+    texts: list[str] | None  # None when the file is unchanged and was not split
+    positions: list[dict[str, Any]] | None = None  # position_metadata() of every chunk
+
+
+def prepare_file(path: str, known_hash: str | None) -> PreparedFile:
+    """Read, hash and (if it changed) split one file. Runs on the file worker threads."""
+    with open(path, "rb") as f:
+        data = f.read()
+    file_hash = content_hash(data)
+    texts = positions = None
+    if file_hash != known_hash:
+        text = data.decode("utf-8")
+        splits = make_splitter().split_text(text)
+        texts = [split.page_content for split in splits]
+        spans = chunk_spans(text, texts)
+        positions = [position_metadata(split.metadata, i, span) for i, (split, span) in enumerate(zip(splits, spans))]
+    return PreparedFile(path, len(data), file_hash, texts, positions)
+
+
+def prepare_files(
+    paths: Iterable[str],
+    known_hashes: dict[str, str],
+    report: IngestReport,
+    workers: int = DEFAULT_FILE_WORKERS,
+) -> Iterator[PreparedFile]:
+    """Read and split files on a thread pool, in input order, with at most 2 * workers files in flight."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-file") as executor:
+        pending: deque[Future[PreparedFile]] = deque()
+        for path in paths:
+            pending.append(executor.submit(prepare_file, path, known_hashes.get(path)))
+            if len(pending) >= 2 * workers:
+                yield _collect(pending.popleft(), report)
+        while pending:
+            yield _collect(pending.popleft(), report)
+
+
+def _collect(future: Future[PreparedFile], report: IngestReport) -> PreparedFile:
+    start = time.perf_counter()
+    prepared = future.result()
+    report.read_seconds += time.perf_counter() - start  # Time the pipeline actually waited on files
+    report.files_total += 1
+    report.bytes_read += prepared.size
+    return prepared
+
+
+def changed_chunks(
+    files: Iterable[PreparedFile],
+    manifest: IngestManifest,
+    known_hashes: dict[str, str],
+    report: IngestReport,
+    ingested_at: int,
+) -> Iterator[Chunk | FileCommit]:
+    """Chunks that need embedding, each file followed by its manifest update."""
+    for prepared in files:
+        path = prepared.path
+        if prepared.texts is None:
+            report.files_unchanged += 1
+            report.chunks_unchanged += len(manifest.chunk_ids(path))
+            continue
+
+        ids = chunk_ids(path, prepared.texts)
+        stored_ids = manifest.chunk_ids(path)
+        new = 0
+        moved = {}
+        for chunk_id, text, position in zip(ids, prepared.texts, prepared.positions):
+            if chunk_id not in stored_ids:
+                new += 1
+                yield Chunk(chunk_id, text, chunk_metadata(path, position, ingested_at))
+            else:
+                # Edits elsewhere in the file shift the ordinal and offsets of unchanged chunks
+                moved[chunk_id] = position
+        stale = list(stored_ids - set(ids))
+        yield FileCommit(path, prepared.file_hash, ids, stale, moved)
+
+        (report.files_changed if path in known_hashes else report.files_added).append(path)
+        report.chunks_added += new
+        report.chunks_removed += len(stale)
+        report.chunks_unchanged += len(ids) - new
+
+
+def batched(items: Iterable[Chunk | FileCommit], batch_size: int) -> Iterator[Batch]:
+    """Group chunks into batches of batch_size. A file commit rides with the batch holding the file's last chunk."""
+    batch = Batch()
+    for item in items:
+        if isinstance(item, FileCommit):
+            batch.commits.append(item)
+            continue
+        if len(batch.chunks) == batch_size:
+            yield batch
+            batch = Batch()
+        batch.chunks.append(item)
+    if batch.chunks or batch.commits:
+        yield batch
+
+
+def embed_batches(
+    batches: Iterable[Batch],
+    embed_fn: Callable[[list[str]], list[list[float]]],
+    report: IngestReport,
+) -> Iterator[Batch]:
+    for batch in batches:
+        if batch.chunks:
+            start = time.perf_counter()
+            batch.vectors = embed_fn([chunk.text for chunk in batch.chunks])
+            report.embed_seconds += time.perf_counter() - start
+        yield batch
+
+
+def to_record(vector_store: RedisVectorStore, text: str, vector: list[float], metadata: dict[str, Any]) -> dict[str, Any]:
+    """Same hash layout as RedisVectorStore.add_texts() so the retriever reads our records unchanged."""
+    config = vector_store.config
+    record = {
+        config.content_field: text,
+        config.embedding_field: (
+            vector if config.storage_type == "json" else array_to_buffer(vector, dtype=config.vector_datatype)
+        ),
+        "_index_name": config.index_name,
+        "_metadata_json": json.dumps(metadata),
+    }
+    for name, value in metadata.items():
+        if value is None:
+            continue
+        record[name] = config.default_tag_separator.join(value) if isinstance(value, list) else value
+    return record
+
+
+class RedisBatchWriter:
+    """Writes embedded batches on a background thread, one Redis pipeline per batch."""
+
+    def __init__(self, vector_store: RedisVectorStore, manifest: IngestManifest, report: IngestReport, max_pending: int):
+        self.vector_store = vector_store
+        self.manifest = manifest
+        self.report = report
+        self.queue: queue.Queue[Batch | None] = queue.Queue(maxsize=max_pending)
+        self.error: BaseException | None = None
+        self.thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+
+    def __enter__(self) -> "RedisBatchWriter":
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None and exc_val is None:
+            raise self.error
+
+    def put(self, batch: Batch) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put(batch)  # Blocks while max_pending batches are waiting
+
+    def _run(self) -> None:
+        while (batch := self.queue.get()) is not None:
+            if self.error is None:
+                try:
+                    self.write(batch)
+                except BaseException as e:
+                    self.error = e  # Keep draining so the producer never blocks forever
+
+    def write(self, batch: Batch) -> None:
+        start = time.perf_counter()
+        config = self.vector_store.config
+        if batch.chunks:
+            records = [to_record(self.vector_store, c.text, v, c.metadata) for c, v in zip(batch.chunks, batch.vectors)]
+            keys = [f"{config.key_prefix}:{c.id}" for c in batch.chunks]
+            self.vector_store.index.load(records, keys=keys, batch_size=len(records))
+        for commit in batch.commits:
+            if commit.stale_ids:
+                self.vector_store.delete(ids=commit.stale_ids)
+            if commit.moved:
+                self.update_positions(commit.moved)
+            self.manifest.save_file(commit.path, commit.file_hash, commit.ids)
+        self.report.write_seconds += time.perf_counter() - start
+        self.report.batches += 1
+
+    def update_positions(self, moved: dict[str, dict[str, Any]]) -> None:
+        """Rewrite the position metadata of unchanged chunks without embedding them again."""
+        config = self.vector_store.config
+        client = self.vector_store.index.client
+        keys = {chunk_id: f"{config.key_prefix}:{chunk_id}" for chunk_id in moved}
+        with client.pipeline(transaction=False) as pipe:
+            for key in keys.values():
+                pipe.hget(key, "_metadata_json")
+            stored = dict(zip(keys, pipe.execute()))
+        with client.pipeline(transaction=False) as pipe:
+            for chunk_id, position in moved.items():
+                if stored[chunk_id] is None:
+                    continue  # deleted outside of the manifest, the next full ingest restores it
+                metadata = {**json.loads(stored[chunk_id]), **position}
+                fields = {
+                    name: config.default_tag_separator.join(value) if isinstance(value, list) else value
+                    for name, value in position.items()
+                }
+                pipe.hset(keys[chunk_id], mapping={**fields, "_metadata_json": json.dumps(metadata)})
+            pipe.execute()
+
+
+def under_root(path: str, root: str) -> bool:
+    """Whether path is root or below it. Both are normalized first, so "docs/a.md" is under "." and "./docs"."""
+    path, root = os.path.abspath(path), os.path.abspath(root)
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:  # paths on different drives
+        return False
+
+
+def track_paths(paths: Iterable[str], seen: set[str]) -> Iterator[str]:
+    """Yield paths, adding each one to seen as it is read."""
+    for path in paths:
+        seen.add(path)
+        yield path
+
+
+def missing_files(known_hashes: dict[str, str], seen_paths: set[str], root: str | None = None) -> list[str]:
+    """The files in the manifest that were not in this ingest's paths, with root set only the ones under root."""
+    missing = set(known_hashes) - seen_paths
+    if root is not None:
+        missing = {path for path in missing if under_root(path, root)}
+    return sorted(missing)
+
+
+def remove_files(
+    paths: Iterable[str],
+    manifest: IngestManifest,
+    delete: Callable[[list[str]], None],
+    report: IngestReport,
+) -> None:
+    """Delete the chunks of paths with delete(ids) and drop the files from the manifest."""
+    for path in paths:
+        stale = list(manifest.chunk_ids(path))
+        if stale:
+            delete(stale)
+        manifest.remove_file(path)
+        report.files_removed.append(path)
+        report.chunks_removed += len(stale)
+
+
+def ingest(
+    vector_store: RedisVectorStore,
+    client: redis.Redis,
+    index_name: str,
+    paths: Iterable[str],
+    full: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_pending_batches: int = DEFAULT_MAX_PENDING_BATCHES,
+    embed_fn: Callable[[list[str]], list[list[float]]] | None = None,
+    file_workers: int = DEFAULT_FILE_WORKERS,
+    root: str | None = None,
+) -> IngestReport:
+    """Bring the index in line with the markdown files in paths.
+
+    Files in the manifest that are no longer in paths are removed from the index. With
+    root set, only files under root are considered, so ingesting one directory leaves the
+    documents from other directories alone.
+
+    With full=True the index, its documents and the manifest are dropped first and every
+    file is embedded again. embed_fn defaults to the vector store's embeddings model.
+    """
+    start = time.perf_counter()
+    manifest = IngestManifest(client, index_name)
+    if full:
+        recreate_index(client, vector_store.index)
+        manifest.clear()
+
+    report = IngestReport()
+    known_hashes = manifest.file_hashes()
+    if not known_hashes and int(vector_store.index.info().get("num_docs", 0)):
+        print(f"WARNING: {index_name} holds vectors that are not in the manifest. Run once with --full to remove duplicates.")
+
+    seen_paths: set[str] = set()
+    files = prepare_files(track_paths(paths, seen_paths), known_hashes, report, workers=file_workers)
+    chunks = changed_chunks(files, manifest, known_hashes, report, ingested_at=int(time.time()))
+    batches = embed_batches(
+        batched(chunks, batch_size), embed_fn or vector_store.embeddings.embed_documents, report
+    )
+    with RedisBatchWriter(vector_store, manifest, report, max_pending_batches) as writer:
+        for batch in batches:
+            writer.put(batch)
+
+    remove_files(
+        missing_files(known_hashes, seen_paths, root), manifest, lambda ids: vector_store.delete(ids=ids), report
+    )
+
+    report.total_seconds = time.perf_counter() - start
+    return report
+
+
+# =============================================================================
+# FILE DISCOVERY AND JOB REPORTS
+# =============================================================================
+
+def discover_files(root: str, include: list[str] | None = None, exclude: list[str] | None = None) -> Iterator[str]:
+    """Walk root recursively and yield the files whose path relative to root matches an include glob and no exclude glob."""
+    include = include or DEFAULT_INCLUDE
+    exclude = exclude or []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            if any(fnmatch(relative, p) or fnmatch(filename, p) for p in include) and not any(
+                fnmatch(relative, p) or fnmatch(filename, p) for p in exclude
+            ):
+                yield os.path.normpath(path)
+
+
+def write_job_report(report_path: str, report: IngestReport, **job: Any) -> dict[str, Any]:
+    """Append one JSON line describing the ingest job, so ingestion performance can be tracked over time."""
+    entry = {"finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **job, **report.to_dict()}
+    with open(report_path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
@@ -0,0 +1,214 @@
+"""Surrounding context for internal_document_search results without another search.
+
+Every chunk stores its ordinal in the document (chunk_index), its byte offsets and its
+header hierarchy (header_path). When the agent asks for context, the retriever loads all
+chunks of each hit document with one filter query, keeps them in a small LRU cache keyed on
+the document and the index version, and replaces each hit with:
+
+* neighbors: the hit and CONTEXT_WINDOW chunks before and after it
+* section: the chunks under the same level 1 and level 2 headers as the hit, at most
+  SECTION_MAX_CHARS characters around it
+
+Text shared by two hits of the same document is returned once.
+"""
+
+import os
+from collections import defaultdict
+from itertools import chain
+from typing import Any
+
+from langchain_core.documents import Document
+from redisvl.index import AsyncSearchIndex
+from redisvl.query import FilterQuery
+from redisvl.query.filter import Tag, Text
+
+from caching import LRUCache
+from index_config import ConfiguredRedisVectorStore
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+CONTEXT_MODES = ("neighbors", "section")
+CONTEXT_WINDOW = int(os.getenv("CONTEXT_WINDOW", "1"))  # chunks on each side of a hit
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "32"))  # documents
+SECTION_MAX_CHARS = int(os.getenv("SECTION_MAX_CHARS", "6000"))
+SECTION_DEPTH = 2  # header levels that define a section
+MAX_DOCUMENT_CHUNKS = 10_000
+
+
+def section_key(chunk: Document) -> tuple[str, ...]:
+    return tuple(chunk.metadata.get("header_path", [])[:SECTION_DEPTH])
+
+
+def neighbor_ordinals(chunks: dict[int, Document], ordinal: int, window: int) -> list[int]:
+    return [i for i in range(ordinal - window, ordinal + window + 1) if i in chunks]
+
+
+def section_ordinals(chunks: dict[int, Document], ordinal: int, max_chars: int = SECTION_MAX_CHARS) -> list[int]:
+    """Chunks of the hit's section, grown one chunk at a time on both sides while they fit in max_chars."""
+    key = section_key(chunks[ordinal])
+    first = last = ordinal
+    size = len(chunks[ordinal].page_content)
+    grown = True
+    while grown:
+        grown = False
+        for candidate in (last + 1, first - 1):
+            chunk = chunks.get(candidate)
+            if chunk is None or section_key(chunk) != key or size + len(chunk.page_content) > max_chars:
+                continue
+            size += len(chunk.page_content)
+            first, last = min(first, candidate), max(last, candidate)
+            grown = True
+    return list(range(first, last + 1))
+
+
+# =============================================================================
+# DOCUMENT CHUNK CACHE
+# =============================================================================
+
+class DocumentChunkCache:
+    """All chunks of recently hit documents, by chunk_index, for expanding search results locally."""
+
+    def __init__(self, vector_store: ConfiguredRedisVectorStore, max_documents: int = CONTEXT_CACHE_SIZE):
+        self.vector_store = vector_store
+        self.cache: LRUCache[dict[int, Document]] = LRUCache(max_entries=max_documents)
+
+    def query(self, document: str) -> FilterQuery:
+        """Every chunk of the document in one query."""
+        config = self.vector_store.config
+        return FilterQuery(
+            filter_expression=(Tag("document") == document) & (Text("_index_name") == config.index_name),
+            return_fields=[config.content_field, "_metadata_json"],
+            num_results=MAX_DOCUMENT_CHUNKS,
+        )
+
+    def to_chunks(self, results: list[dict]) -> dict[int, Document]:
+        """Chunks by chunk_index. Chunks ingested before chunk_index was stored are skipped."""
+        chunks = {}
+        for result in results:
+            chunk = self.vector_store.to_document(result)
+            if "chunk_index" in chunk.metadata:
+                chunks[chunk.metadata["chunk_index"]] = chunk
+        return chunks
+
+    def chunks(self, document: str, index_version: int) -> dict[int, Document]:
+        key = (document, index_version)
+        chunks = self.cache.get(key)
+        if chunks is None:
+            chunks = self.to_chunks(self.vector_store.index.query(self.query(document)))
+            self.cache.set(key, chunks)
+        return chunks
+
+    async def achunks(self, document: str, index_version: int, index: AsyncSearchIndex) -> dict[int, Document]:
+        key = (document, index_version)
+        chunks = self.cache.get(key)
+        if chunks is None:
+            chunks = self.to_chunks(await index.query(self.query(document)))
+            self.cache.set(key, chunks)
+        return chunks
+
+    def expand(
+        self,
+        results: list[tuple[Document, float]],
+        mode: str,
+        index_version: int,
+        window: int = CONTEXT_WINDOW,
+    ) -> list[tuple[Document, float]]:
+        """Replace every hit with its neighbours or its section, keeping the hit's score and rank.
+
+        Hits already covered by the context of a better hit are dropped. Results without a
+        chunk_index (ingested by an older version of the ingestion script) are returned as they are.
+        """
+        return self.expand_many([results], mode, index_version, window)[0]
+
+    def expand_many(
+        self,
+        results_per_query: list[list[tuple[Document, float]]],
+        mode: str,
+        index_version: int,
+        window: int = CONTEXT_WINDOW,
+    ) -> list[list[tuple[Document, float]]]:
+        """expand() for the results of several queries. Text returned for an earlier query is not repeated."""
+        documents = {
+            document: self.chunks(document, index_version) for document in hit_documents(*results_per_query)
+        }
+        covered: dict[str, set[int]] = defaultdict(set)
+        return [expand_results(results, mode, documents, window, covered) for results in results_per_query]
+
+    async def aexpand(
+        self,
+        results: list[tuple[Document, float]],
+        mode: str,
+        index_version: int,
+        index: AsyncSearchIndex,
+        window: int = CONTEXT_WINDOW,
+    ) -> list[tuple[Document, float]]:
+        """expand() that loads uncached documents over an asyncio Redis client."""
+        return (await self.aexpand_many([results], mode, index_version, index, window))[0]
+
+    async def aexpand_many(
+        self,
+        results_per_query: list[list[tuple[Document, float]]],
+        mode: str,
+        index_version: int,
+        index: AsyncSearchIndex,
+        window: int = CONTEXT_WINDOW,
+    ) -> list[list[tuple[Document, float]]]:
+        documents = {
+            document: await self.achunks(document, index_version, index)
+            for document in hit_documents(*results_per_query)
+        }
+        covered: dict[str, set[int]] = defaultdict(set)
+        return [expand_results(results, mode, documents, window, covered) for results in results_per_query]
+
+    def metrics(self) -> dict[str, Any]:
+        return {**self.cache.stats.to_dict(), "documents": len(self.cache)}
+
+
+def hit_documents(*results_per_query: list[tuple[Document, float]]) -> list[str]:
+    """Documents of the hits that can be expanded, in rank order."""
+    documents = []
+    for doc, _score in chain.from_iterable(results_per_query):
+        document = doc.metadata.get("document")
+        if document is not None and "chunk_index" in doc.metadata and document not in documents:
+            documents.append(document)
+    return documents
+
+
+def expand_results(
+    results: list[tuple[Document, float]],
+    mode: str,
+    documents: dict[str, dict[int, Document]],
+    window: int = CONTEXT_WINDOW,
+    covered: dict[str, set[int]] | None = None,
+) -> list[tuple[Document, float]]:
+    """Expanded results. covered (document -> chunk indexes already returned) is updated in place."""
+    if mode not in CONTEXT_MODES:
+        raise ValueError(f"Unsupported context mode {mode!r}, use one of {CONTEXT_MODES}")
+    expanded = []
+    covered = defaultdict(set) if covered is None else covered
+    for doc, score in results:
+        document, ordinal = doc.metadata.get("document"), doc.metadata.get("chunk_index")
+        chunks = documents.get(document, {})
+        if ordinal not in chunks:
+            expanded.append((doc, score))
+            continue
+        if ordinal in covered[document]:
+            continue
+        if mode == "neighbors":
+            ordinals = neighbor_ordinals(chunks, ordinal, window)
+        else:
+            ordinals = section_ordinals(chunks, ordinal)
+        ordinals = [i for i in ordinals if i not in covered[document]]
+        covered[document].update(ordinals)
+        metadata: dict[str, Any] = {
+            **doc.metadata,
+            "context": mode,
+            "chunk_indexes": ordinals,
+            "byte_start": chunks[ordinals[0]].metadata.get("byte_start"),
+            "byte_end": chunks[ordinals[-1]].metadata.get("byte_end"),
+        }
+        text = "\n\n".join(chunks[i].page_content for i in ordinals)
+        expanded.append((Document(id=doc.id, page_content=text, metadata=metadata), score))
+    return expanded
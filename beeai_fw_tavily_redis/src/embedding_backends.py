@@ -0,0 +1,114 @@
+"""Inference backends for the sentence-transformers embeddings model.
+
+On a CPU-only deployment the PyTorch forward pass dominates ingestion and query latency.
+sentence-transformers can run the same model with ONNX Runtime instead:
+
+* torch: the PyTorch model from the Hugging Face cache (the default)
+* onnx: the model exported to ONNX, run with ONNX Runtime
+* onnx-int8: the ONNX model with int8 dynamically quantized weights (ONNX_QUANTIZATION picks
+  the instruction set the quantized kernels target: arm64, avx2, avx512 or avx512_vnni)
+
+The ONNX models are exported once, on first use, to EMBEDDINGS_MODEL_DIR (relative to the
+beeai_fw_tavily_redis directory, whatever the working directory) and loaded from there afterwards. They produce the same 768-dimension vectors as the PyTorch model, so an
+index ingested with one backend can be queried with another. Compare latency, throughput
+and the cosine drift of the backends with src/bench_embedding_backends.py.
+
+The ONNX backends need Optimum and ONNX Runtime: uv pip install "optimum[onnxruntime]"
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+EMBEDDINGS_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch").lower()
+# The agent changes its working directory to src/, so the ingest script and the agent would
+# otherwise export the models to different directories
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+EMBEDDINGS_MODEL_DIR = str(PROJECT_DIR / os.getenv("EMBEDDINGS_MODEL_DIR", "models"))
+ONNX_QUANTIZATION = os.getenv(
+    "ONNX_QUANTIZATION", "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+)
+
+
+def local_model_path(model_name: str) -> str:
+    return os.path.join(EMBEDDINGS_MODEL_DIR, model_name.replace("/", "__"), "onnx")
+
+
+def quantized_file_name(quantization: str = ONNX_QUANTIZATION) -> str:
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def _require_onnx() -> None:
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            f"The ONNX embeddings backends need Optimum and ONNX Runtime ({e}). "
+            'Run: uv pip install "optimum[onnxruntime]" or set EMBEDDINGS_BACKEND=torch'
+        ) from e
+
+
+def export_onnx_model(model_name: str, quantization: str = ONNX_QUANTIZATION, quantize: bool = False) -> str:
+    """Export the model to ONNX (and its int8 variant) under EMBEDDINGS_MODEL_DIR unless already there.
+
+    The export is written to a temporary directory and renamed into place, so a process that
+    finds the directory never reads a half-written model.
+    """
+    _require_onnx()
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = local_model_path(model_name)
+    if not os.path.isdir(path):
+        print(f"Exporting {model_name} to ONNX in {path}...")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(path))
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(staging)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            shutil.rmtree(staging)  # another process finished the same export first
+
+    if quantize and not os.path.exists(os.path.join(path, quantized_file_name(quantization))):
+        print(f"Quantizing the ONNX model of {model_name} to int8 for {quantization}...")
+        export_dynamic_quantized_onnx_model(SentenceTransformer(path, backend="onnx"), quantization, path)
+    return path
+
+
+def model_arguments(model_name: str, backend: str = EMBEDDINGS_BACKEND, threads: int | None = None) -> tuple[str, dict]:
+    """The model path and SentenceTransformer keyword arguments for the backend, exporting the model if needed."""
+    if backend not in EMBEDDINGS_BACKENDS:
+        raise ValueError(f"Unsupported embeddings backend {backend!r}, use one of {EMBEDDINGS_BACKENDS}")
+    if backend == "torch":
+        return model_name, {}
+
+    path = export_onnx_model(model_name, quantize=backend == "onnx-int8")
+    ort_kwargs = {}
+    if threads:
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        ort_kwargs["session_options"] = session_options
+    if backend == "onnx-int8":
+        ort_kwargs["file_name"] = quantized_file_name()
+    return path, {"backend": "onnx", "model_kwargs": ort_kwargs}
+
+
+def load_embeddings(model_name: str, backend: str = EMBEDDINGS_BACKEND, threads: int | None = None) -> "HuggingFaceEmbeddings":
+    """HuggingFaceEmbeddings running the model on the backend. threads limits the ONNX Runtime threads."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    path, model_kwargs = model_arguments(model_name, backend, threads)
+    return HuggingFaceEmbeddings(model_name=path, model_kwargs=model_kwargs)
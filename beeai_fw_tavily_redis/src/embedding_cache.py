@@ -0,0 +1,129 @@
+"""Query embedding cache in front of the embeddings model.
+
+Agents often repeat the same internal_document_search query within a session. Every
+repeat re-runs the embeddings model on CPU, so query vectors are cached by normalized
+query text, in memory and optionally in Redis so several agent processes share them.
+Document embeddings (ingestion) are passed straight through.
+"""
+
+import hashlib
+import os
+from array import array
+
+import redis
+from langchain_core.embeddings import Embeddings
+
+from caching import LRUCache, RedisCacheTier, normalize_query
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))  # ~3 KB per 768-dim vector
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))  # seconds
+EMBEDDING_CACHE_REDIS = os.getenv("EMBEDDING_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+
+
+def embed_queries(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    """Query vectors for several texts with one forward pass of the model.
+
+    HuggingFaceEmbeddings only encodes queries differently from documents when query_encode_kwargs
+    are set, which this repo never does, so the batch goes through embed_documents().
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return embeddings.embed_documents(texts)
+
+
+def _redis_key(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector: array) -> bytes:
+    return vector.tobytes()
+
+
+def _decode_vector(data: bytes) -> array:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that caches embed_query() results.
+
+    Vectors are kept as float32 arrays, which is about 8x smaller than a list of Python floats.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        namespace: str,
+        max_entries: int = EMBEDDING_CACHE_SIZE,
+        ttl: float | None = EMBEDDING_CACHE_TTL,
+        redis_client: redis.Redis | None = None,
+    ):
+        self.embeddings = embeddings
+        self.cache: LRUCache[array] = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.redis_tier: RedisCacheTier[array] | None = None
+        if redis_client is not None:
+            self.redis_tier = RedisCacheTier(
+                redis_client,
+                namespace=f"embedding_cache:{namespace}",
+                encode=_encode_vector,
+                decode=_decode_vector,
+                ttl=ttl,
+            )
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector.tolist()
+
+        redis_key = _redis_key(key)
+        if self.redis_tier is not None:
+            vector = self.redis_tier.get(redis_key)
+            if vector is not None:
+                self.cache.stats.redis_hits += 1
+        if vector is None:
+            vector = array("f", self.embeddings.embed_query(text))
+            if self.redis_tier is not None:
+                self.redis_tier.set(redis_key, vector)
+        self.cache.set(key, vector)
+        return vector.tolist()
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """embed_query() for several queries. The uncached ones are embedded in one batch."""
+        keys = [normalize_query(text) for text in texts]
+        vectors: dict[str, array] = {}
+        missing: dict[str, str] = {}  # cache key -> text to embed
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.cache.get(key)
+            if vector is None and self.redis_tier is not None:
+                vector = self.redis_tier.get(_redis_key(key))
+                if vector is not None:
+                    self.cache.stats.redis_hits += 1
+                    self.cache.set(key, vector)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+
+        if missing:
+            for key, values in zip(missing, embed_queries(self.embeddings, list(missing.values()))):
+                vector = array("f", values)
+                if self.redis_tier is not None:
+                    self.redis_tier.set(_redis_key(key), vector)
+                self.cache.set(key, vector)
+                vectors[key] = vector
+        return [vectors[key].tolist() for key in keys]
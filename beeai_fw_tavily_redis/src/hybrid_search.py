@@ -0,0 +1,147 @@
+"""Hybrid full-text + vector retrieval for internal_document_search.
+
+Vector search ranks exact identifiers (product names, vendors, policy names) poorly because
+the embedding of "Keystone Foods" is not much closer to the one chunk that names the vendor
+than to any other supply chain text. A full-text query ranks those chunks first. Hybrid
+search sends a KNN query and a full-text query for the same question to Redis in one
+pipeline (one round trip) and fuses the two rankings with reciprocal rank fusion (RRF):
+
+    score(chunk) = sum over rankings of 1 / (HYBRID_RRF_K + rank of the chunk)
+
+RRF only uses the ranks, so the vector distances and text scores do not need to be
+comparable. Set RAG_SEARCH_MODE=hybrid to use it in internal_document_search and compare
+the modes on the labeled questions with src/bench_hybrid_search.py.
+"""
+
+import os
+import re
+from collections import defaultdict
+
+from langchain_core.documents import Document
+from redisvl.index import AsyncSearchIndex
+from redisvl.query import BaseQuery, TextQuery
+from redisvl.query.filter import FilterExpression, Text
+
+from index_config import ConfiguredRedisVectorStore
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SEARCH_MODES = ("vector", "hybrid")
+SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "vector").lower()
+HYBRID_TEXT_SCORER = os.getenv("HYBRID_TEXT_SCORER", "BM25")  # BM25STD on Redis 8
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # damps the weight of the top ranks
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "3"))  # results fetched per query, as a multiple of k
+
+# Question words carry no signal for the full-text query. RediSearch drops its own stopwords
+# (and, the, of, ...) but not these.
+STOPWORDS = frozenset("""
+    a an and are as at be but by can could did do does for from had has have how i if in
+    is it its may me might must my of on or our shall should so than that the their them
+    then there these they this to us was we were what when where which who whom why will
+    with would you your
+""".split())
+
+
+def query_terms(text: str) -> list[str]:
+    """Lowercase words of the question without stopwords, in order and without repeats."""
+    terms = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word not in STOPWORDS and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def text_query(
+    vector_store: ConfiguredRedisVectorStore,
+    text: str,
+    num_results: int,
+    filter: FilterExpression | None = None,
+) -> TextQuery | None:
+    """Full-text query that matches any of the question terms, or None if no terms are left."""
+    terms = query_terms(text)
+    if not terms:
+        return None
+    # Same restriction to this index's documents that langchain_redis adds to the vector query
+    index_filter = Text("_index_name") == vector_store.config.index_name
+    return TextQuery(
+        " ".join(terms),
+        text_field_name=vector_store.config.content_field,
+        text_scorer=HYBRID_TEXT_SCORER,
+        filter_expression=index_filter & filter if filter is not None else index_filter,
+        return_fields=vector_store.return_fields,
+        num_results=num_results,
+        stopwords=None,
+    )
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = HYBRID_RRF_K) -> dict[str, float]:
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return scores
+
+
+def hybrid_queries(
+    vector_store: ConfiguredRedisVectorStore,
+    query: str,
+    embedding: list[float],
+    k: int = 4,
+    distance_threshold: float | None = None,
+    filter: FilterExpression | None = None,
+) -> list[BaseQuery]:
+    """The KNN query and, if the question has any terms left, the full-text query."""
+    candidates = k * HYBRID_CANDIDATES
+    queries = [vector_store.vector_query(embedding, candidates, distance_threshold, filter)]
+    text = text_query(vector_store, query, candidates, filter)
+    if text is not None:
+        queries.append(text)
+    return queries
+
+
+def fuse(
+    vector_store: ConfiguredRedisVectorStore,
+    rankings: list[list[dict]],
+    k: int = 4,
+) -> list[tuple[Document, float]]:
+    results = {}
+    for ranking in rankings:
+        for result in ranking:
+            results.setdefault(result["id"], result)
+    scores = reciprocal_rank_fusion([[result["id"] for result in ranking] for ranking in rankings])
+    top = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [(vector_store.to_document(results[key]), scores[key]) for key in top]
+
+
+def hybrid_search(
+    vector_store: ConfiguredRedisVectorStore,
+    query: str,
+    embedding: list[float],
+    k: int = 4,
+    distance_threshold: float | None = None,
+    filter: FilterExpression | None = None,
+) -> list[tuple[Document, float]]:
+    """Top k chunks by fused rank, with their RRF scores (higher is better).
+
+    distance_threshold only limits the vector results; chunks that match the question
+    words are always considered.
+    """
+    queries = hybrid_queries(vector_store, query, embedding, k, distance_threshold, filter)
+    # Both queries travel to Redis in one pipeline
+    return fuse(vector_store, vector_store.index.batch_query(queries), k)
+
+
+async def ahybrid_search(
+    vector_store: ConfiguredRedisVectorStore,
+    index: AsyncSearchIndex,
+    query: str,
+    embedding: list[float],
+    k: int = 4,
+    distance_threshold: float | None = None,
+    filter: FilterExpression | None = None,
+) -> list[tuple[Document, float]]:
+    """hybrid_search() over an asyncio Redis client (see ConfiguredRedisVectorStore.async_index())."""
+    queries = hybrid_queries(vector_store, query, embedding, k, distance_threshold, filter)
+    return fuse(vector_store, await index.batch_query(queries), k)
@@ -0,0 +1,460 @@
+"""Vector index settings shared by the ingestion script and the RAG retriever.
+
+all-mpnet-base-v2 produces 768 float32 components (3 KB) per chunk. For larger corpora the
+index can store smaller vectors instead:
+
+* VECTOR_DATATYPE=FLOAT16 halves the vector memory, INT8 quarters it. INT8 vectors are scaled
+  per vector to the int8 range, which does not change cosine distances beyond rounding.
+* VECTOR_DIMS=N keeps N dimensions, either the first N components (VECTOR_REDUCTION=truncate)
+  or the top N principal components (VECTOR_REDUCTION=pca). The PCA projection is fitted on
+  the documents at ingest time and saved in Redis next to the index, so the retriever projects
+  queries exactly like the documents.
+
+The vector index itself is configured here too: VECTOR_ALGORITHM (FLAT or HNSW), HNSW_M,
+HNSW_EF_CONSTRUCTION, HNSW_EF_RUNTIME and VECTOR_DISTANCE_METRIC. FLAT is an exact search,
+HNSW an approximate one that stays fast on large corpora. EF_RUNTIME trades query latency for
+recall, M and EF_CONSTRUCTION trade memory and build time for recall.
+
+Ingestion and retrieval both build their vector store with create_vector_store() and their
+embeddings with VectorTransform, so the settings only have to be changed in one place.
+Run src/bench_vector_storage.py to compare recall and memory of the settings on example_docs.
+
+migrate_index() applies new index settings to a live index without downtime: it builds a
+second index over the same documents, waits until it is fully indexed and then points the
+index name (a RediSearch alias from then on) at it. Datatype and dimension changes need
+new vectors, so they still need a reindex.
+"""
+
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import redis
+import redis.asyncio
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_redis import RedisConfig, RedisVectorStore
+from redisvl.index import AsyncSearchIndex, SearchIndex
+from redisvl.redis.utils import array_to_buffer, convert_bytes
+from redisvl.schema import IndexSchema
+
+from embedding_cache import embed_queries
+from index_stats import DATATYPE_BYTES, get_index_stats
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+VECTOR_DATATYPE = os.getenv("VECTOR_DATATYPE", "FLOAT32").upper()  # FLOAT32, FLOAT16 or INT8
+VECTOR_DIMS = int(os.getenv("VECTOR_DIMS", "0")) or None  # None keeps every dimension of the model
+VECTOR_REDUCTION = os.getenv("VECTOR_REDUCTION", "truncate").lower()  # truncate or pca
+PCA_SAMPLE_SIZE = int(os.getenv("PCA_SAMPLE_SIZE", "5000"))  # chunks used to fit the projection
+
+VECTOR_ALGORITHM = os.getenv("VECTOR_ALGORITHM", "FLAT").upper()  # FLAT or HNSW
+VECTOR_DISTANCE_METRIC = os.getenv("VECTOR_DISTANCE_METRIC", "COSINE").upper()  # COSINE, IP or L2
+HNSW_M = int(os.getenv("HNSW_M", "16"))  # graph edges per node
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))  # candidates while building
+HNSW_EF_RUNTIME = int(os.getenv("HNSW_EF_RUNTIME", "10"))  # candidates while querying
+
+DATATYPES = ("FLOAT32", "FLOAT16", "INT8")
+REDUCTIONS = ("truncate", "pca")
+ALGORITHMS = ("FLAT", "HNSW")
+DISTANCE_METRICS = ("COSINE", "IP", "L2")
+
+# Field names and tag separator of the langchain_redis default schema, which the index keeps
+CONTENT_FIELD = "text"
+EMBEDDING_FIELD = "embedding"
+TAG_SEPARATOR = "|"
+
+# Metadata fields indexed next to the vector, see doc_ingest.chunk_metadata()
+METADATA_SCHEMA = [
+    {"name": "document", "type": "tag"},
+    {"name": "document_name", "type": "tag"},
+    {"name": "header_path", "type": "tag"},  # every header enclosing the chunk
+    {"name": "ingested_at", "type": "numeric"},  # unix time the chunk was embedded
+]
+
+
+@dataclass(frozen=True)
+class VectorStorage:
+    datatype: str = VECTOR_DATATYPE
+    dims: int | None = VECTOR_DIMS
+    reduction: str = VECTOR_REDUCTION
+    algorithm: str = VECTOR_ALGORITHM
+    distance_metric: str = VECTOR_DISTANCE_METRIC
+    m: int = HNSW_M
+    ef_construction: int = HNSW_EF_CONSTRUCTION
+    ef_runtime: int = HNSW_EF_RUNTIME
+
+    def __post_init__(self):
+        if self.datatype not in DATATYPES:
+            raise ValueError(f"Unsupported vector datatype {self.datatype!r}, use one of {DATATYPES}")
+        if self.reduction not in REDUCTIONS:
+            raise ValueError(f"Unsupported dimension reduction {self.reduction!r}, use one of {REDUCTIONS}")
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported vector index algorithm {self.algorithm!r}, use one of {ALGORITHMS}")
+        if self.distance_metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unsupported distance metric {self.distance_metric!r}, use one of {DISTANCE_METRICS}")
+        if self.datatype == "INT8" and self.distance_metric != "COSINE":
+            raise ValueError("INT8 vectors are scaled per vector, which only preserves COSINE distances")
+
+    @property
+    def label(self) -> str:
+        dims = f"{self.dims}d-{self.reduction}" if self.dims else "full"
+        return f"{self.datatype.lower()}/{dims}"
+
+    @property
+    def index_label(self) -> str:
+        if self.algorithm == "HNSW":
+            params = f"(m={self.m}, ef_construction={self.ef_construction}, ef_runtime={self.ef_runtime})"
+            return f"HNSW{params}/{self.distance_metric}"
+        return f"FLAT/{self.distance_metric}"
+
+    def vector_attrs(self, dims: int) -> dict:
+        attrs = {
+            "dims": dims,
+            "algorithm": self.algorithm.lower(),
+            "datatype": self.datatype.lower(),
+            "distance_metric": self.distance_metric.lower(),
+        }
+        if self.algorithm == "HNSW":
+            attrs.update(m=self.m, ef_construction=self.ef_construction, ef_runtime=self.ef_runtime)
+        return attrs
+
+    def vector_bytes(self, model_dims: int) -> int:
+        return (self.dims or model_dims) * DATATYPE_BYTES[self.datatype]
+
+
+# =============================================================================
+# VECTOR TRANSFORM
+# =============================================================================
+# Turns model embeddings into the vectors stored in (and searched against) the index
+
+def projection_key(index_name: str) -> str:
+    return f"rag:{index_name}:projection"
+
+
+def quantize_int8(vectors: np.ndarray) -> np.ndarray:
+    """Scale every vector so its largest component is +/-127 and round. Cosine distance ignores the scale."""
+    scale = np.abs(vectors).max(axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    return np.rint(vectors / scale * 127).astype(np.int8)
+
+
+class VectorTransform:
+    """Dimension reduction and quantization for one VectorStorage setting."""
+
+    def __init__(self, storage: VectorStorage, mean: np.ndarray | None = None, components: np.ndarray | None = None):
+        self.storage = storage
+        self.mean = mean
+        self.components = components
+
+    @property
+    def is_identity(self) -> bool:
+        return self.storage.datatype == "FLOAT32" and not self.storage.dims
+
+    @property
+    def needs_fit(self) -> bool:
+        return self.storage.reduction == "pca" and bool(self.storage.dims) and self.components is None
+
+    def fit(self, vectors: list[list[float]] | np.ndarray) -> "VectorTransform":
+        """Fit the PCA projection. Needs at least as many sample vectors as kept dimensions."""
+        sample = np.asarray(vectors, dtype=np.float32)
+        dims = self.storage.dims
+        if len(sample) < dims:
+            raise ValueError(f"PCA to {dims} dimensions needs at least {dims} chunks, got {len(sample)}")
+        self.mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = vt[:dims].astype(np.float32)
+        return self
+
+    def transform(self, vectors: list[list[float]] | np.ndarray) -> np.ndarray:
+        """Reduced and quantized vectors, in the dtype the index stores."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.storage.dims:
+            if self.storage.reduction == "pca":
+                if self.components is None:
+                    raise RuntimeError("The PCA projection has not been fitted or loaded")
+                if vectors.shape[-1] != self.components.shape[1]:
+                    raise ValueError(
+                        f"The embeddings have {vectors.shape[-1]} dims, the PCA projection of the index was fitted "
+                        f"on {self.components.shape[1]}. Run: uv run src/redis_vector_db.py reindex"
+                    )
+                vectors = (vectors - self.mean) @ self.components.T
+            else:
+                vectors = vectors[:, :self.storage.dims]
+        if self.storage.datatype == "INT8":
+            return quantize_int8(vectors)
+        return vectors.astype(self.storage.datatype.lower())
+
+    def __call__(self, vectors: list[list[float]]) -> list[list[float]]:
+        if self.is_identity or not vectors:
+            return vectors
+        return self.transform(vectors).tolist()
+
+    def save(self, client: redis.Redis, index_name: str) -> None:
+        if self.components is None:
+            return
+        client.hset(projection_key(index_name), mapping={
+            "mean": self.mean.astype(np.float32).tobytes(),
+            "components": self.components.tobytes(),
+            "dims": self.components.shape[0],
+        })
+
+    @classmethod
+    def load(cls, client: redis.Redis, index_name: str, storage: VectorStorage) -> "VectorTransform":
+        """The transform for storage, with the PCA projection saved for the index if it uses one."""
+        transform = cls(storage)
+        if storage.reduction != "pca" or not storage.dims:
+            return transform
+        mean, components, dims = client.hmget(projection_key(index_name), "mean", "components", "dims")
+        if components is not None and int(dims) == storage.dims:
+            transform.mean = np.frombuffer(mean, dtype=np.float32)
+            transform.components = np.frombuffer(components, dtype=np.float32).reshape(storage.dims, -1)
+        return transform
+
+    @staticmethod
+    def delete(client: redis.Redis, index_name: str) -> None:
+        client.delete(projection_key(index_name))
+
+
+class TransformedEmbeddings(Embeddings):
+    """Applies a VectorTransform to the documents and queries embedded by another model."""
+
+    def __init__(self, embeddings: Embeddings, transform: VectorTransform):
+        self.embeddings = embeddings
+        self.transform = transform
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.transform(self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.transform([self.embeddings.embed_query(text)])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        return self.transform(embed_queries(self.embeddings, texts))
+
+
+def transformed(embeddings: Embeddings, transform: VectorTransform) -> Embeddings:
+    return embeddings if transform.is_identity else TransformedEmbeddings(embeddings, transform)
+
+
+# =============================================================================
+# VECTOR STORE
+# =============================================================================
+
+def build_index_schema(name: str, key_prefix: str, storage: VectorStorage, dims: int) -> IndexSchema:
+    """The langchain_redis default schema with our vector field settings."""
+    return IndexSchema.from_dict({
+        "index": {"name": name, "prefix": f"{key_prefix}:", "storage_type": "hash"},
+        "fields": [
+            {"name": CONTENT_FIELD, "type": "text"},
+            {"name": EMBEDDING_FIELD, "type": "vector", "attrs": storage.vector_attrs(dims)},
+            {"name": "_index_name", "type": "text"},
+            {"name": "_metadata_json", "type": "text"},
+            *[
+                {**field, "attrs": {"separator": TAG_SEPARATOR}} if field["type"] == "tag" else field
+                for field in METADATA_SCHEMA
+            ],
+        ],
+    })
+
+
+class ConfiguredRedisVectorStore(RedisVectorStore):
+    """RedisVectorStore on an index built from our VectorStorage settings.
+
+    langchain_redis has no settings for the HNSW parameters, and always creates the index
+    when it is not in FT._LIST, which would shadow the alias a migrated index is reached by.
+    This store takes a prepared SearchIndex instead and leaves creating it to create_vector_store().
+
+    langchain_redis also always sends float32 query vectors, which RediSearch rejects for a
+    FLOAT16 or INT8 vector field, so query vectors are encoded in the datatype of the index.
+    """
+
+    def __init__(self, embeddings: Embeddings, config: RedisConfig, index: SearchIndex):
+        self.config = config
+        self._embeddings = embeddings
+        self.ttl = None
+        self._index = index
+
+    def _query_builder(self, embedding, *args, **kwargs):
+        if not isinstance(embedding, bytes):
+            embedding = array_to_buffer(embedding, dtype=self.config.vector_datatype)
+        return super()._query_builder(embedding, *args, **kwargs)
+
+    @property
+    def return_fields(self) -> list[str]:
+        """Every field but the vector, which is only needed inside Redis."""
+        return [name for name in self._index.schema.field_names if name != self.config.embedding_field]
+
+    def vector_query(self, embedding: list[float], k: int, distance_threshold: float | None = None, filter=None):
+        """The KNN (or range) query similarity_search_with_score() would run, for batching with other queries."""
+        return self._query_builder(
+            embedding, k=k, distance_threshold=distance_threshold, filter=filter, return_fields=self.return_fields
+        )
+
+    def _build_document_from_result(self, res: dict) -> Document:
+        # The chunk id (the Redis key without the prefix) tells results of different queries apart
+        doc = super()._build_document_from_result(res)
+        if "id" in res:
+            doc.id = res["id"].removeprefix(f"{self.config.key_prefix}:")
+        return doc
+
+    def to_document(self, result: dict) -> Document:
+        return self._build_document_from_result(result)
+
+    def to_scored_document(self, result: dict) -> tuple[Document, float]:
+        """The (document, cosine distance) pair similarity_search_with_score() returns for a vector query result."""
+        return self.to_document(result), float(result.get("vector_distance", 0))
+
+    def async_index(self, client: redis.asyncio.Redis) -> AsyncSearchIndex:
+        """The same index for an asyncio Redis client, to run the queries built here without blocking an event loop."""
+        return AsyncSearchIndex(self._index.schema, redis_client=client)
+
+
+def create_vector_store(
+    embeddings: Embeddings,
+    index_name: str,
+    redis_client: redis.Redis,
+    storage: VectorStorage,
+) -> ConfiguredRedisVectorStore:
+    """Vector store for the index (or the alias of a migrated index), created if it does not exist yet.
+
+    Pass embeddings that are already transformed. Searches go through the index name, so a
+    retriever keeps working when migrate_index() moves the alias to a new index.
+    """
+    dims = storage.dims or len(embeddings.embed_query("The quick brown fox jumps over the lazy dog"))
+    config = RedisConfig(
+        index_name=index_name,  # stored in the _index_name field and used to filter searches
+        key_prefix=index_name,
+        redis_client=redis_client,
+        vector_datatype=storage.datatype,
+        distance_metric=storage.distance_metric,
+        indexing_algorithm=storage.algorithm,
+        embedding_dimensions=dims,
+        content_field=CONTENT_FIELD,
+        embedding_field=EMBEDDING_FIELD,
+        default_tag_separator=TAG_SEPARATOR,
+    )
+    index = SearchIndex(build_index_schema(index_name, index_name, storage, dims), redis_client=redis_client)
+    if resolve_index(redis_client, index_name) is None:
+        index.create()
+    return ConfiguredRedisVectorStore(embeddings, config, index)
+
+
+def storage_mismatch(client: redis.Redis, index_name: str, storage: VectorStorage) -> str | None:
+    """Describe how the vectors or metadata fields of an existing index differ from the settings, or None if they match (or it does not exist)."""
+    try:
+        stats = get_index_stats(client, index_name)
+    except redis.ResponseError:
+        return None
+    missing = [field["name"] for field in METADATA_SCHEMA if field["name"] not in {f["name"] for f in stats["fields"]}]
+    if missing:
+        return f"index {index_name} has no {', '.join(missing)} field"
+    for field in stats["vector_fields"]:
+        if field["datatype"] != storage.datatype or (storage.dims and field["dims"] != storage.dims):
+            return (
+                f"index {index_name} stores {field['dims']}-dim {field['datatype']} vectors"
+                f" but the settings are {storage.label}"
+            )
+    return None
+
+
+def index_mismatch(client: redis.Redis, index_name: str, storage: VectorStorage) -> str | None:
+    """Describe how the vector index algorithm of an existing index differs from the settings, or None."""
+    try:
+        stats = get_index_stats(client, index_name)
+    except redis.ResponseError:
+        return None
+    for field in stats["vector_fields"]:
+        current = VectorStorage(
+            datatype=storage.datatype,
+            dims=storage.dims,
+            reduction=storage.reduction,
+            algorithm=str(field["algorithm"]).upper(),
+            distance_metric=str(field["distance_metric"]).upper(),
+            m=field["m"] or storage.m,
+            ef_construction=field["ef_construction"] or storage.ef_construction,
+            ef_runtime=field["ef_runtime"] or storage.ef_runtime,
+        )
+        if current.index_label != storage.index_label:
+            return f"index {index_name} is {current.index_label} but the settings are {storage.index_label}"
+    return None
+
+
+# =============================================================================
+# INDEX ALIASES AND MIGRATION
+# =============================================================================
+# The first migration turns the index name into an alias of a physical index named
+# <index>__<timestamp>. Documents keep their <index>: key prefix and _index_name value.
+
+def resolve_index(client: redis.Redis, name: str) -> str | None:
+    """The physical index behind an index name or alias, or None if there is none."""
+    if name in convert_bytes(client.execute_command("FT._LIST")):
+        return name
+    try:
+        return convert_bytes(client.ft(name).info())["index_name"]
+    except redis.ResponseError:
+        return None
+
+
+def drop_index(client: redis.Redis, name: str, delete_documents: bool = False) -> None:
+    """Drop the index (the physical index when name is an alias), optionally with its documents."""
+    physical = resolve_index(client, name)
+    if physical is not None:
+        client.execute_command("FT.DROPINDEX", physical, *(["DD"] if delete_documents else []))
+
+
+def recreate_index(client: redis.Redis, index: SearchIndex) -> None:
+    """Drop the index and its documents, then create it again, empty and no longer behind an alias."""
+    drop_index(client, index.name, delete_documents=True)
+    index.create()
+
+
+def wait_until_indexed(client: redis.Redis, name: str, poll_seconds: float = 1.0) -> dict:
+    while True:
+        stats = get_index_stats(client, name)
+        if not stats["indexing"] and (stats["percent_indexed"] is None or stats["percent_indexed"] >= 1):
+            return stats
+        print(f"{name}: {100 * (stats['percent_indexed'] or 0):.0f}% indexed, {stats['num_docs']} documents")
+        time.sleep(poll_seconds)
+
+
+def migrate_index(client: redis.Redis, index_name: str, storage: VectorStorage) -> str:
+    """Rebuild index_name with the index settings of storage without downtime. Returns the new physical index name.
+
+    The new index covers the same key prefix, so RediSearch indexes the stored vectors again
+    in the background while the old index keeps serving searches. Once it is complete the
+    alias is switched and the old index is dropped (its documents are kept) in one transaction.
+    """
+    old = resolve_index(client, index_name)
+    if old is None:
+        raise ValueError(f"There is no {index_name} index to migrate")
+    mismatch = storage_mismatch(client, index_name, storage)
+    if mismatch:
+        raise ValueError(f"The {mismatch}. Changing the vectors needs a reindex, not a migration.")
+    old_stats = get_index_stats(client, old)
+    dims = old_stats["vector_fields"][0]["dims"]
+
+    new = f"{index_name}__{time.strftime('%Y%m%d%H%M%S')}"
+    print(f"Building {new} ({storage.index_label}) next to {old}...")
+    SearchIndex(build_index_schema(new, index_name, storage, dims), redis_client=client).create()
+    new_stats = wait_until_indexed(client, new)
+    if new_stats["num_docs"] < old_stats["num_docs"]:
+        client.execute_command("FT.DROPINDEX", new)
+        raise RuntimeError(
+            f"{new} indexed {new_stats['num_docs']} documents but {old} has {old_stats['num_docs']}; kept {old}"
+        )
+
+    pipe = client.pipeline(transaction=True)
+    if old == index_name:
+        # The index name is still a physical index: drop it first so the alias can take its name
+        pipe.execute_command("FT.DROPINDEX", old)
+        pipe.execute_command("FT.ALIASADD", index_name, new)
+    else:
+        pipe.execute_command("FT.ALIASUPDATE", index_name, new)
+        pipe.execute_command("FT.DROPINDEX", old)
+    pipe.execute()
+    print(f"{index_name} now points to {new} ({new_stats['num_docs']} documents); dropped {old}")
+    return new
@@ -0,0 +1,129 @@
+"""In-process statistics for a RediSearch vector index.
+
+Replaces shelling out to the rvl CLI, which started a new Python interpreter and imported
+redisvl for every command. Everything here comes from one FT.INFO round trip on the Redis
+client the caller already has (plus FT._LIST when listing indexes).
+"""
+
+from typing import Any
+
+import redis
+from redisvl.redis.utils import convert_bytes
+
+# Bytes per vector component for each RediSearch vector data type
+DATATYPE_BYTES = {"FLOAT64": 8, "FLOAT32": 4, "FLOAT16": 2, "BFLOAT16": 2, "INT8": 1, "UINT8": 1}
+
+# FT.INFO attribute options that are followed by a value; any other option is a flag
+_VALUED_OPTIONS = {
+    "identifier", "attribute", "type", "weight", "separator", "algorithm", "data_type", "dim",
+    "distance_metric", "m", "ef_construction", "ef_runtime", "epsilon", "block_size", "phonetic",
+}
+
+_MEMORY_FIELDS = {
+    "inverted_sz_mb": "inverted_index",
+    "vector_index_sz_mb": "vector_index",
+    "offset_vectors_sz_mb": "offset_vectors",
+    "doc_table_size_mb": "doc_table",
+    "sortable_values_size_mb": "sortable_values",
+    "key_table_size_mb": "key_table",
+    "tag_overhead_sz_mb": "tag_overhead",
+    "text_overhead_sz_mb": "text_overhead",
+    "total_index_memory_sz_mb": "total",
+}
+
+
+def _number(value: Any) -> float | int | None:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def _pairs(values: list) -> dict[str, Any]:
+    """FT.INFO returns flat [key, value, key, value, ...] lists."""
+    return {str(values[i]): values[i + 1] for i in range(0, len(values) - 1, 2)}
+
+
+def _parse_attribute(tokens: list) -> dict[str, Any]:
+    attribute: dict[str, Any] = {"flags": []}
+    i = 0
+    while i < len(tokens):
+        option = str(tokens[i]).lower()
+        if option in _VALUED_OPTIONS and i + 1 < len(tokens):
+            value = tokens[i + 1]
+            attribute[option] = _number(value) if option in ("dim", "m", "ef_construction", "ef_runtime") else value
+            i += 2
+        else:
+            attribute["flags"].append(str(tokens[i]))
+            i += 1
+    return attribute
+
+
+def list_indexes(client: redis.Redis) -> list[str]:
+    return sorted(convert_bytes(client.execute_command("FT._LIST")))
+
+
+def get_index_stats(client: redis.Redis, index_name: str) -> dict[str, Any]:
+    """Document count, memory, indexing progress and per-field details of the index (or alias).
+
+    Raises redis.ResponseError when the index does not exist.
+    """
+    info = convert_bytes(client.ft(index_name).info())
+    if isinstance(info, list):
+        info = _pairs(info)
+
+    num_docs = _number(info.get("num_docs")) or 0
+    fields = [_parse_attribute(a) for a in info.get("attributes", [])]
+    vector_fields = []
+    for field in fields:
+        if str(field.get("type", "")).upper() != "VECTOR":
+            continue
+        datatype = str(field.get("data_type", "FLOAT32")).upper()
+        dims = field.get("dim") or 0
+        vector_fields.append({
+            "name": field.get("attribute"),
+            "algorithm": field.get("algorithm"),
+            "datatype": datatype,
+            "dims": dims,
+            "distance_metric": field.get("distance_metric"),
+            "m": field.get("m"),
+            "ef_construction": field.get("ef_construction"),
+            "ef_runtime": field.get("ef_runtime"),
+            "vector_bytes": num_docs * dims * DATATYPE_BYTES.get(datatype, 4),
+        })
+
+    field_errors = {}
+    for stat in info.get("field statistics", []) or []:
+        stat = _pairs(stat) if isinstance(stat, list) else stat
+        errors = stat.get("Index Errors", [])
+        errors = _pairs(errors) if isinstance(errors, list) else errors
+        field_errors[stat.get("attribute")] = _number(errors.get("indexing failures")) or 0
+
+    definition = info.get("index_definition", [])
+    definition = _pairs(definition) if isinstance(definition, list) else definition
+
+    return {
+        "index_name": info.get("index_name", index_name),
+        "prefixes": definition.get("prefixes", []),
+        "storage_type": definition.get("key_type"),
+        "num_docs": num_docs,
+        "num_records": _number(info.get("num_records")),
+        "num_terms": _number(info.get("num_terms")),
+        "indexing": bool(_number(info.get("indexing"))),
+        "percent_indexed": _number(info.get("percent_indexed")),
+        "hash_indexing_failures": _number(info.get("hash_indexing_failures")),
+        "memory_mb": {
+            name: _number(info[key]) for key, name in _MEMORY_FIELDS.items() if key in info
+        },
+        "vector_fields": vector_fields,
+        "fields": [
+            {
+                "name": f.get("attribute"),
+                "type": f.get("type"),
+                "flags": f["flags"],
+                "indexing_failures": field_errors.get(f.get("attribute"), 0),
+            }
+            for f in fields
+        ],
+    }
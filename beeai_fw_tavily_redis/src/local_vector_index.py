@@ -0,0 +1,631 @@
+#!/usr/bin/env python
+
+"""In-process vector index for the internal document search, for when there is no Redis.
+
+Dev boxes, CI jobs and edge deployments often have no Redis Stack. With RAG_BACKEND=local
+(or RAG_BACKEND=auto and a Redis that does not answer) the search tools use a
+LocalRAGRetriever instead of a RAGRetriever. It has the same search methods, filters,
+context modes, adaptive k and result cache, and searches an index kept in a directory:
+
+    LOCAL_INDEX_DIR/<index>/manifest.json        current version, model, ingest manifest
+    LOCAL_INDEX_DIR/<index>/vectors-<version>.npy  float32 unit vectors, one row per chunk
+    LOCAL_INDEX_DIR/<index>/chunks-<version>.json  id, text and metadata of every chunk
+
+A relative LOCAL_INDEX_DIR is relative to the beeai_fw_tavily_redis directory, so the ingest
+script and the agent (which runs from src/) use the same index.
+
+The vectors are memory-mapped, so opening an index only parses the chunk texts and the OS
+pages vectors in as searches touch them. A search is one matrix-vector product (exact
+cosine distances, like a FLAT index), and hybrid mode fuses it with a BM25 ranking of the
+question words computed in-process. For a small corpus this is faster than a round trip
+to Redis.
+
+The index is filled by the same reading, splitting, change detection and batching as the
+Redis ingestion (doc_ingest.py). An ingest writes new version files and then switches
+manifest.json, so a running retriever never reads a half-written index and picks up the
+new version on its next search.
+
+    uv run src/local_vector_index.py ingest [DOCS_DIR]
+    uv run src/local_vector_index.py reindex
+    uv run src/local_vector_index.py stats
+    uv run src/local_vector_index.py query "What is our target market for the pilot?" --mode hybrid
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file, like the agent does, so ingest and search use the same settings
+load_dotenv()
+
+import numpy as np
+from langchain_core.documents import Document
+
+from adaptive_k import RAG_DISTANCE_THRESHOLD, gap_cutoff
+from doc_ingest import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FILE_WORKERS,
+    DEFAULT_INCLUDE,
+    IngestReport,
+    batched,
+    changed_chunks,
+    discover_files,
+    embed_batches,
+    missing_files,
+    prepare_files,
+    remove_files,
+    track_paths,
+    write_job_report,
+)
+from document_cache import CONTEXT_MODES, CONTEXT_WINDOW, expand_results, hit_documents
+from embedding_backends import EMBEDDINGS_BACKEND, load_embeddings
+from embedding_cache import embed_queries
+from hybrid_search import HYBRID_CANDIDATES, SEARCH_MODE, SEARCH_MODES, query_terms, reciprocal_rank_fusion
+from multi_query import dedupe
+from result_cache import SearchResultCache
+from retriever_pool import EMBEDDINGS_MODEL_NAME, INDEX_NAME, RetrieverPool
+from search_filter import SearchFilter
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+LOCAL_INDEX_DIR = str(PROJECT_DIR / os.getenv("LOCAL_INDEX_DIR", "local_index"))
+DOCS_PATH = "example_docs"
+JOB_REPORT_PATH = "ingest_jobs.jsonl"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def local_index_path(index_name: str = INDEX_NAME, root: str = LOCAL_INDEX_DIR) -> str:
+    return os.path.join(root, index_name)
+
+
+def unit_vectors(vectors: list[list[float]] | np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def words(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+# =============================================================================
+# LOCAL VECTOR INDEX
+# =============================================================================
+
+class LocalVectorIndex:
+    """Chunk vectors, texts and metadata of one index, searched with NumPy.
+
+    Also implements the doc_ingest.IngestManifest methods, so the Redis ingestion pipeline
+    stages can detect changed files against it. Changes stay in memory until save().
+    """
+
+    def __init__(self, path: str, manifest: dict[str, Any] | None = None, vectors: np.ndarray | None = None,
+                 chunks: list[dict[str, Any]] | None = None):
+        self.path = path
+        self.manifest = manifest or {"version": 0, "model_name": None, "dims": None, "files": {}, "chunks": {}}
+        self.vectors = vectors if vectors is not None else np.zeros((0, self.manifest["dims"] or 0), dtype=np.float32)
+        self.chunks = chunks or []
+        self._pending: list[np.ndarray] = []
+        self._reindex()
+
+    @staticmethod
+    def manifest_path(path: str) -> str:
+        return os.path.join(path, "manifest.json")
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(cls.manifest_path(path))
+
+    @classmethod
+    def open(cls, path: str) -> "LocalVectorIndex":
+        """The saved index in path (an empty one if there is none), with its vectors memory-mapped."""
+        if not cls.exists(path):
+            return cls(path)
+        with open(cls.manifest_path(path)) as f:
+            manifest = json.load(f)
+        version = manifest["version"]
+        with open(os.path.join(path, f"chunks-{version}.json")) as f:
+            chunks = json.load(f)
+        vectors = np.load(os.path.join(path, f"vectors-{version}.npy"), mmap_mode="r") if chunks else None
+        return cls(path, manifest, vectors, chunks)
+
+    def _reindex(self) -> None:
+        self.rows = {chunk["id"]: row for row, chunk in enumerate(self.chunks)}
+        self._documents: dict[str, dict[int, Document]] | None = None
+        self._text_index: tuple[dict[str, tuple[np.ndarray, np.ndarray]], np.ndarray] | None = None
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    @property
+    def model_name(self) -> str | None:
+        return self.manifest["model_name"]
+
+    # --- ingest manifest -----------------------------------------------------
+
+    def file_hashes(self) -> dict[str, str]:
+        return dict(self.manifest["files"])
+
+    def chunk_ids(self, path: str) -> set[str]:
+        return set(self.manifest["chunks"].get(path, []))
+
+    def save_file(self, path: str, file_hash: str, ids: list[str]) -> None:
+        self.manifest["files"][path] = file_hash
+        self.manifest["chunks"][path] = list(ids)
+
+    def remove_file(self, path: str) -> None:
+        self.manifest["files"].pop(path, None)
+        self.manifest["chunks"].pop(path, None)
+
+    def clear(self) -> None:
+        self.manifest.update(files={}, chunks={}, dims=None)
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.chunks = []
+        self._pending = []
+        self._reindex()
+
+    # --- changes -------------------------------------------------------------
+
+    def _consolidate(self) -> None:
+        if self._pending:
+            self.vectors = np.concatenate([np.asarray(self.vectors), *self._pending])
+            self._pending = []
+
+    def add(self, ids: list[str], texts: list[str], vectors: list[list[float]], metadatas: list[dict[str, Any]]) -> None:
+        vectors = unit_vectors(vectors)
+        dims = self.manifest["dims"] or vectors.shape[1]
+        if vectors.shape[1] != dims:
+            raise ValueError(f"The index stores {dims}-dim vectors, got {vectors.shape[1]}-dim vectors. Run reindex.")
+        self.manifest["dims"] = dims
+        if not self.chunks:
+            self.vectors = np.zeros((0, dims), dtype=np.float32)
+        self.delete([chunk_id for chunk_id in ids if chunk_id in self.rows])
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self.rows[chunk_id] = len(self.chunks)
+            self.chunks.append({"id": chunk_id, "text": text, "metadata": metadata})
+        self._pending.append(vectors)
+        self._documents = self._text_index = None
+
+    def delete(self, ids: Iterable[str]) -> None:
+        remove = {self.rows[chunk_id] for chunk_id in ids if chunk_id in self.rows}
+        if not remove:
+            return
+        self._consolidate()
+        keep = np.ones(len(self.chunks), dtype=bool)
+        keep[list(remove)] = False
+        self.vectors = np.asarray(self.vectors)[keep]
+        self.chunks = [chunk for chunk, kept in zip(self.chunks, keep) if kept]
+        self._reindex()
+
+    def update_positions(self, moved: dict[str, dict[str, Any]]) -> None:
+        """Rewrite the position metadata of unchanged chunks, like RedisBatchWriter.update_positions()."""
+        for chunk_id, position in moved.items():
+            if chunk_id in self.rows:
+                self.chunks[self.rows[chunk_id]]["metadata"].update(position)
+        self._documents = None
+
+    def save(self) -> int:
+        """Write the index as a new version and switch manifest.json to it. Returns the new version."""
+        self._consolidate()
+        version = self.version + 1
+        os.makedirs(self.path, exist_ok=True)
+        np.save(os.path.join(self.path, f"vectors-{version}.npy"), np.asarray(self.vectors, dtype=np.float32))
+        with open(os.path.join(self.path, f"chunks-{version}.json"), "w") as f:
+            json.dump(self.chunks, f)
+        manifest = {**self.manifest, "version": version}
+        staging = self.manifest_path(self.path) + ".tmp"
+        with open(staging, "w") as f:
+            json.dump(manifest, f)
+        os.replace(staging, self.manifest_path(self.path))
+        self.manifest = manifest
+        # A retriever may still be opening the previous version, older ones are unused
+        for old in glob.glob(os.path.join(self.path, "*-*.*")):
+            match = re.search(r"-(\d+)\.(npy|json)$", old)
+            if match and int(match.group(1)) < version - 1:
+                os.remove(old)
+        return version
+
+    # --- search --------------------------------------------------------------
+
+    def document(self, row: int) -> Document:
+        chunk = self.chunks[row]
+        return Document(id=chunk["id"], page_content=chunk["text"], metadata=dict(chunk["metadata"]))
+
+    def mask(self, filter: SearchFilter | None) -> np.ndarray | None:
+        if filter is None:
+            return None
+        return np.fromiter((filter.matches(chunk["metadata"]) for chunk in self.chunks), dtype=bool, count=len(self.chunks))
+
+    def vector_rankings(
+        self,
+        embeddings: list[list[float]],
+        k: int,
+        distance_threshold: float | None = None,
+        filter: SearchFilter | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Row and cosine distance of the k nearest chunks for every query embedding, one matrix product for all."""
+        self._consolidate()
+        if not self.chunks:
+            return [[] for _ in embeddings]
+        distances = 1.0 - unit_vectors(embeddings) @ np.asarray(self.vectors).T
+        mask = self.mask(filter)
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+        if distance_threshold is not None:
+            distances[distances > distance_threshold] = np.inf
+        rankings = []
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(row[top], kind="stable")]
+            rankings.append([(int(i), float(row[i])) for i in top if np.isfinite(row[i])])
+        return rankings
+
+    def text_ranking(self, query: str, k: int, filter: SearchFilter | None = None) -> list[int]:
+        """Rows of the k chunks that best match the question words by BM25 (without stemming, unlike RediSearch)."""
+        terms = query_terms(query)
+        if not terms or not self.chunks:
+            return []
+        if self._text_index is None:
+            postings: dict[str, tuple[list[int], list[int]]] = defaultdict(lambda: ([], []))
+            lengths = np.zeros(len(self.chunks), dtype=np.float32)
+            for row, chunk in enumerate(self.chunks):
+                counts = Counter(words(chunk["text"]))
+                lengths[row] = sum(counts.values())
+                for term, count in counts.items():
+                    postings[term][0].append(row)
+                    postings[term][1].append(count)
+            index = {term: (np.asarray(rows), np.asarray(counts, dtype=np.float32)) for term, (rows, counts) in postings.items()}
+            self._text_index = (index, lengths)
+        index, lengths = self._text_index
+        average_length = max(float(lengths.mean()), 1.0)
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in terms:
+            if term not in index:
+                continue
+            rows, counts = index[term]
+            idf = math.log(1 + (len(self.chunks) - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / average_length)
+            scores[rows] += idf * counts * (BM25_K1 + 1) / (counts + norm)
+        mask = self.mask(filter)
+        if mask is not None:
+            scores[~mask] = 0
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [int(row) for row in top if scores[row] > 0]
+
+    def search_many(
+        self,
+        queries: list[str],
+        embeddings: list[list[float]],
+        k: int = 4,
+        distance_threshold: float | None = None,
+        mode: str = "vector",
+        filter: SearchFilter | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        """Scored results of every query: cosine distances in vector mode, RRF scores in hybrid mode (see hybrid_search.py)."""
+        if mode != "hybrid":
+            return [
+                [(self.document(row), distance) for row, distance in ranking]
+                for ranking in self.vector_rankings(embeddings, k, distance_threshold, filter)
+            ]
+        candidates = k * HYBRID_CANDIDATES
+        results = []
+        for query, ranking in zip(queries, self.vector_rankings(embeddings, candidates, distance_threshold, filter)):
+            scores = reciprocal_rank_fusion([[row for row, _ in ranking], self.text_ranking(query, candidates, filter)])
+            top = sorted(scores, key=scores.get, reverse=True)[:k]
+            results.append([(self.document(row), scores[row]) for row in top])
+        return results
+
+    def document_chunks(self, document: str) -> dict[int, Document]:
+        """Chunks of one document by chunk_index, for the context modes."""
+        if self._documents is None:
+            self._documents = defaultdict(dict)
+            for row, chunk in enumerate(self.chunks):
+                metadata = chunk["metadata"]
+                if "chunk_index" in metadata:
+                    self._documents[metadata["document"]][metadata["chunk_index"]] = self.document(row)
+        return self._documents.get(document, {})
+
+    def stats(self) -> dict[str, Any]:
+        self._consolidate()
+        return {
+            "path": self.path,
+            "version": self.version,
+            "model_name": self.model_name,
+            "num_docs": len(self.chunks),
+            "documents": len(self.manifest["files"]),
+            "dims": self.manifest["dims"],
+            "vector_bytes": int(np.asarray(self.vectors).nbytes),
+        }
+
+
+# =============================================================================
+# LOCAL RETRIEVER
+# =============================================================================
+# Same search methods as RAGRetriever (rag_retriever.py), so the tools work with either
+
+class LocalRAGRetriever:
+
+    def __init__(self, pool: RetrieverPool, model_name: str = EMBEDDINGS_MODEL_NAME, index_name: str = INDEX_NAME,
+                 path: str | None = None):
+        self.pool = pool
+        self.index_name = index_name
+        self.path = path or local_index_path(index_name)
+        if not LocalVectorIndex.exists(self.path):
+            raise FileNotFoundError(f"There is no local index in {self.path}. Run: uv run src/local_vector_index.py ingest")
+        print(f"RAG retriever using {model_name} for embeddings.")
+        self.embeddings = pool.embeddings(model_name)
+        print(f"RAG retriever using the local {index_name} index in {self.path}.")
+        self._lock = threading.Lock()
+        self._index = self._open()
+        if self._index.model_name not in (None, model_name):
+            print(f"WARNING: {self.path} was ingested with {self._index.model_name}. Run: uv run src/local_vector_index.py reindex")
+        self.result_cache = SearchResultCache()
+
+    def _open(self) -> LocalVectorIndex:
+        self._mtime = os.path.getmtime(LocalVectorIndex.manifest_path(self.path))
+        return LocalVectorIndex.open(self.path)
+
+    @property
+    def index(self) -> LocalVectorIndex:
+        """The current index, reopened when an ingest (in any process) saved a new version."""
+        if os.path.getmtime(LocalVectorIndex.manifest_path(self.path)) != self._mtime:
+            with self._lock:
+                if os.path.getmtime(LocalVectorIndex.manifest_path(self.path)) != self._mtime:
+                    self._index = self._open()
+        return self._index
+
+    @staticmethod
+    def _check_modes(mode: str, context: str | None) -> None:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode {mode!r}, use one of {SEARCH_MODES}")
+        if context is not None and context not in CONTEXT_MODES:
+            raise ValueError(f"Unsupported context mode {context!r}, use one of {CONTEXT_MODES}")
+
+    def _cached_results(self, index: LocalVectorIndex, queries: list[str], **params) -> tuple[list, list, list[int]]:
+        keys = [self.result_cache.key(query, index.version, **params) for query in queries]
+        results = [self.result_cache.get(key) for key in keys]
+        return keys, results, [i for i, cached in enumerate(results) if cached is None]
+
+    def _search_missing(self, index, keys, results, missing, embeddings, queries, k, distance_threshold, mode, filter, start):
+        texts = [queries[i] for i in missing]
+        searched = index.search_many(texts, embeddings, k, distance_threshold, mode, filter)
+        seconds = time.perf_counter() - start
+        for i, query_results in zip(missing, searched):
+            results[i] = query_results
+            self.result_cache.set(keys[i], query_results, seconds / len(missing))
+
+    def _finish(self, index, results, mode, context, window, adaptive) -> list[list]:
+        if adaptive:
+            results = [gap_cutoff(query_results, mode) for query_results in results]
+        results = dedupe(results)
+        if context:
+            documents = {document: index.document_chunks(document) for document in hit_documents(*results)}
+            covered: dict[str, set[int]] = defaultdict(set)
+            results = [expand_results(query_results, context, documents, window, covered) for query_results in results]
+        return results
+
+    def search_many(
+        self,
+        queries: list[str],
+        k: int = 4,
+        distance_threshold: float | None = RAG_DISTANCE_THRESHOLD,
+        mode: str = SEARCH_MODE,
+        filter: SearchFilter | None = None,
+        context: str | None = None,
+        window: int = CONTEXT_WINDOW,
+        adaptive: bool = False,
+    ) -> list[list]:
+        """RAGRetriever.search_many() on the local index."""
+        self._check_modes(mode, context)
+        index = self.index
+        params = dict(k=k, distance_threshold=distance_threshold, mode=mode, filter=filter)
+        keys, results, missing = self._cached_results(index, queries, **params)
+        if missing:
+            start = time.perf_counter()
+            embeddings = embed_queries(self.embeddings, [queries[i] for i in missing])
+            self._search_missing(index, keys, results, missing, embeddings, queries, k, distance_threshold, mode, filter, start)
+        return self._finish(index, results, mode, context, window, adaptive)
+
+    async def asearch_many(
+        self,
+        queries: list[str],
+        k: int = 4,
+        distance_threshold: float | None = RAG_DISTANCE_THRESHOLD,
+        mode: str = SEARCH_MODE,
+        filter: SearchFilter | None = None,
+        context: str | None = None,
+        window: int = CONTEXT_WINDOW,
+        adaptive: bool = False,
+    ) -> list[list]:
+        """search_many() with the queries embedded on the pool's embedding threads. The search itself takes microseconds."""
+        self._check_modes(mode, context)
+        index = self.index
+        params = dict(k=k, distance_threshold=distance_threshold, mode=mode, filter=filter)
+        keys, results, missing = self._cached_results(index, queries, **params)
+        if missing:
+            start = time.perf_counter()
+            embeddings = await asyncio.get_running_loop().run_in_executor(
+                self.pool.embed_executor, embed_queries, self.embeddings, [queries[i] for i in missing]
+            )
+            self._search_missing(index, keys, results, missing, embeddings, queries, k, distance_threshold, mode, filter, start)
+        return self._finish(index, results, mode, context, window, adaptive)
+
+    def search(self, query: str, **kwargs) -> list:
+        """RAGRetriever.search() on the local index, with the same keyword arguments."""
+        return self.search_many([query], **kwargs)[0]
+
+    async def asearch(self, query: str, **kwargs) -> list:
+        return (await self.asearch_many([query], **kwargs))[0]
+
+    def stats(self) -> dict:
+        return {
+            "backend": "local",
+            "search_mode": SEARCH_MODE,
+            "result_cache": self.result_cache.metrics(),
+            "index": self.index.stats(),
+        }
+
+
+# =============================================================================
+# INGESTION
+# =============================================================================
+
+def ingest_local(
+    index: LocalVectorIndex,
+    paths: Iterable[str],
+    embed_fn: Callable[[list[str]], list[list[float]]],
+    model_name: str = EMBEDDINGS_MODEL_NAME,
+    full: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    file_workers: int = DEFAULT_FILE_WORKERS,
+    root: str | None = None,
+) -> IngestReport:
+    """doc_ingest.ingest() for a local index: only new and changed chunks are embedded, the index is saved once at the end."""
+    start = time.perf_counter()
+    if full or (index.model_name not in (None, model_name)):
+        index.clear()
+    index.manifest["model_name"] = model_name
+
+    report = IngestReport()
+    known_hashes = index.file_hashes()
+    seen_paths: set[str] = set()
+    files = prepare_files(track_paths(paths, seen_paths), known_hashes, report, workers=file_workers)
+    chunks = changed_chunks(files, index, known_hashes, report, ingested_at=int(time.time()))
+    for batch in embed_batches(batched(chunks, batch_size), embed_fn, report):
+        write_start = time.perf_counter()
+        if batch.chunks:
+            index.add(
+                [chunk.id for chunk in batch.chunks],
+                [chunk.text for chunk in batch.chunks],
+                batch.vectors,
+                [chunk.metadata for chunk in batch.chunks],
+            )
+        for commit in batch.commits:
+            index.delete(commit.stale_ids)
+            index.update_positions(commit.moved)
+            index.save_file(commit.path, commit.file_hash, commit.ids)
+        report.write_seconds += time.perf_counter() - write_start
+        report.batches += 1
+
+    remove_files(missing_files(known_hashes, seen_paths, root), index, index.delete, report)
+
+    if report.changed or full or not LocalVectorIndex.exists(index.path):
+        write_start = time.perf_counter()
+        index.save()
+        report.write_seconds += time.perf_counter() - write_start
+    report.total_seconds = time.perf_counter() - start
+    return report
+
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def run_ingest(args, full: bool = False):
+    full = full or args.full
+    index = LocalVectorIndex.open(local_index_path(args.index, args.dir))
+    embeddings = load_embeddings(EMBEDDINGS_MODEL_NAME)
+    report = ingest_local(
+        index,
+        discover_files(args.path, include=args.include, exclude=args.exclude),
+        embeddings.embed_documents,
+        full=full,
+        batch_size=args.batch_size,
+        file_workers=args.file_workers,
+        root=args.path,
+    )
+    print(report.summary())
+    print(f"{index.path} version = {index.version}")
+    write_job_report(
+        args.report,
+        report,
+        command="reindex" if full else "ingest",
+        backend="local",
+        index_name=args.index,
+        path=args.path,
+        include=args.include,
+        exclude=args.exclude,
+        batch_size=args.batch_size,
+        embeddings_backend=EMBEDDINGS_BACKEND,
+    )
+    print(f"Job report appended to {args.report}")
+
+
+def run_reindex(args):
+    run_ingest(args, full=True)
+
+
+def run_stats(args):
+    start = time.perf_counter()
+    index = LocalVectorIndex.open(local_index_path(args.index, args.dir))
+    print(f"Opened in {1000 * (time.perf_counter() - start):.1f} ms")
+    print(json.dumps(index.stats(), indent=2))
+
+
+def run_query(args):
+    path = local_index_path(args.index, args.dir)
+    retriever = LocalRAGRetriever(RetrieverPool(lambda key, pool: None), EMBEDDINGS_MODEL_NAME, args.index, path)
+    search_filter = SearchFilter.create(args.document, args.section, args.ingested_after, args.ingested_before)
+    start = time.perf_counter()
+    results = retriever.search(
+        args.query, k=args.k, distance_threshold=None, mode=args.mode, filter=search_filter, context=args.context
+    )
+    print(f"Query: {args.query} ({1000 * (time.perf_counter() - start):.1f} ms)")
+    for doc, score in results:
+        print(f"Score --> {score:.4f}")
+        print(f"Metadata --> {doc.metadata}")
+        print("Content -->")
+        print(doc.page_content)
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--index", default=INDEX_NAME, help=f"index name (default: {INDEX_NAME})")
+    common.add_argument("--dir", default=LOCAL_INDEX_DIR, help=f"directory of the local indexes (default: {LOCAL_INDEX_DIR})")
+
+    ingest_options = argparse.ArgumentParser(add_help=False)
+    ingest_options.add_argument("path", nargs="?", default=DOCS_PATH, help=f"directory to walk recursively (default: {DOCS_PATH})")
+    ingest_options.add_argument("--include", action="append", help=f"glob of files to ingest, repeatable (default: {DEFAULT_INCLUDE})")
+    ingest_options.add_argument("--exclude", action="append", help="glob of files to skip, repeatable")
+    ingest_options.add_argument("--full", action="store_true", help="drop the index and re-embed every document")
+    ingest_options.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="chunks embedded per batch")
+    ingest_options.add_argument("--file-workers", type=int, default=DEFAULT_FILE_WORKERS, help="threads that read and split files")
+    ingest_options.add_argument("--report", default=JOB_REPORT_PATH, help=f"JSON lines job report to append to (default: {JOB_REPORT_PATH})")
+
+    parser = argparse.ArgumentParser(description="Local vector index for the internal document search, no Redis needed.")
+    subparsers = parser.add_subparsers(title="commands", required=True)
+    subparsers.add_parser("ingest", parents=[common, ingest_options], help="add new and changed documents").set_defaults(func=run_ingest)
+    subparsers.add_parser("reindex", parents=[common, ingest_options], help="embed every document again").set_defaults(func=run_reindex)
+    subparsers.add_parser("stats", parents=[common], help="show index statistics").set_defaults(func=run_stats)
+    query = subparsers.add_parser("query", parents=[common], help="run a search")
+    query.add_argument("query", help="text to search for")
+    query.add_argument("-k", type=int, default=2, help="number of results")
+    query.add_argument("--mode", choices=SEARCH_MODES, default=SEARCH_MODE, help=f"search mode (default: {SEARCH_MODE})")
+    query.add_argument("--document", help="only search this document (path or file name)")
+    query.add_argument("--section", help="only search under this header")
+    query.add_argument("--ingested-after", help="only search chunks ingested on or after this ISO date")
+    query.add_argument("--ingested-before", help="only search chunks ingested before this ISO date")
+    query.add_argument("--context", choices=CONTEXT_MODES, help="show each result with its neighbouring chunks or its section")
+    query.set_defaults(func=run_query)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
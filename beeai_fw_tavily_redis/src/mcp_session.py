@@ -0,0 +1,347 @@
+"""A long-lived MCP server session shared by every call of a tool.
+
+Starting an MCP server over stdio is the expensive part of a call: `npx` resolves the npm
+package, Node boots, and the client does the MCP initialize handshake and lists the tools
+before the first request. MCPSessionManager starts the server on the first call and keeps it
+running for the life of the process (or of the event loop), so every later call costs one
+MCP round trip.
+
+* The server is started lazily, by the first run(), and shared by every caller
+* A server that exits or stops answering is restarted by the next run(), after a backoff of
+  MCP_RESTART_BACKOFF seconds doubling per consecutive failure up to MCP_RESTART_BACKOFF_MAX;
+  a call that lost its connection is retried once on the new server
+* aclose() stops the server. Call it before the event loop ends, like retriever_pool.aclose()
+
+MCPSessionPool runs up to MCP_POOL_SIZE such sessions, each with at most MCP_MAX_INFLIGHT
+requests in flight, so concurrent tool calls and batches of searches run in parallel. A
+call goes to the least busy running server, and another server is only started once every
+running one is at MCP_MAX_INFLIGHT. A call waits for a free slot in its lane: "interactive"
+for the agent's tool calls, "batch" for batches of searches. Free slots go to the waiting lanes in turn, so a large batch cannot starve
+interactive calls of the pool.
+
+The client (e.g. TavilySearch) is an async context manager that starts the server and the
+session in __aenter__ and stops them in __aexit__. anyio requires both to run in the same
+task, so the manager enters it in a background task that lives as long as the session.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncContextManager, Awaitable, Callable, Generic, TypeVar
+
+import anyio
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+MCP_TIMEOUT = float(os.getenv("MCP_TIMEOUT", "30"))  # seconds to wait for one MCP response
+MCP_RESTART_BACKOFF = float(os.getenv("MCP_RESTART_BACKOFF", "1"))  # first wait before a restart
+MCP_RESTART_BACKOFF_MAX = float(os.getenv("MCP_RESTART_BACKOFF_MAX", "30"))
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))  # server processes, started as the load needs them
+MCP_MAX_INFLIGHT = int(os.getenv("MCP_MAX_INFLIGHT", "4"))  # concurrent requests per server
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+C = TypeVar("C", bound=AsyncContextManager)
+R = TypeVar("R")
+
+# McpError codes of a session whose server is gone or hung (408 is the request timeout)
+LOST_CONNECTION_CODES = (CONNECTION_CLOSED, 408)
+
+
+def connection_lost(error: BaseException) -> bool:
+    """Whether the error, or an error it was raised from, means the MCP server is gone or hung."""
+    while error is not None:
+        if isinstance(error, McpError) and error.error.code in LOST_CONNECTION_CODES:
+            return True
+        if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)):
+            return True
+        error = error.__cause__
+    return False
+
+
+# =============================================================================
+# SESSION MANAGER
+# =============================================================================
+
+class MCPSessionManager(Generic[C]):
+
+    def __init__(self, factory: Callable[[], C], name: str = "MCP"):
+        self._factory = factory
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping: asyncio.Event | None = None
+        self._client: C | None = None
+        self._failures = 0
+        self._last_failure = 0.0
+        self._started_at: float | None = None
+        self.starts = 0
+        self.restarts = 0
+        self.calls = 0
+        self.last_error: str | None = None
+        self.last_start_seconds: float | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._client is not None and self._task is not None and not self._task.done()
+
+    def _bind_loop(self) -> None:
+        """Forget a session of an event loop that is gone: its server cannot be reached from this one."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._task = self._stopping = self._client = None
+
+    async def _serve(self, ready: asyncio.Future, stopping: asyncio.Event) -> None:
+        """Own the client context from start to stop, so it is entered and exited in one task."""
+        try:
+            async with self._factory() as client:
+                ready.set_result(client)
+                await stopping.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not stopping.is_set():
+                self.last_error = str(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            if not ready.done():
+                ready.set_exception(RuntimeError(f"{self.name} server stopped while starting"))
+
+    async def _start(self) -> C:
+        if self._failures:
+            delay = min(MCP_RESTART_BACKOFF * 2 ** (self._failures - 1), MCP_RESTART_BACKOFF_MAX)
+            wait = self._last_failure + delay - time.monotonic()
+            if wait > 0:
+                print(f"Restarting the {self.name} server in {wait:.1f}s...")
+                await asyncio.sleep(wait)
+
+        start = time.perf_counter()
+        ready = asyncio.get_running_loop().create_future()
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._serve(ready, self._stopping), name=f"{self.name}-session")
+        try:
+            self._client = await ready
+        except Exception as e:
+            self._record_failure(e)
+            self._task = None
+            raise
+        self.last_start_seconds = time.perf_counter() - start
+        self._started_at = time.monotonic()
+        if self.starts:
+            self.restarts += 1
+        self.starts += 1
+        server_info = getattr(self._client, "server_info", None)  # the Implementation from the MCP handshake
+        version = f" ({server_info.name} {server_info.version})" if server_info else ""
+        print(f"Started the {self.name} server{version} in {self.last_start_seconds:.2f}s.")
+        return self._client
+
+    def _record_failure(self, error: BaseException) -> None:
+        self._failures += 1
+        self._last_failure = time.monotonic()
+        self.last_error = str(error)
+
+    async def client(self) -> C:
+        """The running client, started (or restarted) if needed."""
+        self._bind_loop()
+        if self.running:
+            return self._client
+        async with self._lock:
+            if self.running:
+                return self._client
+            if self._task is not None:  # the session task ended without aclose()
+                self._record_failure(RuntimeError(self.last_error or f"{self.name} session ended"))
+            await self._stop()
+            return await self._start()
+
+    async def run(self, call: Callable[[C], Awaitable[R]]) -> R:
+        """Run call(client) on the shared session. A call that lost the server is retried once on a new one."""
+        for attempt in range(2):
+            client = await self.client()
+            try:
+                result = await call(client)
+            except Exception as e:
+                if attempt or not connection_lost(e):
+                    raise
+                cause = e
+                while cause.__cause__ is not None:
+                    cause = cause.__cause__
+                print(f"Lost the {self.name} server ({cause!r}), restarting it...")
+                await self._discard(client, cause)
+                continue
+            self.calls += 1
+            self._failures = 0
+            return result
+
+    async def _discard(self, client: C, error: BaseException) -> None:
+        """Stop the session of client, unless another call already replaced it."""
+        async with self._lock:
+            if self._client is client:
+                self._record_failure(error)
+                await self._stop()
+
+    async def _stop(self) -> None:
+        task, stopping = self._task, self._stopping
+        self._task = self._stopping = self._client = None
+        self._started_at = None
+        if task is None:
+            return
+        stopping.set()
+        try:
+            await asyncio.wait_for(task, MCP_TIMEOUT)
+        except Exception as e:
+            print(f"The {self.name} server did not stop cleanly: {e!r}")
+
+    async def aclose(self) -> None:
+        """Stop the server of the running event loop. Call this before the loop ends."""
+        if self._loop is not asyncio.get_running_loop() or self._lock is None:
+            return
+        async with self._lock:
+            await self._stop()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1) if self._started_at and self.running else 0.0,
+            "starts": self.starts,
+            "restarts": self.restarts,
+            "calls": self.calls,
+            "consecutive_failures": self._failures,
+            "last_start_seconds": round(self.last_start_seconds, 3) if self.last_start_seconds is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+# =============================================================================
+# FAIR QUEUING
+# =============================================================================
+
+class FairLimiter:
+    """A semaphore of capacity slots whose waiters are served round-robin by lane, FIFO within a lane."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self._waiters: dict[str, deque[asyncio.Future]] = {}
+        self._turns: deque[str] = deque()  # lanes with waiters, in the order they are served
+
+    async def acquire(self, lane: str) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        if lane not in self._waiters:
+            self._waiters[lane] = deque()
+            self._turns.append(lane)
+        self._waiters[lane].append(waiter)
+        self._wake()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was granted as the caller was cancelled, pass it on
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.in_use < self.capacity and self._turns:
+            lane = self._turns.popleft()
+            waiters = self._waiters[lane]
+            while waiters and waiters[0].done():  # cancelled while waiting
+                waiters.popleft()
+            if waiters:
+                self.in_use += 1
+                waiters.popleft().set_result(None)
+            if waiters:
+                self._turns.append(lane)
+            else:
+                del self._waiters[lane]
+
+    def waiting(self) -> dict[str, int]:
+        return {lane: sum(not w.done() for w in waiters) for lane, waiters in self._waiters.items()}
+
+
+# =============================================================================
+# SESSION POOL
+# =============================================================================
+
+class MCPSessionPool(Generic[C]):
+
+    def __init__(
+        self,
+        factory: Callable[[], C],
+        name: str = "MCP",
+        size: int = MCP_POOL_SIZE,
+        max_inflight: int = MCP_MAX_INFLIGHT,
+    ):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.sessions = [MCPSessionManager(factory, f"{name} #{i + 1}") for i in range(max(1, size))]
+        self._in_flight = [0] * len(self.sessions)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._limiter: FairLimiter | None = None
+        self._lanes: dict[str, dict[str, float]] = {}
+
+    def _bind_loop(self) -> FairLimiter:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._limiter = FairLimiter(len(self.sessions) * self.max_inflight)
+            self._in_flight = [0] * len(self.sessions)
+        return self._limiter
+
+    def _pick(self) -> int:
+        """The least busy running session with a free slot, or a session to start when every running one is full."""
+        free = [i for i, n in enumerate(self._in_flight) if n < self.max_inflight]
+        # A session with calls in flight is running or being started by them
+        running = [i for i in free if self.sessions[i].running or self._in_flight[i]]
+        return min(running or free, key=lambda i: (self._in_flight[i], i))
+
+    async def run(self, call: Callable[[C], Awaitable[R]], lane: str = INTERACTIVE) -> R:
+        """Run call(client) on a session of the pool once a slot is free in lane's turn, see MCPSessionManager.run()."""
+        limiter = self._bind_loop()
+        counters = self._lanes.setdefault(lane, {"calls": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+        start = time.perf_counter()
+        await limiter.acquire(lane)
+        waited = time.perf_counter() - start
+        counters["calls"] += 1
+        counters["wait_seconds"] += waited
+        counters["max_wait_seconds"] = max(counters["max_wait_seconds"], waited)
+
+        i = self._pick()
+        self._in_flight[i] += 1
+        try:
+            return await self.sessions[i].run(call)
+        finally:
+            self._in_flight[i] -= 1
+            limiter.release()
+
+    async def aclose(self) -> None:
+        """Stop every server of the running event loop. Call this before the loop ends."""
+        await asyncio.gather(*(session.aclose() for session in self.sessions))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self.sessions),
+            "max_inflight": self.max_inflight,
+            "in_flight": sum(self._in_flight),
+            "waiting": self._limiter.waiting() if self._limiter else {},
+            "lanes": {
+                lane: {
+                    "calls": int(c["calls"]),
+                    "mean_wait_ms": round(1000 * c["wait_seconds"] / c["calls"], 2) if c["calls"] else 0.0,
+                    "max_wait_ms": round(1000 * c["max_wait_seconds"], 2),
+                }
+                for lane, c in self._lanes.items()
+            },
+            "sessions": [{**session.stats(), "in_flight": n} for session, n in zip(self.sessions, self._in_flight)],
+        }
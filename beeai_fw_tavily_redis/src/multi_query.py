@@ -0,0 +1,90 @@
+"""Several internal_document_search queries in one model pass and one Redis round trip.
+
+Agents often split a question into sub-queries ("pilot target market", "pilot pricing",
+"pilot regions"). Searching them one by one costs one embedding forward pass and one Redis
+round trip each. RAGRetriever.search_many() embeds every uncached query in one batch, sends
+all KNN (and, in hybrid mode, full-text) queries to Redis in one pipeline and returns the
+results per query. A chunk found by several queries is only returned once, under the query
+that ranked it highest.
+
+The tool schema reads MULTI_QUERY_MAX from here when the agent starts, so the search
+modules are only imported when a multi-query search runs.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from redisvl.query import BaseQuery
+    from redisvl.query.filter import FilterExpression
+
+    from index_config import ConfiguredRedisVectorStore
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+MULTI_QUERY_MAX = int(os.getenv("MULTI_QUERY_MAX", "8"))  # sub-queries per call
+
+
+def batch_queries(
+    vector_store: ConfiguredRedisVectorStore,
+    queries: list[str],
+    embeddings: list[list[float]],
+    k: int,
+    distance_threshold: float | None,
+    mode: str,
+    filter: FilterExpression | None = None,
+) -> list[list[BaseQuery]]:
+    """The Redis queries of every question: one KNN query, plus a full-text query in hybrid mode."""
+    from hybrid_search import hybrid_queries
+
+    if mode == "hybrid":
+        return [
+            hybrid_queries(vector_store, query, embedding, k, distance_threshold, filter)
+            for query, embedding in zip(queries, embeddings)
+        ]
+    return [[vector_store.vector_query(embedding, k, distance_threshold, filter)] for embedding in embeddings]
+
+
+def flatten(groups: list[list[BaseQuery]]) -> list[BaseQuery]:
+    return [query for group in groups for query in group]
+
+
+def group_results(
+    vector_store: ConfiguredRedisVectorStore,
+    groups: list[list[BaseQuery]],
+    rankings: list[list[dict]],
+    k: int,
+    mode: str,
+) -> list[list[tuple[Document, float]]]:
+    """Split the pipelined rankings back into the scored results of every question."""
+    from hybrid_search import fuse
+
+    results = []
+    position = 0
+    for group in groups:
+        group_rankings = rankings[position:position + len(group)]
+        position += len(group)
+        if mode == "hybrid":
+            results.append(fuse(vector_store, group_rankings, k))
+        else:
+            results.append([vector_store.to_scored_document(row) for row in group_rankings[0]])
+    return results
+
+
+def dedupe(results_per_query: list[list[tuple[Document, float]]]) -> list[list[tuple[Document, float]]]:
+    """Every chunk once, under the query that ranked it highest (the earlier query on a tie)."""
+    best: dict[str, tuple[int, int]] = {}
+    for query_index, results in enumerate(results_per_query):
+        for rank, (doc, _score) in enumerate(results):
+            key = doc.id or doc.page_content
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, query_index)
+    return [
+        [(doc, score) for rank, (doc, score) in enumerate(results) if best[doc.id or doc.page_content] == (rank, query_index)]
+        for query_index, results in enumerate(results_per_query)
+    ]
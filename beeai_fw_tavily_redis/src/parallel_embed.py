@@ -0,0 +1,72 @@
+"""Multi-process embedding for bulk ingestion.
+
+One HuggingFaceEmbeddings model runs on one process, and a single process leaves most
+cores idle during a large re-index. ParallelEmbedder starts a pool of worker processes
+that each load their own copy of the model, splits every batch into one shard per worker
+and merges the vectors back in input order.
+"""
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    # Each worker gets its share of the cores instead of every worker using all of them
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import torch
+    from embedding_backends import load_embeddings
+
+    torch.set_num_threads(threads)
+    global _worker_embeddings
+    # The parent process has already exported the ONNX model, the workers only load it
+    _worker_embeddings = load_embeddings(model_name, threads=threads)
+
+
+def _embed_shard(texts: list[str]) -> list[list[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+class ParallelEmbedder:
+    """Process pool with one model copy per worker. Use as a context manager or call close()."""
+
+    def __init__(self, model_name: str, workers: int):
+        self.workers = workers
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Starting {workers} embedding workers with {threads} threads each...")
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),  # torch is not fork-safe
+            initializer=_init_worker,
+            initargs=(model_name, threads),
+        )
+        self.chunks = 0
+        self.seconds = 0.0
+
+    def __enter__(self) -> "ParallelEmbedder":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        shard_size = math.ceil(len(texts) / self.workers)
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        vectors = [vector for shard in self._executor.map(_embed_shard, shards) for vector in shard]
+        self.seconds += time.perf_counter() - start
+        self.chunks += len(texts)
+        return vectors
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def close(self) -> None:
+        self._executor.shutdown()
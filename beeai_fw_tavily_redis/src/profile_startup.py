@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# Cold start profile of the agent
+#
+# Measures how long it takes from launching the agent until the first "Question:" prompt, and
+# which imports that time goes to. The agent is src/solutions/agent.py by default: src/agent.py
+# is the workshop exercise and stops with an error until its LLM and tools are filled in.
+# The embeddings model and the RAG search stack are meant to load in the background
+# (retriever_pool.start_warmup()) or on the first tool call, so they should not show up before
+# the prompt. No question is asked: the agent gets "quit" on stdin.
+#
+#   uv run src/profile_startup.py
+#   uv run src/profile_startup.py --repeat 5 --top 20 --json startup.json
+#   uv run src/profile_startup.py --script agent.py     # the exercise, once it is completed
+#
+# It reports:
+# * time to first prompt (median and max of --repeat fresh processes)
+# * import time of agent.py and redis_retriever.py (python -X importtime), with the slowest imports
+# * which heavy modules (torch, transformers, langchain, redisvl, numpy) are loaded by the import
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_SCRIPT = os.path.join("solutions", "agent.py")
+PROMPT = "Question:"
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "onnxruntime",
+    "langchain_huggingface",
+    "langchain_redis",
+    "langchain_core",
+    "redisvl",
+    "numpy",
+)
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def time_to_first_prompt(script: str, timeout: float) -> float:
+    """Seconds from starting the script until it prints the first prompt."""
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script],
+        cwd=SRC_DIR,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    try:
+        output = ""
+        while PROMPT not in output:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"{script} did not print {PROMPT!r} within {timeout:.0f}s")
+            char = process.stdout.read(1)
+            if not char:
+                raise RuntimeError(f"{script} exited before printing {PROMPT!r}:\n{output}")
+            output += char
+        elapsed = time.perf_counter() - start
+        process.communicate("quit\n", timeout=timeout)
+        return elapsed
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def import_profile(module: str) -> dict:
+    """Total import time of the module, its slowest imports and the heavy modules it loads."""
+    check = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            _self_us, cumulative_us, indent, name = match.groups()
+            imports.append({"module": name, "depth": len(indent) // 2, "cumulative_ms": int(cumulative_us) / 1000})
+    total_ms = sum(i["cumulative_ms"] for i in imports if i["depth"] == 0)
+    module_ms = next((i["cumulative_ms"] for i in imports if i["module"] == module), None)
+    loaded = result.stdout.strip()
+    return {
+        "module": module,
+        "module_ms": module_ms,
+        "total_ms": round(total_ms, 1),
+        "heavy_modules": loaded.split(",") if loaded else [],
+        "slowest": sorted(imports, key=lambda i: i["cumulative_ms"], reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the cold start of the agent.")
+    parser.add_argument("--script", default=AGENT_SCRIPT, help=f"script to start, relative to src/ (default: {AGENT_SCRIPT})")
+    parser.add_argument("--modules", nargs="+", default=["agent", "redis_retriever"], help="modules to profile the imports of")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes to time to the first prompt")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list per module")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the first prompt")
+    parser.add_argument("--skip-prompt", action="store_true", help="only profile the imports, do not start the script")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {"imports": [], "time_to_first_prompt": None}
+    for module in args.modules:
+        profile = import_profile(module)
+        profile["slowest"] = profile["slowest"][:args.top]
+        report["imports"].append(profile)
+        print(f"import {module}: {profile['module_ms']:.0f} ms ({profile['total_ms']:.0f} ms with the interpreter startup imports)")
+        print(f"  heavy modules loaded: {', '.join(profile['heavy_modules']) or 'none'}")
+        for entry in profile["slowest"]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {'  ' * entry['depth']}{entry['module']}")
+        print()
+
+    if not args.skip_prompt:
+        seconds = []
+        for run in range(args.repeat):
+            try:
+                seconds.append(time_to_first_prompt(args.script, args.timeout))
+            except RuntimeError as e:
+                # Nothing to time: e.g. the exercise agent.py without an LLM and tools
+                raise SystemExit(f"Cannot time the first prompt: {e}")
+            print(f"run {run + 1}: first prompt after {seconds[-1]:.2f}s")
+        report["time_to_first_prompt"] = {
+            "script": args.script,
+            "runs": [round(s, 3) for s in seconds],
+            "median_seconds": round(statistics.median(seconds), 3),
+            "max_seconds": round(max(seconds), 3),
+        }
+        print(f"Time to first prompt: median {statistics.median(seconds):.2f}s, max {max(seconds):.2f}s over {args.repeat} runs")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
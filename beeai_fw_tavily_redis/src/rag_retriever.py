@@ -0,0 +1,303 @@
+"""The RAG retriever behind the internal document search tools.
+
+RAGRetriever owns the vector store of one index and the result and context caches, and
+runs the vector, hybrid, multi-query and context searches, synchronously or on an event
+loop. redis_retriever.py imports this module on the first search (or in the background
+warmup), so starting the agent does not load langchain, redisvl and numpy.
+"""
+
+import asyncio
+import time
+
+import redis
+from redisvl.index import AsyncSearchIndex
+
+from adaptive_k import RAG_DISTANCE_THRESHOLD, gap_cutoff
+from document_cache import CONTEXT_MODES, CONTEXT_WINDOW, DocumentChunkCache
+from embedding_cache import embed_queries
+from hybrid_search import SEARCH_MODE, SEARCH_MODES, ahybrid_search, hybrid_search
+from index_config import (
+    TransformedEmbeddings,
+    VectorStorage,
+    VectorTransform,
+    create_vector_store,
+    index_mismatch,
+    storage_mismatch,
+    transformed,
+)
+from index_stats import get_index_stats
+from multi_query import batch_queries, dedupe, flatten, group_results
+from result_cache import SearchResultCache, aget_index_version, get_index_version
+from retriever_pool import EMBEDDINGS_MODEL_NAME, INDEX_NAME, REDIS_URL, RetrieverPool
+from search_filter import SearchFilter
+
+
+# Core class that manages the embedding model and Redis vector database connection
+class RAGRetriever:
+
+    def __init__(
+        self,
+        pool: RetrieverPool,
+        model_name: str = EMBEDDINGS_MODEL_NAME,  # or "openai:o4-mini-2025-04-16"
+        index_name: str = INDEX_NAME,
+        redis_url: str = REDIS_URL,
+        storage: VectorStorage | None = None,
+    ):
+        # The embeddings model and the Redis connection pool are shared by every retriever in the process
+        self.pool = pool
+        self.redis_url = redis_url
+        print(f"RAG retriever using {model_name} for embeddings.")
+        embeddings = pool.embeddings(model_name)
+
+        # Configure and init the vector store with our embeddings model
+        print(f"RAG retriever using {index_name} Redis vector store index name.")
+        self.index_name = index_name
+        self.redis_client = pool.redis_client(redis_url)
+
+        # Queries are reduced and quantized exactly like the documents were at ingest time
+        self.storage = storage or VectorStorage()
+        # A reindex refits the PCA projection and bumps the index version, see _refresh_transform()
+        self._transform_version = get_index_version(self.redis_client, index_name)
+        transform = self._load_transform()
+        mismatch = storage_mismatch(self.redis_client, index_name, self.storage)
+        if mismatch:
+            print(f"WARNING: {mismatch}. Run: uv run src/redis_vector_db.py reindex")
+        mismatch = index_mismatch(self.redis_client, index_name, self.storage)
+        if mismatch:
+            print(f"WARNING: {mismatch}. Run: uv run src/redis_vector_db.py migrate")
+
+        self.vector_store = create_vector_store(
+            transformed(embeddings, transform), index_name, self.redis_client, self.storage
+        )
+        self.result_cache = SearchResultCache()
+        self.context_cache = DocumentChunkCache(self.vector_store)
+        self._async_index: AsyncSearchIndex | None = None
+
+    def _load_transform(self) -> VectorTransform:
+        transform = VectorTransform.load(self.redis_client, self.index_name, self.storage)
+        if transform.needs_fit:
+            raise RuntimeError(
+                f"No PCA projection is saved for {self.index_name}. Run: uv run src/redis_vector_db.py reindex"
+            )
+        return transform
+
+    def _refresh_transform(self, index_version: int) -> None:
+        """Project queries with the PCA basis of this index version, which a reindex refits."""
+        embeddings = self.vector_store.embeddings
+        if index_version == self._transform_version or not isinstance(embeddings, TransformedEmbeddings):
+            return
+        embeddings.transform = self._load_transform()
+        self._transform_version = index_version
+
+    @staticmethod
+    def _check_modes(mode: str, context: str | None) -> None:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode {mode!r}, use one of {SEARCH_MODES}")
+        if context is not None and context not in CONTEXT_MODES:
+            raise ValueError(f"Unsupported context mode {context!r}, use one of {CONTEXT_MODES}")
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        distance_threshold: float | None = RAG_DISTANCE_THRESHOLD,
+        mode: str = SEARCH_MODE,
+        filter: SearchFilter | None = None,
+        context: str | None = None,
+        window: int = CONTEXT_WINDOW,
+        adaptive: bool = False,
+    ) -> list:
+        """Similarity search with scores. Repeat queries are served from the result cache until the index is re-ingested.
+
+        mode="vector" scores are cosine distances (lower is better), mode="hybrid" scores are
+        reciprocal rank fusion scores of the vector and full-text rankings (higher is better).
+        The filter restricts the search to matching chunks before the nearest neighbours are found.
+        context="neighbors" or "section" replaces every hit with the surrounding chunks, see document_cache.py.
+        adaptive=True treats k as the most results and ends them at the first large score gap, see adaptive_k.py.
+        """
+        self._check_modes(mode, context)
+        index_version = get_index_version(self.redis_client, self.index_name)
+        self._refresh_transform(index_version)
+        key = self.result_cache.key(
+            query, index_version, k=k, distance_threshold=distance_threshold, mode=mode, filter=filter
+        )
+        results = self.result_cache.get(key)
+        if results is None:
+            start = time.perf_counter()
+            expression = filter.expression() if filter else None
+            if mode == "hybrid":
+                embedding = self.vector_store.embeddings.embed_query(query)
+                results = hybrid_search(
+                    self.vector_store, query, embedding, k=k, distance_threshold=distance_threshold, filter=expression
+                )
+            else:
+                results = self.vector_store.similarity_search_with_score(
+                    query, k=k, distance_threshold=distance_threshold, filter=expression
+                )
+            self.result_cache.set(key, results, time.perf_counter() - start)
+        if adaptive:
+            results = gap_cutoff(results, mode)
+        if context:
+            results = self.context_cache.expand(results, context, index_version, window)
+        return results
+
+    def async_index(self) -> AsyncSearchIndex:
+        """The index on the pool's asyncio Redis client for the running event loop."""
+        client = self.pool.async_redis_client(self.redis_url)
+        if self._async_index is None or self._async_index.client is not client:
+            self._async_index = self.vector_store.async_index(client)
+        return self._async_index
+
+    async def asearch(
+        self,
+        query: str,
+        k: int = 4,
+        distance_threshold: float | None = RAG_DISTANCE_THRESHOLD,
+        mode: str = SEARCH_MODE,
+        filter: SearchFilter | None = None,
+        context: str | None = None,
+        window: int = CONTEXT_WINDOW,
+        adaptive: bool = False,
+    ) -> list:
+        """search() for async callers that never blocks the event loop.
+
+        The query is embedded on the pool's bounded embedding threads and the Redis queries run
+        on an asyncio client, so other tool calls and agent sessions in the process keep running.
+        Results and caches are shared with search().
+        """
+        self._check_modes(mode, context)
+        index = self.async_index()
+        index_version = await aget_index_version(index.client, self.index_name)
+        if index_version != self._transform_version:
+            await asyncio.to_thread(self._refresh_transform, index_version)
+        key = self.result_cache.key(
+            query, index_version, k=k, distance_threshold=distance_threshold, mode=mode, filter=filter
+        )
+        results = self.result_cache.get(key)
+        if results is None:
+            start = time.perf_counter()
+            expression = filter.expression() if filter else None
+            embedding = await asyncio.get_running_loop().run_in_executor(
+                self.pool.embed_executor, self.vector_store.embeddings.embed_query, query
+            )
+            if mode == "hybrid":
+                results = await ahybrid_search(
+                    self.vector_store, index, query, embedding, k=k, distance_threshold=distance_threshold, filter=expression
+                )
+            else:
+                rows = await index.query(self.vector_store.vector_query(embedding, k, distance_threshold, expression))
+                results = [self.vector_store.to_scored_document(row) for row in rows]
+            self.result_cache.set(key, results, time.perf_counter() - start)
+        if adaptive:
+            results = gap_cutoff(results, mode)
+        if context:
+            results = await self.context_cache.aexpand(results, context, index_version, index, window)
+        return results
+
+    def _cached_results(
+        self, queries: list[str], index_version: int, **params
+    ) -> tuple[list, list[list | None], list[int]]:
+        """Result cache keys, cached results (None when missing) and the positions of the missing queries."""
+        keys = [self.result_cache.key(query, index_version, **params) for query in queries]
+        results = [self.result_cache.get(key) for key in keys]
+        return keys, results, [i for i, cached in enumerate(results) if cached is None]
+
+    def _cache_results(self, keys: list, results: list, missing: list[int], searched: list, seconds: float) -> None:
+        for i, query_results in zip(missing, searched):
+            results[i] = query_results
+            self.result_cache.set(keys[i], query_results, seconds / len(missing))
+
+    def search_many(
+        self,
+        queries: list[str],
+        k: int = 4,
+        distance_threshold: float | None = RAG_DISTANCE_THRESHOLD,
+        mode: str = SEARCH_MODE,
+        filter: SearchFilter | None = None,
+        context: str | None = None,
+        window: int = CONTEXT_WINDOW,
+        adaptive: bool = False,
+    ) -> list[list]:
+        """search() for several queries, with one embedding batch and one Redis pipeline for the uncached ones.
+
+        Returns the results of every query, in order. A chunk found by several queries is only
+        returned for the query that ranked it highest. Results are cached per query, so search()
+        and search_many() share cache entries.
+        """
+        self._check_modes(mode, context)
+        index_version = get_index_version(self.redis_client, self.index_name)
+        self._refresh_transform(index_version)
+        keys, results, missing = self._cached_results(
+            queries, index_version, k=k, distance_threshold=distance_threshold, mode=mode, filter=filter
+        )
+        if missing:
+            start = time.perf_counter()
+            texts = [queries[i] for i in missing]
+            embeddings = embed_queries(self.vector_store.embeddings, texts)
+            groups = batch_queries(
+                self.vector_store, texts, embeddings, k, distance_threshold, mode, filter.expression() if filter else None
+            )
+            redis_queries = flatten(groups)
+            rankings = self.vector_store.index.batch_query(redis_queries, batch_size=len(redis_queries))
+            searched = group_results(self.vector_store, groups, rankings, k, mode)
+            self._cache_results(keys, results, missing, searched, time.perf_counter() - start)
+        if adaptive:
+            results = [gap_cutoff(query_results, mode) for query_results in results]
+        results = dedupe(results)
+        if context:
+            results = self.context_cache.expand_many(results, context, index_version, window)
+        return results
+
+    async def asearch_many(
+        self,
+        queries: list[str],
+        k: int = 4,
+        distance_threshold: float | None = RAG_DISTANCE_THRESHOLD,
+        mode: str = SEARCH_MODE,
+        filter: SearchFilter | None = None,
+        context: str | None = None,
+        window: int = CONTEXT_WINDOW,
+        adaptive: bool = False,
+    ) -> list[list]:
+        """search_many() for async callers, see asearch()."""
+        self._check_modes(mode, context)
+        index = self.async_index()
+        index_version = await aget_index_version(index.client, self.index_name)
+        if index_version != self._transform_version:
+            await asyncio.to_thread(self._refresh_transform, index_version)
+        keys, results, missing = self._cached_results(
+            queries, index_version, k=k, distance_threshold=distance_threshold, mode=mode, filter=filter
+        )
+        if missing:
+            start = time.perf_counter()
+            texts = [queries[i] for i in missing]
+            embeddings = await asyncio.get_running_loop().run_in_executor(
+                self.pool.embed_executor, embed_queries, self.vector_store.embeddings, texts
+            )
+            groups = batch_queries(
+                self.vector_store, texts, embeddings, k, distance_threshold, mode, filter.expression() if filter else None
+            )
+            redis_queries = flatten(groups)
+            rankings = await index.batch_query(redis_queries, batch_size=len(redis_queries))
+            searched = group_results(self.vector_store, groups, rankings, k, mode)
+            self._cache_results(keys, results, missing, searched, time.perf_counter() - start)
+        if adaptive:
+            results = [gap_cutoff(query_results, mode) for query_results in results]
+        results = dedupe(results)
+        if context:
+            results = await self.context_cache.aexpand_many(results, context, index_version, index, window)
+        return results
+
+    def stats(self) -> dict:
+        try:
+            index = get_index_stats(self.redis_client, self.index_name)
+        except redis.RedisError as e:
+            index = {"error": str(e)}
+        return {
+            "vector_storage": self.storage.label,
+            "vector_index": self.storage.index_label,
+            "search_mode": SEARCH_MODE,
+            "result_cache": self.result_cache.metrics(),
+            "context_cache": self.context_cache.metrics(),
+            "index": index,
+        }
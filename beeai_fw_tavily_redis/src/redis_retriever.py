@@ -1,48 +1,58 @@
 #!/usr/bin/env python
 
+import atexit
 import os
+from datetime import date, datetime
+from typing import Literal
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
-from beeai_framework.tools import ToolOutput, tool
+from beeai_framework.tools import JSONToolOutput, ToolOutput, tool
 from beeai_framework.utils.strings import to_json
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_redis import RedisConfig, RedisVectorStore
 from pydantic import BaseModel, Field
+from adaptive_k import RAG_DISTANCE_THRESHOLD, RAG_MAX_K, fit_token_budget, fit_token_budget_many
+from multi_query import MULTI_QUERY_MAX
+from retriever_pool import RAG_BACKEND, RAG_BACKENDS, RetrieverKey, RetrieverPool
+from search_filter import SearchFilter
 
 # =============================================================================
 # ENVIRONMENT CONFIGURATION
 # =============================================================================
 # Configuration settings and environment variables
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 # =============================================================================
 # VECTOR STORE AND EMBEDDINGS SETUP
 # =============================================================================
-# Core class that manages the embedding model and Redis vector database connection
-class RAGRetriever:
-
-    def __init__(self):
-
-        model_name = "sentence-transformers/all-mpnet-base-v2"  # or "openai:o4-mini-2025-04-16"
-        print(f"RAG retriever using {model_name} for embeddings.")
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
-
-        # Configure and init the vector store with our embeddings model
-        index_name = "internal_docs"
-        print(f"RAG retriever using {index_name} Redis vector store index name.")
-        config = RedisConfig(
-            index_name=index_name,
-            redis_url=REDIS_URL,
-            metadata_schema=[
-                {"name": "document", "type": "tag"},
-            ],
-        )
+# The RAGRetriever class in rag_retriever.py manages the embedding model and Redis vector database
+# connection. It pulls in langchain, redisvl and numpy, so it is only imported when the first
+# retriever is created and starting the agent stays fast.
+# Without Redis, the LocalRAGRetriever in local_vector_index.py searches an in-process index instead.
+def _create_retriever(key: RetrieverKey, pool: RetrieverPool):
+    if RAG_BACKEND not in RAG_BACKENDS:
+        raise ValueError(f"Unsupported RAG_BACKEND {RAG_BACKEND!r}, use one of {RAG_BACKENDS}")
+    if RAG_BACKEND != "redis":
+        from local_vector_index import LocalRAGRetriever, LocalVectorIndex, local_index_path
+
+        path = local_index_path(key.index_name)
+        if RAG_BACKEND == "local":
+            return LocalRAGRetriever(pool, key.model_name, key.index_name, path)
+        if LocalVectorIndex.exists(path) and not pool.redis_available(key.redis_url):
+            print(f"Redis is not available, searching the local index in {path}.")
+            return LocalRAGRetriever(pool, key.model_name, key.index_name, path)
+
+    from rag_retriever import RAGRetriever
 
-        self.vector_store = RedisVectorStore(embeddings, config=config)
+    return RAGRetriever(pool, key.model_name, key.index_name, key.redis_url)
+
+
+# One warm retriever per (model, index, Redis URL) for the whole process.
+# Call retriever_pool.start_warmup() at startup to load the model in the background before the first question.
+retriever_pool: RetrieverPool = RetrieverPool(_create_retriever)
+atexit.register(retriever_pool.shutdown)
 
 # =============================================================================
 # INPUT/OUTPUT DATA MODELS
@@ -50,14 +60,38 @@ class RAGRetriever:
 # Pydantic models that define the structure and validation for tool inputs and outputs.
 # Important for compatibility with LLMs like those from OpenAI.
 
-class DocSearchInput(BaseModel):
+# Options shared by the single and the multi-query search tools
+class DocSearchOptions(BaseModel):
+    # Optional filters, applied inside the vector search so scoped searches stay fast
+    document: str | None = Field(None, description="Only search this document, e.g. mcplant_launch_brief.md.")
+    section: str | None = Field(None, description="Only search under this document header, e.g. Pricing Strategy.")
+    # Dates in the schema, so "last week" fails validation with a message the agent can act on
+    ingested_after: datetime | date | None = Field(None, description="Only search documents ingested on or after this ISO date, e.g. 2025-07-01.")
+    ingested_before: datetime | date | None = Field(None, description="Only search documents ingested before this ISO date.")
+    # Surrounding text of every result, read from a local cache instead of another search
+    context: Literal["neighbors", "section"] | None = Field(
+        None,
+        description="Return each result with its neighbouring chunks (neighbors) or its whole section (section). "
+        "Use this instead of searching again when a result is cut off or lacks context.",
+    )
+
+class DocSearchInput(DocSearchOptions):
     query: str = Field(..., description="The query to search for in company internal documents.")
 
-# Data model for individual search results with content, metadata, and similarity score
+class MultiDocSearchInput(DocSearchOptions):
+    queries: list[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MULTI_QUERY_MAX,
+        description="Several different queries to search for at once, e.g. the sub-questions of a complex question.",
+    )
+
+# Data model for individual search results with content, metadata, similarity score and size in tokens
 class RagToolResult(BaseModel):
     content: str
     metadata: dict
     score: float
+    tokens: int
 
 # Custom output class that extends framework's ToolOutput for RAG-specific results
 class RagToolOutput(ToolOutput):
@@ -71,37 +105,96 @@ class RagToolOutput(ToolOutput):
     def is_empty(self) -> bool:
         return len(self.results) == 0
 
+# Results of one query of a multi-query search
+class QueryResults(BaseModel):
+    query: str
+    results: list[RagToolResult]
+
+class MultiRagToolOutput(RagToolOutput):
+    def is_empty(self) -> bool:
+        return all(len(query.results) == 0 for query in self.results)
+
 # =============================================================================
 # MAIN RAG TOOL IMPLEMENTATION
 # =============================================================================
 # The core tool function that performs semantic search and returns relevant document sections
 
 # Use the input_schema argument to tell the @tool decorator to expect structured input.
-# The function now takes a single argument of type str.
+# The function takes the query string plus the optional filters and context mode as keyword arguments.
 # The function result format uses the RagToolOutput schema.
+# The number of results adapts to the scores and to a token budget, see adaptive_k.py.
 
 # Using the BeeAI framework there are two ways to create a custom tool. 
 # You can extend the base tool class (like the Tavily Tool does) or you can use a tool decorator with your required inputs
 # [INSERT YOUR CODE HERE]
-def internal_document_search(query: str) -> RagToolOutput:
-    """Tool that answers a query about company policy using company internal documents. Returns up to top_n results below the similarity distance threshold."""
-    retriever = RAGRetriever()
-    print("Searching vector store...")
-    results = retriever.vector_store.similarity_search_with_score(
-        query, k=4, distance_threshold=0.6
+async def internal_document_search(
+    query: str,
+    document: str | None = None,
+    section: str | None = None,
+    ingested_after: datetime | date | None = None,
+    ingested_before: datetime | date | None = None,
+    context: str | None = None,
+) -> RagToolOutput:
+    """Tool that answers a query about company policy using company internal documents. Returns the most relevant results below the similarity distance threshold, with the size of each result in tokens."""
+    # The async path keeps the agent's event loop free while the query is embedded and searched,
+    # so concurrent tool calls (e.g. Tavily searches) overlap with this one
+    retriever = await retriever_pool.aget()
+    search_filter = SearchFilter.create(document, section, ingested_after, ingested_before)
+    print(f"Searching vector store{f' ({search_filter})' if search_filter else ''}...")
+    results = await retriever.asearch(
+        query, k=RAG_MAX_K, distance_threshold=RAG_DISTANCE_THRESHOLD, filter=search_filter, context=context, adaptive=True
     )
     output = []
-    # Format the results for output
-    for doc, score in results:
+    # Format the results for output, keeping the best results that fit in the token budget
+    for doc, score, tokens in fit_token_budget(results):
         output.append(RagToolResult(
             content=getattr(doc, "page_content", str(doc)),
             metadata=getattr(doc, "metadata", {}),
-            score=score
+            score=score,
+            tokens=tokens,
         ))
 
-    print(f"Vector store search returned {len(output)} top results.")
+    print(f"Vector store search returned {len(output)} top results ({sum(r.tokens for r in output)} tokens).")
     return RagToolOutput(output)
 
+# Several queries in one call: one embedding batch and one Redis round trip instead of one per query
+@tool(input_schema=MultiDocSearchInput)
+async def internal_document_multi_search(
+    queries: list[str],
+    document: str | None = None,
+    section: str | None = None,
+    ingested_after: datetime | date | None = None,
+    ingested_before: datetime | date | None = None,
+    context: str | None = None,
+) -> MultiRagToolOutput:
+    """Tool that searches company internal documents for several queries at once. Use it instead of several internal_document_search calls when a question has several parts. Each result is only returned once, for the query it matches best."""
+    retriever = await retriever_pool.aget()
+    search_filter = SearchFilter.create(document, section, ingested_after, ingested_before)
+    print(f"Searching vector store for {len(queries)} queries{f' ({search_filter})' if search_filter else ''}...")
+    results = await retriever.asearch_many(
+        queries, k=RAG_MAX_K, distance_threshold=RAG_DISTANCE_THRESHOLD, filter=search_filter, context=context, adaptive=True
+    )
+    output = [
+        QueryResults(
+            query=query,
+            results=[
+                RagToolResult(content=doc.page_content, metadata=doc.metadata, score=score, tokens=tokens)
+                for doc, score, tokens in query_results
+            ],
+        )
+        for query, query_results in zip(queries, fit_token_budget_many(results))
+    ]
+    tokens = sum(result.tokens for query in output for result in query.results)
+    print(f"Vector store search returned {sum(len(query.results) for query in output)} top results ({tokens} tokens).")
+    return MultiRagToolOutput(output)
+
+# Health endpoint for the RAG tool, also usable by an agent to check whether the internal documents are indexed
+@tool
+def internal_document_index_stats() -> JSONToolOutput:
+    """Reports the health of the internal document index: document count, memory use, indexing progress and cache hit rates."""
+    retriever_pool.get()
+    return JSONToolOutput(retriever_pool.health())
+
 # =============================================================================
 # TESTING AND DEMONSTRATION
 # =============================================================================
@@ -109,12 +202,12 @@ def internal_document_search(query: str) -> RagToolOutput:
 
 if __name__ == "__main__":
 
-    rag_retriever = RAGRetriever()
+    rag_retriever = retriever_pool.get()
 
     question = "What is our target market for the pilot?"
     print("QUESTION: ", question)
 
-    answer = rag_retriever.vector_store.similarity_search_with_score(question)
+    answer = rag_retriever.search(question, k=4, distance_threshold=None)
     print("ANSWER:")
     for doc, score in answer:
         print(f"Score: {score:.3f}")
@@ -7,7 +7,7 @@
 # * Hugging Face model to generate embeddings for documents and queries
 # * Redis vector store to cache and query the embeddings
 # * Langchain library to interact with both of the above
-# * Redis rvl command to demonstrate checking the DB status
+# * Redis FT.INFO index statistics to demonstrate checking the DB status
 
 # Use case
 # 
@@ -20,19 +20,71 @@
 # > NOTE! Remember to navigate to the `beeai_fw_tavily_redis` folder of this repo and run `uv sync` before running this.
 #
 # Use `uv run src/redis_vector_db.py` to run this script with the proper environment and relative path to example_docs.
-
+#
+# Without a subcommand the script ingests example_docs, prints the index stats and tries a query.
+# Subcommands for working with larger document trees:
+#
+#   uv run src/redis_vector_db.py ingest DOCS_DIR --include '*.md' --exclude 'drafts/*'
+#   uv run src/redis_vector_db.py reindex DOCS_DIR     # drop the index and embed everything again
+#   uv run src/redis_vector_db.py drop                 # drop the index, its documents and the manifest
+#   uv run src/redis_vector_db.py migrate --algorithm HNSW --m 32 --ef-runtime 50   # rebuild without downtime
+#   uv run src/redis_vector_db.py stats
+#   uv run src/redis_vector_db.py query "What is our target market for the pilot?" -k 2
+#   uv run src/redis_vector_db.py query "Who is notified first?" --document crisis_management_guidance.md --section "Crisis Response Timeline"
+#   uv run src/redis_vector_db.py query "Who is notified first?" --context section   # whole section of each hit
+#
+# Every ingest appends a JSON line (files, chunks, bytes, embed and write times) to ingest_jobs.jsonl.
+# Without Redis, src/local_vector_index.py ingests and searches the same documents in-process.
+#
+# Set VECTOR_DATATYPE (FLOAT16, INT8), VECTOR_DIMS and VECTOR_REDUCTION (truncate, pca) to store
+# smaller vectors, then reindex. See src/index_config.py and src/bench_vector_storage.py.
+# VECTOR_ALGORITHM, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_RUNTIME and VECTOR_DISTANCE_METRIC
+# choose the vector index; apply changed settings to an existing index with migrate.
+
+import argparse
+import dataclasses
+import json
 import os
-import subprocess
 import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_redis import RedisConfig, RedisVectorStore
-from langchain_text_splitters import MarkdownHeaderTextSplitter
+from langchain_core.embeddings import Embeddings
+from langchain_redis import RedisVectorStore
 import redis
+from document_cache import CONTEXT_MODES, DocumentChunkCache
+from doc_ingest import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FILE_WORKERS,
+    DEFAULT_INCLUDE,
+    DEFAULT_MAX_PENDING_BATCHES,
+    IngestManifest,
+    discover_files,
+    ingest,
+    prepare_file,
+    write_job_report,
+)
+from index_config import (
+    ALGORITHMS,
+    DISTANCE_METRICS,
+    PCA_SAMPLE_SIZE,
+    VectorStorage,
+    VectorTransform,
+    create_vector_store as create_configured_vector_store,
+    drop_index,
+    index_mismatch,
+    migrate_index,
+    resolve_index,
+    storage_mismatch,
+    transformed,
+)
+from embedding_backends import EMBEDDINGS_BACKEND, load_embeddings
+from index_stats import get_index_stats, list_indexes
+from parallel_embed import ParallelEmbedder
+from result_cache import bump_index_version, get_index_version
+from search_filter import SearchFilter
 
 # Python version check
 assert (3, 11) <= sys.version_info < (3, 12), "Use Python 3.11 to run this script."
@@ -42,104 +94,262 @@ assert (3, 11) <= sys.version_info < (3, 12), "Use Python 3.11 to run this scrip
 
 EMBEDDINGS_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")  # Local Redis default
+INDEX_NAME = "internal_docs"
+DOCS_PATH = "example_docs"
+JOB_REPORT_PATH = "ingest_jobs.jsonl"
 
 
 # Setup for the embeddings model
-# 
+#
 # The embeddings model will be used to create embedding vectors from the documents and the queries.
 # With HuggingFaceEmbeddings we can download a sentence-transformers model to run locally for our embeddings.
+# EMBEDDINGS_BACKEND=onnx or onnx-int8 runs it with ONNX Runtime instead of PyTorch, see src/embedding_backends.py.
 
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDINGS_MODEL_NAME)
+def create_embeddings() -> Embeddings:
+    return load_embeddings(EMBEDDINGS_MODEL_NAME)
 
 
 # Setup the vector store
-# 
+#
 # Redis is being used as the vector store.
 
-# Test connection with Redis client
-print(f"Connecting to Redis at: {REDIS_URL}")
-redis_client = redis.from_url(REDIS_URL)
-print(f"Connected = {redis_client.ping()}")
-
-
-# Configure and init the vector store with our embeddings model
-config = RedisConfig(
-    index_name="internal_docs",
-    redis_url=REDIS_URL,
-    metadata_schema=[
-        {"name": "document", "type": "tag"},
-    ],
-)
+def connect_redis() -> redis.Redis:
+    # Test connection with Redis client
+    print(f"Connecting to Redis at: {REDIS_URL}")
+    redis_client = redis.from_url(REDIS_URL)
+    print(f"Connected = {redis_client.ping()}")
+    return redis_client
 
-vector_store = RedisVectorStore(embeddings, config=config)
 
+def create_vector_store(
+    redis_client: redis.Redis,
+    index_name: str,
+    transform: VectorTransform | None = None,
+    embeddings: Embeddings | None = None,
+) -> RedisVectorStore:
+    # Configure and init the vector store with our embeddings model.
+    # The VECTOR_* settings decide the datatype and dimensions of the stored vectors.
+    transform = transform or VectorTransform.load(redis_client, index_name, VectorStorage())
+    embeddings = transformed(embeddings or create_embeddings(), transform)
+    return create_configured_vector_store(embeddings, index_name, redis_client, transform.storage)
 
-# Read and split the documents
 
-splitter = MarkdownHeaderTextSplitter(
-    headers_to_split_on=[
-        ("#", "Header_1"),
-        ("##", "Header_2"),
-        ("###", "Header_3"),
-    ],
-    strip_headers=True,
-)
-
-# Get the list of all files in the directory
-path = 'example_docs'
-files = os.listdir(path)
-
-n_docs = 0
-metadata = []
-splits = []
-for file in files:
-    filename = os.path.join(path, file)
-    if not os.path.isdir(filename) and filename.endswith(".md"):
-        with open(filename) as f:
-            file_contents = f.read()
-            n_docs += 1
-            for split in splitter.split_text(file_contents):
-                splits.append(split.page_content)
-                metadata.append({"document": filename})
-
-print(f"{n_docs} documents split in to {len(splits)} chunks of text")
-
-
-# Add the text and metadata to the vector store
-_ids = vector_store.add_texts(splits, metadata)
-# print(_ids)
-
-
-def run_rvl_cli_command(command):
-    """Run a shell command and print the output."""
-
-    print(f"rvl command: {command}")
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    output, error = process.communicate()
-
-    if error:
-        print(f"ERROR! {error.decode('utf-8')}")
-    else:
-        print(f"Output: {output.decode('utf-8')}")
-
-# Example usage of the `rvl` shell command to check on your redis DB.
-# Assumes you're running Redis locally (use --host, --port, --password, --username, to change this)
-run_rvl_cli_command('rvl version')
-run_rvl_cli_command('rvl index listall --port 6379')
-run_rvl_cli_command('rvl index info -i internal_docs --port 6379')
-run_rvl_cli_command('rvl stats -i internal_docs --port 6379')
-
-
-# Try a query
-query = "What is our target market for the pilot?"
-results = vector_store.similarity_search(query, k=2)
-
-print("==========================")
-print("Similarity Search Results:")
-print("==========================")
-print(f"Query: {query}")
-print("Results:")
-for doc in results:
-    print(f"Metadata --> {doc.metadata}")
-    print(f"Content -->")
-    print(doc.page_content)
+# Read, split and add the documents
+#
+# Ingestion is incremental: a manifest in Redis remembers a content hash for every file
+# and the chunks it produced, so only new or changed chunks are embedded and the vectors
+# of removed chunks are deleted. Use reindex (or --full) to drop the index and embed everything again.
+#
+# Files are read and split on --file-workers threads and stream through the pipeline; chunks
+# are embedded and written in batches of --batch-size, so memory stays flat no matter how many
+# documents are indexed. For bulk re-indexing use --workers to embed with several processes.
+
+def fit_projection(args, storage: VectorStorage, embed_fn) -> VectorTransform:
+    # The PCA projection is fitted on a sample of the chunks before any vector is written
+    texts = []
+    for path in discover_files(args.path, include=args.include, exclude=args.exclude):
+        texts.extend(prepare_file(path, None).texts)
+        if len(texts) >= PCA_SAMPLE_SIZE:
+            break
+    texts = texts[:PCA_SAMPLE_SIZE]
+    print(f"Fitting a {storage.dims}-dim PCA projection on {len(texts)} chunks...")
+    vectors = []
+    for i in range(0, len(texts), args.batch_size):
+        vectors.extend(embed_fn(texts[i:i + args.batch_size]))
+    return VectorTransform(storage).fit(vectors)
+
+
+def run_ingest(args, full: bool = False):
+    full = full or args.full
+    redis_client = connect_redis()
+    storage = VectorStorage()
+    mismatch = storage_mismatch(redis_client, args.index, storage)
+    if mismatch and not full:
+        sys.exit(f"The {mismatch}. Use reindex to rebuild it with the new settings.")
+    mismatch = index_mismatch(redis_client, args.index, storage)
+    if mismatch and not full:
+        print(f"WARNING: The {mismatch}. Use migrate to rebuild it with the new settings.")
+    print(f"Storing {storage.label} vectors in a {storage.index_label} index")
+
+    embeddings = create_embeddings()
+    embedder = ParallelEmbedder(EMBEDDINGS_MODEL_NAME, args.workers) if args.workers > 1 else None
+    try:
+        embed_documents = embedder.embed_documents if embedder else embeddings.embed_documents
+        transform = VectorTransform.load(redis_client, args.index, storage)
+        if storage.reduction == "pca" and storage.dims and (full or transform.needs_fit):
+            transform = fit_projection(args, storage, embed_documents)
+            transform.save(redis_client, args.index)
+
+        vector_store = create_vector_store(redis_client, args.index, transform, embeddings)
+        report = ingest(
+            vector_store,
+            redis_client,
+            args.index,
+            discover_files(args.path, include=args.include, exclude=args.exclude),
+            full=full,
+            batch_size=args.batch_size,
+            max_pending_batches=args.max_pending_batches,
+            embed_fn=(lambda texts: transform(embedder.embed_documents(texts))) if embedder else None,
+            file_workers=args.file_workers,
+            root=args.path,
+        )
+    finally:
+        if embedder:
+            embedder.close()
+    print(report.summary())
+
+    # Stamp a new index version so retrievers stop serving cached results from before this ingest
+    if report.changed:
+        print(f"{args.index} index version = {bump_index_version(redis_client, args.index)}")
+
+    write_job_report(
+        args.report,
+        report,
+        command="reindex" if full else "ingest",
+        index_name=args.index,
+        path=args.path,
+        include=args.include,
+        exclude=args.exclude,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        vector_storage=storage.label,
+        vector_index=storage.index_label,
+        embeddings_backend=EMBEDDINGS_BACKEND,
+    )
+    print(f"Job report appended to {args.report}")
+    return vector_store
+
+
+def run_reindex(args):
+    run_ingest(args, full=True)
+
+
+def run_drop(args):
+    redis_client = connect_redis()
+    drop_index(redis_client, args.index, delete_documents=True)
+    IngestManifest(redis_client, args.index).clear()
+    VectorTransform.delete(redis_client, args.index)
+    bump_index_version(redis_client, args.index)
+    print(f"Dropped the {args.index} index, its documents and its ingest manifest.")
+
+
+def run_migrate(args):
+    # New index settings from the environment, overridden by the command line options
+    overrides = {
+        name: value for name, value in {
+            "algorithm": args.algorithm,
+            "distance_metric": args.distance_metric,
+            "m": args.m,
+            "ef_construction": args.ef_construction,
+            "ef_runtime": args.ef_runtime,
+        }.items() if value is not None
+    }
+    storage = dataclasses.replace(VectorStorage(), **overrides)
+    redis_client = connect_redis()
+    migrate_index(redis_client, args.index, storage)
+    # Rankings change with the index, so retrievers should stop serving cached results
+    bump_index_version(redis_client, args.index)
+
+
+def run_stats(args):
+    # Index statistics straight from Redis (FT.INFO) on the connection we already have
+    redis_client = connect_redis()
+    print(f"Indexes: {list_indexes(redis_client)}")
+    physical = resolve_index(redis_client, args.index)
+    if physical and physical != args.index:
+        print(f"{args.index} is an alias of {physical}")
+    print(json.dumps(get_index_stats(redis_client, args.index), indent=2))
+
+
+def run_query(args, vector_store: RedisVectorStore | None = None):
+    # Try a query
+    vector_store = vector_store or create_vector_store(connect_redis(), args.index)
+    search_filter = SearchFilter.create(args.document, args.section, args.ingested_after, args.ingested_before)
+    results = vector_store.similarity_search(
+        args.query, k=args.k, filter=search_filter.expression() if search_filter else None
+    )
+    if args.context:
+        index_version = get_index_version(vector_store.index.client, args.index)
+        scored = DocumentChunkCache(vector_store).expand([(doc, 0.0) for doc in results], args.context, index_version)
+        results = [doc for doc, _score in scored]
+
+    print("==========================")
+    print("Similarity Search Results:")
+    print("==========================")
+    print(f"Query: {args.query}")
+    print("Results:")
+    for doc in results:
+        print(f"Metadata --> {doc.metadata}")
+        print(f"Content -->")
+        print(doc.page_content)
+
+
+def run_workshop(args):
+    """The original workshop flow: ingest example_docs, show the stats and try a query."""
+    vector_store = run_ingest(args)
+    run_stats(args)
+    run_query(args, vector_store)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--index", default=INDEX_NAME, help=f"index name (default: {INDEX_NAME})")
+
+    ingest_options = argparse.ArgumentParser(add_help=False)
+    ingest_options.add_argument("path", nargs="?", default=DOCS_PATH, help=f"directory to walk recursively (default: {DOCS_PATH})")
+    ingest_options.add_argument("--include", action="append", help=f"glob of files to ingest, repeatable (default: {DEFAULT_INCLUDE})")
+    ingest_options.add_argument("--exclude", action="append", help="glob of files to skip, repeatable")
+    ingest_options.add_argument("--full", action="store_true", help="drop the index and re-embed every document")
+    ingest_options.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="chunks embedded and written per batch")
+    ingest_options.add_argument("--max-pending-batches", type=int, default=DEFAULT_MAX_PENDING_BATCHES,
+                                help="embedded batches allowed to wait for the Redis writer before embedding pauses")
+    ingest_options.add_argument("--workers", type=int, default=1,
+                                help="embedding worker processes, each with its own copy of the model (1 = embed in this process)")
+    ingest_options.add_argument("--file-workers", type=int, default=DEFAULT_FILE_WORKERS,
+                                help="threads reading and splitting files")
+    ingest_options.add_argument("--report", default=JOB_REPORT_PATH, help=f"JSON lines job report to append to (default: {JOB_REPORT_PATH})")
+
+    query_options = argparse.ArgumentParser(add_help=False)
+    query_options.add_argument("-k", type=int, default=2, help="number of results")
+    query_options.add_argument("--document", help="only search this document (path or file name)")
+    query_options.add_argument("--section", help="only search under this header")
+    query_options.add_argument("--ingested-after", help="only search chunks ingested on or after this ISO date")
+    query_options.add_argument("--ingested-before", help="only search chunks ingested before this ISO date")
+    query_options.add_argument("--context", choices=CONTEXT_MODES, help="show each result with its neighbouring chunks or its section")
+
+    parser = argparse.ArgumentParser(description="Manage the internal_docs Redis vector index.")
+    subparsers = parser.add_subparsers(title="commands")
+
+    subparsers.add_parser("ingest", parents=[common, ingest_options], help="add new and changed documents").set_defaults(func=run_ingest)
+    subparsers.add_parser("reindex", parents=[common, ingest_options], help="drop the index and embed every document").set_defaults(func=run_reindex)
+    subparsers.add_parser("drop", parents=[common], help="drop the index, its documents and the manifest").set_defaults(func=run_drop)
+    migrate = subparsers.add_parser("migrate", parents=[common], help="rebuild the index with new vector index settings without downtime")
+    migrate.add_argument("--algorithm", type=str.upper, choices=ALGORITHMS, help="vector index algorithm")
+    migrate.add_argument("--distance-metric", type=str.upper, choices=DISTANCE_METRICS, help="vector distance metric")
+    migrate.add_argument("--m", type=int, help="HNSW graph edges per node")
+    migrate.add_argument("--ef-construction", type=int, help="HNSW candidates while building")
+    migrate.add_argument("--ef-runtime", type=int, help="HNSW candidates while querying")
+    migrate.set_defaults(func=run_migrate)
+    subparsers.add_parser("stats", parents=[common], help="show index statistics").set_defaults(func=run_stats)
+    query = subparsers.add_parser("query", parents=[common, query_options], help="run a similarity search")
+    query.add_argument("query", help="text to search for")
+    query.set_defaults(func=run_query)
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if not hasattr(args, "func"):
+        # No subcommand: ingest with the default settings, then show the stats and try a query
+        args = parser.parse_args(["ingest"])
+        args.func = run_workshop
+        args.query = "What is our target market for the pilot?"
+        args.k = 2
+        args.document = args.section = args.ingested_after = args.ingested_before = args.context = None
+    args.func(args)
+
+
+# The guard keeps the --workers embedding processes from re-running the script when they import it
+if __name__ == "__main__":
+    main()
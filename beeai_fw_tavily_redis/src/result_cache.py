@@ -0,0 +1,78 @@
+"""Search result cache for internal_document_search.
+
+Repeat questions from the interactive agent loop are answered from memory without
+running the embeddings model or RediSearch. Entries are keyed on the normalized query,
+the search parameters and the index version. The ingestion script bumps the index version
+every time it writes to the index, which invalidates every cached result for that index.
+"""
+
+import os
+from typing import Any, Hashable
+
+import redis
+import redis.asyncio
+
+from caching import LRUCache
+from embedding_cache import normalize_query
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))  # seconds
+
+
+# =============================================================================
+# INDEX VERSION STAMP
+# =============================================================================
+# Kept outside of the index key prefix so RediSearch never sees it
+
+def index_version_key(index_name: str) -> str:
+    return f"rag:{index_name}:version"
+
+
+def bump_index_version(client: redis.Redis, index_name: str) -> int:
+    """Mark the index as changed. Call this after every ingest."""
+    return int(client.incr(index_version_key(index_name)))
+
+
+def get_index_version(client: redis.Redis, index_name: str) -> int:
+    version = client.get(index_version_key(index_name))
+    return int(version) if version is not None else 0
+
+
+async def aget_index_version(client: redis.asyncio.Redis, index_name: str) -> int:
+    version = await client.get(index_version_key(index_name))
+    return int(version) if version is not None else 0
+
+
+# =============================================================================
+# RESULT CACHE
+# =============================================================================
+
+class SearchResultCache:
+    """LRU/TTL cache of search results that also tracks how much search time it saved."""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float | None = RESULT_CACHE_TTL):
+        self.cache: LRUCache[tuple[Any, float]] = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(query: str, index_version: int, **params: Any) -> Hashable:
+        return normalize_query(query), index_version, tuple(sorted(params.items()))
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        results, search_seconds = entry
+        self.saved_seconds += search_seconds
+        return results
+
+    def set(self, key: Hashable, results: Any, search_seconds: float) -> None:
+        self.cache.set(key, (results, search_seconds))
+
+    def metrics(self) -> dict[str, Any]:
+        return {**self.cache.stats.to_dict(), "saved_seconds": round(self.saved_seconds, 3)}
+
@@ -0,0 +1,254 @@
+"""Process-wide pool of warm RAG retrievers.
+
+Loading the sentence-transformers model and connecting to Redis costs seconds, while a
+vector lookup costs milliseconds. The pool keeps one embeddings model per model name, one
+Redis connection pool per URL and one retriever per (model name, index name, Redis URL)
+so every tool call reuses them.
+
+For async tool calls the pool also holds one asyncio Redis client per URL and event loop,
+and a bounded thread pool that runs the embeddings model off the event loop.
+
+Nothing heavy is imported with this module: the embeddings stack (langchain, transformers)
+is imported when the first model loads. start_warmup() does that in a background thread
+so the agent can show its first prompt while the model loads.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Generic, TypeVar
+from urllib.parse import urlsplit, urlunsplit
+
+import redis
+import redis.asyncio
+
+from embedding_backends import EMBEDDINGS_BACKEND, load_embeddings
+
+if TYPE_CHECKING:
+    from embedding_cache import CachedEmbeddings
+
+# =============================================================================
+# DEFAULTS
+# =============================================================================
+# Shared by the retriever tool and the ingestion script
+
+EMBEDDINGS_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+INDEX_NAME = "internal_docs"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# Concurrent query embeddings in async tool calls. The model already uses every core for a
+# single batch, so a few threads are enough to overlap short queries with Redis round trips.
+EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", "2"))
+# Where the search tools find the index: redis, local (an in-process index, see
+# src/local_vector_index.py) or auto (Redis, or the local index when Redis does not answer)
+RAG_BACKENDS = ("auto", "redis", "local")
+RAG_BACKEND = os.getenv("RAG_BACKEND", "auto").lower()
+
+
+@dataclass(frozen=True)
+class RetrieverKey:
+    model_name: str = EMBEDDINGS_MODEL_NAME
+    index_name: str = INDEX_NAME
+    redis_url: str = REDIS_URL
+
+
+def redact_url(url: str) -> str:
+    """Hide the password of a redis:// URL so it can be printed or returned by a tool."""
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = parts.netloc.replace(f":{parts.password}@", ":****@", 1)
+    return urlunsplit(parts._replace(netloc=netloc))
+
+
+T = TypeVar("T")
+
+
+# =============================================================================
+# RETRIEVER POOL
+# =============================================================================
+# Lazily creates and caches the expensive objects. Creation of each object is guarded
+# by its own lock so two threads never load the same model twice, while lookups of
+# objects that already exist never wait on a model that is still loading.
+
+class RetrieverPool(Generic[T]):
+
+    def __init__(self, factory: Callable[[RetrieverKey, "RetrieverPool[T]"], T]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._key_locks: dict[Any, threading.Lock] = {}
+        self._embeddings: dict[str, "CachedEmbeddings"] = {}
+        self._clients: dict[str, redis.Redis] = {}
+        self._async_clients: dict[tuple[str, asyncio.AbstractEventLoop], redis.asyncio.Redis] = {}
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._retrievers: dict[RetrieverKey, T] = {}
+
+    def _get_or_create(self, store: dict, key: Any, create: Callable[[], Any]) -> Any:
+        value = store.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault((id(store), key), threading.Lock())
+        with key_lock:
+            value = store.get(key)
+            if value is None:
+                value = create()
+                store[key] = value
+        return value
+
+    def embeddings(self, model_name: str = EMBEDDINGS_MODEL_NAME) -> "CachedEmbeddings":
+        """Shared embeddings model with its query embedding cache, loaded on first use."""
+        def create() -> "CachedEmbeddings":
+            from embedding_cache import EMBEDDING_CACHE_REDIS, CachedEmbeddings
+
+            print(f"Loading embeddings model {model_name} ({EMBEDDINGS_BACKEND} backend)...")
+            return CachedEmbeddings(
+                load_embeddings(model_name),
+                namespace=model_name,
+                redis_client=self.redis_client() if EMBEDDING_CACHE_REDIS else None,
+            )
+
+        return self._get_or_create(self._embeddings, model_name, create)
+
+    def redis_client(self, redis_url: str = REDIS_URL) -> redis.Redis:
+        """Shared Redis client. The client owns a connection pool that is safe to use from many threads."""
+        return self._get_or_create(
+            self._clients, redis_url, lambda: redis.from_url(redis_url, health_check_interval=30)
+        )
+
+    def async_redis_client(self, redis_url: str = REDIS_URL) -> redis.asyncio.Redis:
+        """Shared asyncio Redis client for the running event loop. asyncio connections cannot be used from another loop."""
+        loop = asyncio.get_running_loop()
+        return self._get_or_create(
+            self._async_clients, (redis_url, loop), lambda: redis.asyncio.from_url(redis_url, health_check_interval=30)
+        )
+
+    def redis_available(self, redis_url: str = REDIS_URL, timeout: float = 1.0) -> bool:
+        """Whether the Redis server answers a PING within timeout seconds."""
+        client = redis.from_url(redis_url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        try:
+            return bool(client.ping())
+        except redis.RedisError:
+            return False
+        finally:
+            client.close()
+
+    @property
+    def embed_executor(self) -> ThreadPoolExecutor:
+        """Threads that run query embeddings for async callers, at most EMBED_WORKERS at a time."""
+        return self._get_or_create(
+            self._executors, "embed", lambda: ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="rag-embed")
+        )
+
+    def get(
+        self,
+        model_name: str = EMBEDDINGS_MODEL_NAME,
+        index_name: str = INDEX_NAME,
+        redis_url: str = REDIS_URL,
+    ) -> T:
+        """Shared retriever for the model, index and Redis URL, created on first use."""
+        key = RetrieverKey(model_name, index_name, redis_url)
+        return self._get_or_create(self._retrievers, key, lambda: self._factory(key, self))
+
+    async def aget(
+        self,
+        model_name: str = EMBEDDINGS_MODEL_NAME,
+        index_name: str = INDEX_NAME,
+        redis_url: str = REDIS_URL,
+    ) -> T:
+        """Same as get() but loads the model in a worker thread so the event loop keeps running."""
+        key = RetrieverKey(model_name, index_name, redis_url)
+        retriever = self._retrievers.get(key)
+        if retriever is not None:
+            return retriever
+        return await asyncio.to_thread(self.get, model_name, index_name, redis_url)
+
+    def warmup(self, keys: list[RetrieverKey] | None = None) -> None:
+        """Create the retrievers and run one embedding so the first tool call is fast."""
+        for key in keys or [RetrieverKey()]:
+            start = time.perf_counter()
+            self.get(key.model_name, key.index_name, key.redis_url)
+            self.embeddings(key.model_name).embed_query("warmup")
+            print(f"Warmed up {key.index_name} retriever in {time.perf_counter() - start:.2f}s.")
+
+    def start_warmup(self, keys: list[RetrieverKey] | None = None) -> threading.Thread:
+        """Run warmup() in a daemon thread. A tool call made before it finishes waits for the same model load.
+
+        A failed warmup (e.g. Redis is not running yet) is only reported: the first tool call retries it.
+        """
+        def run() -> None:
+            try:
+                self.warmup(keys)
+            except Exception as e:
+                print(f"Retriever warmup failed, it will be retried on first use: {e}")
+
+        thread = threading.Thread(target=run, name="rag-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def health(self) -> dict[str, Any]:
+        """Report what is loaded and whether each Redis connection answers."""
+        connections = {}
+        for redis_url, client in list(self._clients.items()):
+            start = time.perf_counter()
+            try:
+                ok = bool(client.ping())
+                error = None
+            except redis.RedisError as e:
+                ok = False
+                error = str(e)
+            connections[redact_url(redis_url)] = {
+                "ok": ok,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                "error": error,
+            }
+        return {
+            "healthy": all(c["ok"] for c in connections.values()),
+            "embeddings_models": list(self._embeddings),
+            "embeddings_backend": EMBEDDINGS_BACKEND,
+            "embedding_cache": {name: e.stats.to_dict() for name, e in self._embeddings.items()},
+            "retrievers": [
+                {
+                    "model_name": k.model_name,
+                    "index_name": k.index_name,
+                    "redis_url": redact_url(k.redis_url),
+                    **(r.stats() if hasattr(r, "stats") else {}),
+                }
+                for k, r in list(self._retrievers.items())
+            ],
+            "redis": connections,
+        }
+
+    async def aclose(self) -> None:
+        """Close the asyncio Redis clients of the running event loop. Call this before the loop ends."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key in self._async_clients if key[1] is loop]
+            clients = [self._async_clients.pop(key) for key in keys]
+        for client in clients:
+            try:
+                await client.aclose()
+            except redis.RedisError:
+                pass
+
+    def shutdown(self) -> None:
+        """Drop every retriever and model, stop the embedding threads and close the Redis connection pools."""
+        with self._lock:
+            clients = list(self._clients.values())
+            executors = list(self._executors.values())
+            self._retrievers.clear()
+            self._embeddings.clear()
+            self._clients.clear()
+            # asyncio clients can only be closed on their own loop, see aclose()
+            self._async_clients.clear()
+            self._executors.clear()
+            self._key_locks.clear()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for client in clients:
+            try:
+                client.close()
+            except redis.RedisError:
+                pass
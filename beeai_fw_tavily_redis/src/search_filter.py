@@ -0,0 +1,86 @@
+"""Filters for the internal document searches.
+
+Applied inside the KNN query (RediSearch pre-filtering), so a scoped search only compares
+the query vector with the chunks that pass the filter. This module is imported by the tool
+definitions, so redisvl is only imported once a filter is turned into a query expression.
+The local vector index (local_vector_index.py) applies the same filter with matches().
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from redisvl.query.filter import FilterExpression
+
+
+def parse_date(value: str | date | None) -> float | None:
+    """Unix time of a date, a date-time or their ISO string (UTC unless it has an offset)."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if not isinstance(parsed, datetime):
+        parsed = datetime.combine(parsed, time())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    document: str | None = None  # path as ingested, or just the file name
+    section: str | None = None  # any header enclosing the chunk
+    ingested_after: float | None = None  # unix time
+    ingested_before: float | None = None
+
+    @classmethod
+    def create(
+        cls,
+        document: str | None = None,
+        section: str | None = None,
+        ingested_after: str | date | None = None,
+        ingested_before: str | date | None = None,
+    ) -> "SearchFilter | None":
+        """Filter from tool input (dates or ISO strings), or None when nothing is filtered."""
+        search_filter = cls(
+            document or None,
+            (section or "").strip() or None,
+            parse_date(ingested_after),
+            parse_date(ingested_before),
+        )
+        return search_filter if search_filter != cls() else None
+
+    def expression(self) -> "FilterExpression | None":
+        from redisvl.query.filter import Num, Tag
+
+        conditions = []
+        if self.document:
+            field = "document" if "/" in self.document else "document_name"
+            conditions.append(Tag(field) == self.document)
+        if self.section:
+            conditions.append(Tag("header_path") == self.section)
+        if self.ingested_after is not None:
+            conditions.append(Num("ingested_at") >= self.ingested_after)
+        if self.ingested_before is not None:
+            conditions.append(Num("ingested_at") < self.ingested_before)
+        if not conditions:
+            return None
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression = expression & condition
+        return expression
+
+    def matches(self, metadata: dict) -> bool:
+        """Whether a chunk with this metadata passes the filter. Tags compare case-insensitively, like in RediSearch."""
+        if self.document:
+            field = "document" if "/" in self.document else "document_name"
+            if str(metadata.get(field, "")).casefold() != self.document.casefold():
+                return False
+        if self.section and self.section.casefold() not in {h.casefold() for h in metadata.get("header_path", [])}:
+            return False
+        ingested_at = metadata.get("ingested_at")
+        if self.ingested_after is not None and (ingested_at is None or ingested_at < self.ingested_after):
+            return False
+        if self.ingested_before is not None and (ingested_at is None or ingested_at >= self.ingested_before):
+            return False
+        return True
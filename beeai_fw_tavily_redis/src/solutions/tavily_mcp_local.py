@@ -1,17 +1,21 @@
 
 from beeai_framework.tools.mcp import MCPTool
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession
 from mcp.client.stdio import stdio_client
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field
+from pydantic import Field, ValidationError
 from typing import Dict, Any, Optional, List
 import os
+import sys
 import asyncio
-import json
-import re
 import logging
 from pathlib import Path
 
+# The solutions reuse the helper modules that live one level up in src/
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from tavily_results import decode_search_result
+from tavily_server import server_params
+
 #Ensure that your path is set to the current folder so that the proper enviorment variables are found 
 print(f"Current working directory: {os.getcwd()}")
 script_dir = Path(__file__).parent
@@ -26,45 +30,10 @@ logger = logging.getLogger(__name__)
 # Set settings (enviorment variables)
 class Settings(BaseSettings):
     TAVILY_API_KEY: str = Field(alias='TAVILY_API_KEY')
-    model_config = SettingsConfigDict(env_file='../.env')
-
-# Create a helper function to parse the Tavily Result in Structured Format and returns the urls, text results, and number of results
-def parse_search_results(text_content: str, query: str) -> Dict[str, Any]:
-    """Parse Tavily text results into structured format"""
-    results = []
-    
-    # Split by "Title:" to get individual results
-    title_sections = text_content.split("Title:")
-    
-    for section in title_sections[1:]:  # Skip first empty section
-        lines = section.strip().split('\n')
-        title = lines[0].strip() if lines else ""
-        
-        url = ""
-        content = ""
-        
-        for i, line in enumerate(lines):
-            if line.startswith("URL:"):
-                url = line.replace("URL:", "").strip()
-            elif line.startswith("Content:"):
-                content_lines = lines[i:]
-                content = " ".join(line.replace("Content:", "").strip() 
-                                for line in content_lines if line.strip())
-                break
-        
-        if title and url:
-            results.append({
-                "title": title,
-                "url": url,
-                "content": content.strip(),
-                "score": 1.0 - (len(results) * 0.1)
-            })
-    
-    return {
-        "query": query,
-        "results": results,
-        "total_results": len(results)
-    }
+    # Pinned or pre-installed MCP server instead of npx tavily-mcp@latest, see tavily_server.py
+    TAVILY_MCP_COMMAND: str = ""
+    TAVILY_MCP_VERSION: str = ""
+    model_config = SettingsConfigDict(env_file='../../.env', extra='ignore')
 
 #Create the class that actually starts and initalizes the tavily MCP server locally, does the search, and handles the clean shut down of the session and server
 class TavilySearch:
@@ -74,10 +43,8 @@ class TavilySearch:
         self.settings = Settings()
         self.session = None
         self.search_tool = None
-        self.server_params = StdioServerParameters(
-            command="npx",
-            args=["-y", "tavily-mcp@latest"],
-            env={"TAVILY_API_KEY": self.settings.TAVILY_API_KEY}
+        self.server_params = server_params(
+            self.settings.TAVILY_API_KEY, self.settings.TAVILY_MCP_COMMAND, self.settings.TAVILY_MCP_VERSION
         )
         self._context_manager = None
     
@@ -150,65 +117,39 @@ class TavilySearch:
             # Add any additional parameters
             arguments.update(kwargs)
             
-            # Execute search
-            result = await self.search_tool.run(arguments)
-            
-            # Extract text content from JSONToolOutput (complex nested structure)
-            # Convert JSONToolOutput to string, then parse as JSON to get nested data
-            result_str = str(result)
-            result_data = [{"type": "text", "text": result_str}]  # Fallback structure
-            
-            # Try to parse the nested JSON structure
+            # Validate the arguments like the MCP tool would, then call it on the session to get the CallToolResult
             try:
-                # The result string looks like: [{"type": "text", "text": "..."}]
-                import ast
-                try:
-                    result_data = ast.literal_eval(result_str)
-                except:
-                    # Fallback: create the expected structure
-                    result_data = [{"type": "text", "text": result_str}]
-                
-                # Extract the text field which contains another JSON string
-                if isinstance(result_data, list) and len(result_data) > 0:
-                    first_item = result_data[0]
-                    if isinstance(first_item, dict) and "text" in first_item:
-                        nested_text = first_item["text"]
-                        
-                        # Parse the nested JSON to get the actual search results
-                        nested_data = json.loads(nested_text)
-                        if isinstance(nested_data, list) and len(nested_data) > 0:
-                            nested_item = nested_data[0]
-                            if isinstance(nested_item, dict) and "text" in nested_item:
-                                text_content = nested_item["text"]
-                            else:
-                                text_content = nested_text
-                        else:
-                            text_content = nested_text
-                    else:
-                        text_content = str(result)
-                else:
-                    text_content = str(result)
-                    
-            except Exception as parse_error:
-                # If all parsing fails, convert result to string and try to extract content
-                text_content = str(result)
-            
-            # Parse and return structured results
-            return parse_search_results(text_content, query)
+                validated = self.search_tool.input_schema.model_validate(arguments)
+            except ValidationError as e:
+                return {"error": f"Invalid search arguments: {e}"}
+            result = await self.session.call_tool(
+                self.search_tool.name, arguments=validated.model_dump(exclude_none=True, exclude_unset=True)
+            )
+
+            # Read the results (and the answer, with include_answer) from the content blocks, with their scores
+            # (see tavily_results.py)
+            return decode_search_result(result, query)
             
         except Exception as e:
             return {"error": f"Search failed: {str(e)}"}
 
+# Most searches in flight on one MCP session at a time
+MAX_CONCURRENT_SEARCHES = 4
+
 # This is a function that can search multiple queries in one Tavily Search Call
 async def search_multiple_queries(queries: List[str], **search_kwargs) -> Dict[str, Dict[str, Any]]:
-    """Search multiple queries efficiently using one session"""
-    results = {}
-    
+    """Search multiple queries concurrently using one session"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+
     async with TavilySearch() as tavily:
-        for query in queries:
-            results[query] = await tavily.search(query, **search_kwargs)
-    
-    return results
+        async def search(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await tavily.search(query, **search_kwargs)
+
+        # The MCP session matches every response to its request, so the searches can overlap
+        results = await asyncio.gather(*(search(query) for query in queries))
+
+    return dict(zip(queries, results))
 
 
 # To Test the Tavily Search Tool with it's different settings (basic, with AI Answer, advanced domains) and Searching Multiple queries in on search call run the following:
@@ -219,21 +160,19 @@ async def main():
     async with TavilySearch() as tavily:
         print("=== Multiple Searches with One Session ===")
         
-        # Basic search
-        results1 = await tavily.search("Python async programming", max_results=3)
+        # Basic search, search with answer and advanced search with domains, all at once
+        results1, results2, results3 = await asyncio.gather(
+            tavily.search("Python async programming", max_results=3),
+            tavily.search("AI developments 2024", include_answer=True, max_results=3),
+            tavily.search(
+                "machine learning tutorials",
+                search_depth="advanced",
+                include_domains=["github.com", "medium.com"],
+                max_results=5
+            ),
+        )
         print(f"Query 1: Found {len(results1.get('results', []))} results")
-        
-        # Search with answer
-        results2 = await tavily.search("AI developments 2024", include_answer=True, max_results=3)
         print(f"Query 2: Found {len(results2.get('results', []))} results")
-        
-        # Advanced search with domains
-        results3 = await tavily.search(
-            "machine learning tutorials",
-            search_depth="advanced",
-            include_domains=["github.com", "medium.com"],
-            max_results=5
-        )
         print(f"Query 3: Found {len(results3.get('results', []))} results")
         
         # Display first result from each
@@ -245,7 +184,7 @@ async def main():
                 print(f"  {first_result['url']}")
     
     # Batch search convenience function
-    print("\n=== Batch Search ===")
+    print("\n=== Concurrent Batch Search ===")
     batch_queries = [
         "Python tutorials", 
         "JavaScript frameworks", 
@@ -1,23 +1,33 @@
 import asyncio
-import json
 import os
 import logging
+from datetime import timedelta
 from pathlib import Path
 from pprint import pprint
 from typing import Any, Optional, List, Literal, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
+import redis
 
 from beeai_framework.context import RunContext
 from beeai_framework.emitter import Emitter
 from beeai_framework.errors import FrameworkError
-from beeai_framework.tools import Tool, ToolRunOptions, JSONToolOutput
+from beeai_framework.tools import Tool, ToolRunOptions, JSONToolOutput, tool
 from beeai_framework.tools.errors import ToolInputValidationError
 from beeai_framework.tools.mcp import MCPTool
 from beeai_framework import context
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession
 from mcp.client.stdio import stdio_client
 
+import sys
+
+# The solutions reuse the helper modules that live one level up in src/
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from mcp_session import BATCH, MCP_TIMEOUT, MCPSessionPool, connection_lost
+from tavily_cache import TAVILY_CACHE_REDIS, TavilyResponseCache
+from tavily_results import decode_search_result
+from tavily_server import server_params, version_mismatch
+
 # =============================================================================
 # SETUP AND CONFIGURATION
 # =============================================================================
@@ -30,6 +40,9 @@ script_dir = Path(__file__).parent
 os.chdir(script_dir)
 # print(f"Changed to: {os.getcwd()}")
 
+# The Redis server of the optional shared response cache, see tavily_cache.py
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
 # =============================================================================
 # SETTINGS AND CONFIGURATION MODELS
 # =============================================================================
@@ -37,52 +50,12 @@ os.chdir(script_dir)
 
 class Settings(BaseSettings):
     TAVILY_API_KEY: str = Field(alias='TAVILY_API_KEY')
+    # Pinned or pre-installed MCP server instead of npx tavily-mcp@latest, see tavily_server.py
+    TAVILY_MCP_COMMAND: str = ""
+    TAVILY_MCP_VERSION: str = ""
     model_config = SettingsConfigDict(env_file='../.env', extra='ignore')
 
 
-# =============================================================================
-# SEARCH RESULT PARSING UTILITIES
-# =============================================================================
-# Helper functions to transform raw Tavily API responses into structured data
-
-def parse_search_results(text_content: str, query: str) -> Dict[str, Any]:
-    """Parse Tavily text results into structured format"""
-    results = []
-    
-    # Split by "Title:" to get individual results
-    title_sections = text_content.split("Title:")
-    
-    for section in title_sections[1:]:  # Skip first empty section
-        lines = section.strip().split('\n')
-        title = lines[0].strip() if lines else ""
-        
-        url = ""
-        content = ""
-        
-        for i, line in enumerate(lines):
-            if line.startswith("URL:"):
-                url = line.replace("URL:", "").strip()
-            elif line.startswith("Content:"):
-                content_lines = lines[i:]
-                content = " ".join(line.replace("Content:", "").strip() 
-                                for line in content_lines if line.strip())
-                break
-        
-        if title and url:
-            results.append({
-                "title": title,
-                "url": url,
-                "content": content.strip(),
-                "score": 1.0 - (len(results) * 0.1)
-            })
-    
-    return {
-        "query": query,
-        "results": results,
-        "total_results": len(results)
-    }
-
-
 # =============================================================================
 # MAIN SEARCH CLIENT CLASS
 # =============================================================================
@@ -95,37 +68,48 @@ class TavilySearch:
         self.settings = Settings()
         self.session = None
         self.search_tool = None
-        self.server_params = StdioServerParameters(
-            command="npx",
-            args=["-y", "tavily-mcp@latest"],
-            env={"TAVILY_API_KEY": self.settings.TAVILY_API_KEY}
+        self.server_info = None
+        self.server_params = server_params(
+            self.settings.TAVILY_API_KEY, self.settings.TAVILY_MCP_COMMAND, self.settings.TAVILY_MCP_VERSION
         )
         self._context_manager = None
     
     async def __aenter__(self):
         """Start MCP server and initialize session"""
-        self._context_manager = stdio_client(self.server_params)
-        read, write = await self._context_manager.__aenter__()
-        
-        self.session = ClientSession(read, write)
-        await self.session.__aenter__()
-        await self.session.initialize()
-        
-        # Get search tool once
-        tools = await MCPTool.from_client(self.session)
-        self.search_tool = next((tool for tool in tools if "tavily-search" in tool.name), None)
-        
-        if not self.search_tool:
-            raise ValueError("Tavily search tool not found")
-        
+        try:
+            self._context_manager = stdio_client(self.server_params)
+            read, write = await self._context_manager.__aenter__()
+
+            # A server that stops answering fails the request instead of hanging the tool call
+            self.session = ClientSession(read, write, read_timeout_seconds=timedelta(seconds=MCP_TIMEOUT))
+            await self.session.__aenter__()
+            initialized = await self.session.initialize()
+            self.server_info = initialized.serverInfo
+            mismatch = version_mismatch(self.settings.TAVILY_MCP_VERSION, self.server_info.version)
+            if mismatch:
+                print(f"WARNING: {mismatch}")
+
+            # Get search tool once
+            tools = await MCPTool.from_client(self.session)
+            self.search_tool = next((tool for tool in tools if "tavily-search" in tool.name), None)
+
+            if not self.search_tool:
+                raise ValueError("Tavily search tool not found")
+        except BaseException as e:
+            # Stop the server process of a failed start
+            await self.__aexit__(type(e), e, e.__traceback__)
+            raise
+
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Clean up session and server"""
-        if self.session:
-            await self.session.__aexit__(exc_type, exc_val, exc_tb)
-        if self._context_manager:
-            await self._context_manager.__aexit__(exc_type, exc_val, exc_tb)
+        session, context_manager = self.session, self._context_manager
+        self.session = self._context_manager = self.search_tool = None
+        if session:
+            await session.__aexit__(exc_type, exc_val, exc_tb)
+        if context_manager:
+            await context_manager.__aexit__(exc_type, exc_val, exc_tb)
     
     async def search(
         self,
@@ -156,53 +140,70 @@ class TavilySearch:
             # Add any additional parameters
             arguments.update(kwargs)
             
-            # Execute search
-            result = await self.search_tool.run(arguments)
-            
-            # Extract text content from JSONToolOutput
-            result_str = str(result)
-            
-            # Try to parse the nested JSON structure
+            # Validate the arguments like the MCP tool would, then call it on the session to get the CallToolResult
             try:
-                import ast
-                try:
-                    result_data = ast.literal_eval(result_str)
-                except:
-                    result_data = [{"type": "text", "text": result_str}]
-                
-                # Extract the text field which contains another JSON string
-                if isinstance(result_data, list) and len(result_data) > 0:
-                    first_item = result_data[0]
-                    if isinstance(first_item, dict) and "text" in first_item:
-                        nested_text = first_item["text"]
-                        
-                        # Parse the nested JSON to get the actual search results
-                        nested_data = json.loads(nested_text)
-                        if isinstance(nested_data, list) and len(nested_data) > 0:
-                            nested_item = nested_data[0]
-                            if isinstance(nested_item, dict) and "text" in nested_item:
-                                text_content = nested_item["text"]
-                            else:
-                                text_content = nested_text
-                        else:
-                            text_content = nested_text
-                    else:
-                        text_content = str(result)
-                else:
-                    text_content = str(result)
-                    
-            except Exception as parse_error:
-                text_content = str(result)
-            
-            # Parse and return structured results
-            return parse_search_results(text_content, query)
+                validated = self.search_tool.input_schema.model_validate(arguments)
+            except ValidationError as e:
+                raise ToolInputValidationError("Tool input validation error", cause=e)
+            result = await self.session.call_tool(
+                self.search_tool.name, arguments=validated.model_dump(exclude_none=True, exclude_unset=True)
+            )
+
+            # Read the results from the content blocks, with their scores (see tavily_results.py)
+            return decode_search_result(result, query)
 
         except ToolInputValidationError as tive:
             return {"error": tive.explain()}
         except Exception as e:
+            # A lost server is restarted by the session pool, see tavily_pool below
+            if connection_lost(e):
+                raise
             return {"error": f"Search failed: {str(e)}"}
 
 
+# =============================================================================
+# SHARED MCP SESSIONS
+# =============================================================================
+# A few Tavily MCP servers per process, started as concurrent searches need them and shared
+# by every Tavily tool instance (see mcp_session.py). Stop them with: await tavily_pool.aclose()
+
+tavily_pool: MCPSessionPool[TavilySearch] = MCPSessionPool(TavilySearch, name="Tavily MCP")
+
+# Repeat searches are answered from the response cache instead of the paid API (see tavily_cache.py)
+tavily_cache = TavilyResponseCache(redis_client=redis.from_url(REDIS_URL) if TAVILY_CACHE_REDIS else None)
+
+
+async def search_queries(queries: List[str], **search_kwargs) -> Dict[str, Dict[str, Any]]:
+    """Search several queries concurrently on the shared sessions, in the batch lane so tool calls are not held up"""
+    results = await asyncio.gather(*(
+        tavily_cache.get_or_search(
+            {"query": query, **search_kwargs},
+            lambda query=query: tavily_pool.run(lambda tavily: tavily.search(query, **search_kwargs), lane=BATCH),
+        )
+        for query in queries
+    ), return_exceptions=True)
+    return {
+        query: {"error": f"Search failed: {result}"} if isinstance(result, Exception) else result
+        for query, result in zip(queries, results)
+    }
+
+
+def tavily_health() -> dict[str, Any]:
+    """Report the MCP servers of the pool (whether they answer, their starts, restarts and calls in flight) and the response cache."""
+    stats = tavily_pool.stats()
+    return {
+        "healthy": all(session["consecutive_failures"] == 0 for session in stats["sessions"]),
+        "pool": stats,
+        "cache": tavily_cache.metrics(),
+    }
+
+# Health endpoint for the Tavily tool, like internal_document_index_stats for the RAG tool
+@tool
+def tavily_search_stats() -> JSONToolOutput:
+    """Reports the health of the Tavily search servers (servers running, starts, restarts, calls in flight, queue waits) and the API calls the response cache saved."""
+    return JSONToolOutput(tavily_health())
+
+
 # =============================================================================
 # FRAMEWORK INTEGRATION MODELS
 # =============================================================================
@@ -261,10 +262,11 @@ class Tavily(Tool[TavilyToolInput, ToolRunOptions, JSONToolOutput[TavilyToolOutp
         
         try:
             print("Run Tavily tool search...")
-            # Create and use TavilySearch with async context manager
-            async with TavilySearch() as tavily:
-                search_results = await tavily.search(**input.__dict__)
-            print("Run Tavily tool search...")
+            # Search on the shared MCP sessions, a server is only started by the first search.
+            # A repeat search is answered from the cache.
+            search_results = await tavily_cache.get_or_search(
+                input.model_dump(), lambda: tavily_pool.run(lambda tavily: tavily.search(**input.__dict__))
+            )
 
             # Check for errors in search results
             if "error" in search_results:
@@ -322,6 +324,10 @@ async def test_tavily_tool():
         pprint(results.to_json_safe())
     except Exception as e:
         print(f"Error running search: {e}")
+    finally:
+        print("Tavily MCP servers and response cache:")
+        pprint(tavily_health())
+        await tavily_pool.aclose()
 
 if __name__ == "__main__":
     asyncio.run(test_tavily_tool())
@@ -0,0 +1,204 @@
+"""Response cache for Tavily searches.
+
+The agent often asks Tavily the same questions (store counts, competitor news), and every
+search is a paid call to the Tavily API. Responses are cached by the normalized query and
+every search parameter of TavilyToolInput, in memory and optionally in Redis (the one in
+REDIS_URL) so several agent processes share them.
+
+How long a response stays fresh follows its time_range: news of the last day goes stale
+quickly, a search over the last year changes slowly. Failed searches are not cached, and
+identical searches running at the same time share one API call. The API calls and search
+time the cache saved are in metrics(), which the agent prints when it exits.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+import redis
+
+from caching import LRUCache, RedisCacheTier, normalize_query
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+TAVILY_CACHE = os.getenv("TAVILY_CACHE", "true").lower() in ("1", "true", "yes")
+TAVILY_CACHE_SIZE = int(os.getenv("TAVILY_CACHE_SIZE", "256"))
+TAVILY_CACHE_REDIS = os.getenv("TAVILY_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+# Seconds a response is fresh, per time_range, and without a time_range
+TAVILY_CACHE_TTLS = {
+    "day": float(os.getenv("TAVILY_CACHE_TTL_DAY", "900")),
+    "week": float(os.getenv("TAVILY_CACHE_TTL_WEEK", "3600")),
+    "month": float(os.getenv("TAVILY_CACHE_TTL_MONTH", "21600")),
+    "year": float(os.getenv("TAVILY_CACHE_TTL_YEAR", "86400")),
+}
+TAVILY_CACHE_TTL = float(os.getenv("TAVILY_CACHE_TTL", "3600"))
+
+TIME_RANGES = {"d": "day", "w": "week", "m": "month", "y": "year"}
+
+
+def normalize_time_range(time_range: str | None) -> str | None:
+    return TIME_RANGES.get(time_range, time_range) if time_range else None
+
+
+def response_ttl(time_range: str | None) -> float:
+    return TAVILY_CACHE_TTLS.get(normalize_time_range(time_range), TAVILY_CACHE_TTL)
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    """The normalized query and the search parameters, in a stable order."""
+    key = {}
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if name == "query":
+            value = normalize_query(value)
+        elif name == "time_range":
+            value = normalize_time_range(value)
+        elif isinstance(value, (list, tuple, set)):
+            value = sorted(str(v).casefold() for v in value)
+        key[name] = value
+    return json.dumps(key, sort_keys=True, default=str)
+
+
+def _redis_key(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _encode_entry(entry: tuple[Dict[str, Any], float]) -> bytes:
+    response, search_seconds = entry
+    return json.dumps({"response": response, "search_seconds": search_seconds}).encode("utf-8")
+
+
+def _decode_entry(data: bytes) -> tuple[Dict[str, Any], float]:
+    entry = json.loads(data)
+    return entry["response"], entry["search_seconds"]
+
+
+# =============================================================================
+# RESPONSE CACHE
+# =============================================================================
+
+class TavilyResponseCache:
+    """LRU cache of Tavily search responses, with an optional Redis tier, that counts the API calls it saved."""
+
+    def __init__(
+        self,
+        max_entries: int = TAVILY_CACHE_SIZE,
+        redis_client: redis.Redis | None = None,
+        enabled: bool = TAVILY_CACHE,
+    ):
+        self.enabled = enabled
+        # (response, seconds the search took) per cache key, in memory and in Redis
+        self.cache: LRUCache[tuple[Dict[str, Any], float]] = LRUCache(max_entries=max_entries)
+        self.redis_tier: RedisCacheTier[tuple[Dict[str, Any], float]] | None = None
+        if redis_client is not None:
+            self.redis_tier = RedisCacheTier(
+                redis_client, namespace="tavily_cache", encode=_encode_entry, decode=_decode_entry
+            )
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.api_calls = 0
+        self.shared_calls = 0  # searches that waited for the same search already running
+        self.saved_seconds = 0.0
+
+    async def _lookup(self, key: str, ttl: float) -> Dict[str, Any] | None:
+        entry = self.cache.get(key)
+        if entry is not None:
+            response, search_seconds = entry
+            self.saved_seconds += search_seconds
+            return response
+        if self.redis_tier is None:
+            return None
+        # The Redis client is synchronous, keep its round trip off the event loop
+        entry, expires_in = await asyncio.to_thread(self.redis_tier.get_with_ttl, _redis_key(key))
+        if entry is None:
+            return None
+        response, search_seconds = entry
+        self.cache.stats.redis_hits += 1
+        self.saved_seconds += search_seconds
+        # Fresh in memory only as long as it is in Redis, another process may have cached it long ago
+        self.cache.set(key, entry, expires_in if expires_in is not None else ttl)
+        return response
+
+    async def get_or_search(
+        self,
+        params: Dict[str, Any],
+        search: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """The cached response of the search with these parameters, or search() once and cache its response.
+
+        Responses are shared between callers, do not modify them.
+        """
+        if not self.enabled:
+            self.api_calls += 1
+            return await search()
+
+        key = cache_key(params)
+        ttl = response_ttl(params.get("time_range"))
+        while True:
+            response = await self._lookup(key, ttl)
+            if response is not None:
+                return response
+            running = self._in_flight.get(key)
+            if running is None:
+                break
+            try:
+                response = await asyncio.shield(running)
+                self.shared_calls += 1
+                return response
+            except asyncio.CancelledError:
+                if not running.cancelled():
+                    raise  # this search was cancelled, not the one it waited for
+                # The search it waited for was cancelled: look again, then search itself
+
+        running = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = running
+        try:
+            start = time.perf_counter()
+            self.api_calls += 1
+            response = await search()
+            if "error" not in response:
+                entry = (response, time.perf_counter() - start)
+                self.cache.set(key, entry, ttl)
+                if self.redis_tier is not None:
+                    await asyncio.to_thread(self.redis_tier.set, _redis_key(key), entry, ttl)
+            running.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            running.cancel()
+            raise
+        except Exception as e:
+            running.set_exception(e)
+            running.exception()  # retrieved, also when no other search waits for it
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def metrics(self) -> dict[str, Any]:
+        """Hit rates and the API calls saved. saved_seconds adds up how long the saved searches took.
+
+        A search that waited for the same search already running is a shared call, not a miss, and
+        a Redis hit is not a miss either: misses are the searches that called the API, and hit_rate
+        is the share of the other searches answered from memory or Redis.
+        """
+        stats = self.cache.stats
+        cached = stats.hits + stats.redis_hits
+        saved = cached + self.shared_calls
+        searches = saved + self.api_calls
+        return {
+            **stats.to_dict(),
+            "misses": self.api_calls,
+            "hit_rate": round(cached / (cached + self.api_calls), 4) if cached + self.api_calls else 0.0,
+            "shared_calls": self.shared_calls,
+            "enabled": self.enabled,
+            "redis_tier": self.redis_tier is not None,
+            "entries": len(self.cache),
+            "api_calls": self.api_calls,
+            "api_calls_saved": saved,
+            "saved_rate": round(saved / searches, 4) if searches else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
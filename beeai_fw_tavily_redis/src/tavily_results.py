@@ -0,0 +1,122 @@
+"""Decoding of tavily-search MCP results.
+
+The tavily-search tool of the tavily-mcp server answers with a CallToolResult whose text
+content block holds the search results as text, one block of lines per result:
+
+    Detailed Results:
+
+    Title: ...
+    URL: ...
+    Content: ...
+    Raw Content: ...    (with include_raw_content)
+
+decode_search_result() reads the content blocks of the CallToolResult directly and scans the
+text once, line by line. A "Title:" line only starts a new result when a "URL:" line follows it,
+and a field line only sets a field that comes later in a result block (Title, URL, Score,
+Content, Raw Content, Favicon) than the field being read, so a page whose content contains
+"Title:", "URL:" or "Score:" lines stays one result with its content intact.
+
+Scores: when the server sends Tavily's API response as JSON (structuredContent or a JSON text
+block) or a "Score:" line per result, the real relevance score is kept. Otherwise the result
+gets the rank based score 1.0 - 0.1 * rank the tool has always reported.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from mcp.types import CallToolResult
+
+FIELD_LINE = re.compile(r"(Title|URL|Content|Raw Content|Score|Favicon|Answer):[ \t]?(.*)")
+FIELDS = {"Title": "title", "URL": "url", "Content": "content", "Raw Content": "raw_content", "Score": "score", "Favicon": "favicon"}
+SECTION_HEADERS = ("Detailed Results:", "Images:")
+# The order of the fields in a result block
+FIELD_ORDER = {field: i for i, field in enumerate(("title", "url", "score", "content", "raw_content", "favicon"))}
+
+
+def rank_score(rank: int) -> float:
+    return 1.0 - (rank * 0.1)
+
+
+def to_result(record: Dict[str, Any], rank: int) -> Dict[str, Any]:
+    """A result of the tool from a record of the server, with its score or the rank based one."""
+    try:
+        score = float(record["score"])
+    except (KeyError, TypeError, ValueError):
+        score = rank_score(rank)
+    return {
+        "title": str(record["title"]).strip(),
+        "url": str(record["url"]).strip(),
+        "content": str(record.get("content") or "").strip(),
+        "score": score,
+    }
+
+
+def parse_text(text: str) -> tuple[Optional[str], List[Dict[str, str]]]:
+    """The answer (or None) and the result records of the text of a tavily-search result."""
+    lines = text.splitlines()
+    answer = None
+    records: List[Dict[str, str]] = []
+    record: Optional[Dict[str, str]] = None
+    field: Optional[str] = None
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        match = FIELD_LINE.match(stripped)
+        name = match.group(1) if match else None
+
+        if name == "Title" and i + 1 < len(lines) and lines[i + 1].lstrip().startswith("URL:"):
+            record = {"title": match.group(2)}
+            records.append(record)
+            field = "title"
+        elif name == "Answer" and record is None:
+            answer = match.group(2)
+            field = None
+        elif name and name != "Answer" and record is not None and FIELD_ORDER[FIELDS[name]] > FIELD_ORDER[field]:
+            field = FIELDS[name]
+            record[field] = match.group(2)
+        elif stripped in SECTION_HEADERS:
+            record = field = None
+        elif stripped and record is not None and field is not None:
+            record[field] += " " + stripped
+    return answer, records
+
+
+def _api_response(text: str) -> Optional[Dict[str, Any]]:
+    """The Tavily search API response a text block holds as JSON, or None."""
+    if not text.lstrip().startswith("{"):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) and isinstance(data.get("results"), list) else None
+
+
+def decode_search_result(result: CallToolResult, query: str) -> Dict[str, Any]:
+    """The query, results and total_results of a tavily-search CallToolResult, or an error."""
+    texts = [block.text for block in result.content if block.type == "text"]
+    if result.isError:
+        return {"error": " ".join(texts) or "The Tavily MCP server returned an error"}
+
+    answer = None
+    records: List[Dict[str, Any]] = []
+    responses = [result.structuredContent] if isinstance((result.structuredContent or {}).get("results"), list) else []
+    if not responses:
+        for text in texts:
+            data = _api_response(text)
+            if data is not None:
+                responses.append(data)
+            else:
+                text_answer, text_records = parse_text(text)
+                answer = answer or text_answer
+                records += text_records
+    for data in responses:
+        answer = answer or data.get("answer")
+        records += [r for r in data["results"] if isinstance(r, dict)]
+
+    results = [to_result(r, rank) for rank, r in enumerate(r for r in records if r.get("title") and r.get("url"))]
+    decoded = {"query": query, "results": results, "total_results": len(results)}
+    if answer:
+        decoded["answer"] = answer
+    return decoded
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# How the Tavily MCP server is launched, and a startup probe
+#
+# By default the server is started with `npx -y tavily-mcp@latest`, which asks the npm registry
+# for the latest version on every start: that takes seconds, fails offline and can switch server
+# versions in the middle of a deployment. Pin it in .env instead, either
+#
+# * to a version that npx runs from its cache when it can (npm view tavily-mcp version):
+#     TAVILY_MCP_VERSION=<version>
+# * or to a pre-installed server, which needs neither npx nor the registry:
+#     npm install --prefix mcp_servers tavily-mcp@<version>
+#     TAVILY_MCP_COMMAND=mcp_servers/node_modules/.bin/tavily-mcp
+#     TAVILY_MCP_VERSION=<version>
+#
+# TAVILY_MCP_COMMAND is a command line: an executable, or a .js entry point that is run with node.
+# A relative path is relative to the beeai_fw_tavily_redis directory. With TAVILY_MCP_VERSION set,
+# a server that reports another version is flagged when it starts.
+#
+# The probe starts the configured server once and reports its version, its tools and how long
+# the launch, the MCP handshake and (with --search) a first search take:
+#
+#   uv run src/tavily_server.py
+#   uv run src/tavily_server.py --search "Python async programming"
+#   uv run src/tavily_server.py --command "npx -y tavily-mcp@latest"
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+PACKAGE = "tavily-mcp"
+SEARCH_TOOL = "tavily-search"
+LATEST = "latest"
+
+
+def launch_command(command: str = "", version: str = "") -> list[str]:
+    """The argv that starts the server: the configured command, or npx with the (pinned) version."""
+    if command:
+        argv = shlex.split(command)
+        if os.sep in argv[0] or "/" in argv[0]:
+            path = Path(argv[0]).expanduser()
+            argv[0] = str(path if path.is_absolute() else PROJECT_DIR / path)
+        if argv[0].endswith((".js", ".mjs", ".cjs")):
+            argv.insert(0, "node")
+        return argv
+    version = version or LATEST
+    if version == LATEST:
+        return ["npx", "-y", f"{PACKAGE}@{LATEST}"]
+    # A pinned version does not change, so npx can run it from its cache without asking the registry
+    return ["npx", "-y", "--prefer-offline", f"{PACKAGE}@{version}"]
+
+
+def server_params(api_key: str, command: str = "", version: str = "") -> StdioServerParameters:
+    argv = launch_command(command, version)
+    return StdioServerParameters(command=argv[0], args=argv[1:], env={"TAVILY_API_KEY": api_key})
+
+
+def version_mismatch(expected: str, server_version: str | None) -> str | None:
+    """Why the server that answered is not the pinned version, or None."""
+    if not expected or expected == LATEST or server_version is None or server_version == expected:
+        return None
+    return f"the Tavily MCP server reports version {server_version}, TAVILY_MCP_VERSION pins {expected}"
+
+
+# =============================================================================
+# STARTUP PROBE
+# =============================================================================
+
+@dataclass
+class ProbeResult:
+    command: list[str]
+    ok: bool = False
+    server_name: str | None = None
+    server_version: str | None = None
+    tools: list[str] = field(default_factory=list)
+    initialize_seconds: float | None = None  # launch and MCP handshake
+    list_tools_seconds: float | None = None
+    first_search_seconds: float | None = None
+    ready_seconds: float | None = None  # launch until the first search returned (or the tools were listed)
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+async def probe(params: StdioServerParameters, search_query: str | None = None, timeout: float = 120) -> ProbeResult:
+    """Start the server once, do the handshake, list the tools and optionally run one search, timing each step."""
+    result = ProbeResult(command=[params.command, *params.args])
+    start = time.perf_counter()
+    try:
+        async with stdio_client(params) as (read, write), ClientSession(
+            read, write, read_timeout_seconds=timedelta(seconds=timeout)
+        ) as session:
+            initialized = await asyncio.wait_for(session.initialize(), timeout)
+            result.initialize_seconds = time.perf_counter() - start
+            result.server_name = initialized.serverInfo.name
+            result.server_version = initialized.serverInfo.version
+
+            step = time.perf_counter()
+            tools = await session.list_tools()
+            result.list_tools_seconds = time.perf_counter() - step
+            result.tools = [tool.name for tool in tools.tools]
+            if SEARCH_TOOL not in result.tools:
+                raise RuntimeError(f"the server has no {SEARCH_TOOL} tool")
+
+            if search_query:
+                step = time.perf_counter()
+                response = await session.call_tool(SEARCH_TOOL, {"query": search_query, "max_results": 1})
+                result.first_search_seconds = time.perf_counter() - step
+                if response.isError:
+                    raise RuntimeError(f"the search failed: {response.content}")
+            result.ready_seconds = time.perf_counter() - start
+            result.ok = True
+    except Exception as e:
+        # anyio task groups wrap the error of the server connection
+        while isinstance(e, ExceptionGroup) and e.exceptions:
+            e = e.exceptions[0]
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def main():
+    from tavily_mcp_tool import Settings
+
+    settings = Settings()
+    parser = argparse.ArgumentParser(description="Start the configured Tavily MCP server once and report how it starts.")
+    parser.add_argument("--command", default=settings.TAVILY_MCP_COMMAND,
+                        help="server command line (default: TAVILY_MCP_COMMAND, or npx)")
+    parser.add_argument("--version", default=settings.TAVILY_MCP_VERSION,
+                        help="expected server version, and the npx version without --command (default: TAVILY_MCP_VERSION)")
+    parser.add_argument("--search", metavar="QUERY", help="also time one search (uses one Tavily API credit)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for each step")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    params = server_params(settings.TAVILY_API_KEY, args.command, args.version)
+    result = asyncio.run(probe(params, args.search, args.timeout))
+    mismatch = version_mismatch(args.version, result.server_version)
+
+    if args.json:
+        print(json.dumps({**result.to_dict(), "version_mismatch": mismatch}, indent=2))
+    else:
+        print(f"Command: {shlex.join(result.command)}")
+        if result.ok:
+            print(f"Server: {result.server_name} {result.server_version}")
+            print(f"Tools: {', '.join(result.tools)}")
+            print(f"Started and initialized in {result.initialize_seconds:.2f}s, tools listed in {result.list_tools_seconds:.3f}s")
+            if result.first_search_seconds is not None:
+                print(f"First search in {result.first_search_seconds:.2f}s")
+            print(f"Ready after {result.ready_seconds:.2f}s")
+        else:
+            print(f"Probe failed: {result.error}")
+        if mismatch:
+            print(f"WARNING: {mismatch}")
+    raise SystemExit(0 if result.ok and not mismatch else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from langchain_core.documents import Document
+
+from adaptive_k import gap_cutoff
+from hybrid_search import reciprocal_rank_fusion
+
+
+def scored(scores: list[float]) -> list[tuple[Document, float]]:
+    return [(Document(page_content=f"chunk {i}"), score) for i, score in enumerate(scores)]
+
+
+def test_vector_results_end_at_the_first_large_similarity_drop():
+    results = scored([0.20, 0.22, 0.25, 0.60, 0.62])
+
+    assert len(gap_cutoff(results, "vector", min_k=2, gap=0.15)) == 3
+
+
+def test_vector_results_keep_min_k():
+    results = scored([0.20, 0.70, 0.72])
+
+    assert len(gap_cutoff(results, "vector", min_k=2, gap=0.15)) == 2
+
+
+def test_hybrid_results_are_not_cut_at_rank_gaps():
+    # The top chunk is in both rankings, so its RRF score is about twice the next one
+    scores = reciprocal_rank_fusion([["a", "b", "c", "d", "e", "f"], ["a", "x", "y", "z"]])
+    ranking = sorted(scores, key=scores.get, reverse=True)
+    results = scored([scores[key] for key in ranking])
+
+    assert gap_cutoff(results, "hybrid", min_k=2, gap=0.15) == results
@@ -0,0 +1,43 @@
+from doc_ingest import discover_files
+from local_vector_index import LocalVectorIndex, ingest_local
+
+
+def embed(texts: list[str]) -> list[list[float]]:
+    return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+def ingest(root: str, index_path: str):
+    index = LocalVectorIndex.open(index_path)
+    return ingest_local(index, discover_files(root), embed, root=root)
+
+
+def test_ingesting_the_current_directory_removes_deleted_files(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    (docs / "guides").mkdir(parents=True)
+    (docs / "intro.md").write_text("# Intro\n\nWhat the pilot is about.\n")
+    (docs / "guides" / "setup.md").write_text("# Setup\n\nHow to install it.\n")
+    monkeypatch.chdir(docs)
+    index_path = str(tmp_path / "index")
+
+    assert sorted(ingest(".", index_path).files_added) == ["guides/setup.md", "intro.md"]
+
+    (docs / "guides" / "setup.md").unlink()
+    report = ingest(".", index_path)
+
+    assert report.files_removed == ["guides/setup.md"]
+    assert list(LocalVectorIndex.open(index_path).file_hashes()) == ["intro.md"]
+
+
+def test_ingesting_a_directory_leaves_the_other_files(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    (docs / "guides").mkdir(parents=True)
+    (docs / "intro.md").write_text("# Intro\n\nWhat the pilot is about.\n")
+    (docs / "guides" / "setup.md").write_text("# Setup\n\nHow to install it.\n")
+    monkeypatch.chdir(docs)
+    index_path = str(tmp_path / "index")
+    ingest(".", index_path)
+
+    report = ingest("./guides", index_path)
+
+    assert report.files_removed == []
+    assert sorted(LocalVectorIndex.open(index_path).file_hashes()) == ["guides/setup.md", "intro.md"]
@@ -0,0 +1,63 @@
+import asyncio
+
+from mcp_session import MCPSessionPool
+
+
+class FakeServer:
+    """A client whose start takes a while, like launching an MCP server over stdio."""
+
+    starts = 0
+
+    async def __aenter__(self):
+        FakeServer.starts += 1
+        await asyncio.sleep(0.05)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+async def call(server: FakeServer) -> bool:
+    await asyncio.sleep(0.05)
+    return True
+
+
+def test_concurrent_calls_share_the_warm_server():
+    async def main():
+        FakeServer.starts = 0
+        pool = MCPSessionPool(FakeServer, name="fake", size=2, max_inflight=4)
+        try:
+            await pool.run(call)  # warm server #1
+            assert await asyncio.gather(pool.run(call), pool.run(call)) == [True, True]
+            return FakeServer.starts, [session.starts for session in pool.sessions]
+        finally:
+            await pool.aclose()
+
+    assert asyncio.run(main()) == (1, [1, 0])
+
+
+def test_cold_calls_share_the_server_being_started():
+    async def main():
+        FakeServer.starts = 0
+        pool = MCPSessionPool(FakeServer, name="fake", size=2, max_inflight=4)
+        try:
+            await asyncio.gather(*(pool.run(call) for _ in range(4)))
+            return FakeServer.starts
+        finally:
+            await pool.aclose()
+
+    assert asyncio.run(main()) == 1
+
+
+def test_a_server_is_started_when_the_running_ones_are_full():
+    async def main():
+        FakeServer.starts = 0
+        pool = MCPSessionPool(FakeServer, name="fake", size=2, max_inflight=2)
+        try:
+            await pool.run(call)
+            await asyncio.gather(*(pool.run(call) for _ in range(3)))
+            return FakeServer.starts
+        finally:
+            await pool.aclose()
+
+    assert asyncio.run(main()) == 2
@@ -0,0 +1,28 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from redis_retriever import DocSearchInput
+from search_filter import SearchFilter
+
+
+def test_dates_filter_from_midnight_utc():
+    search_filter = SearchFilter.create(ingested_after=date(2025, 7, 1), ingested_before="2025-08-01")
+
+    assert search_filter.ingested_after == datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp()
+    assert search_filter.ingested_before == datetime(2025, 8, 1, tzinfo=timezone.utc).timestamp()
+
+
+def test_tool_input_accepts_iso_dates():
+    tool_input = DocSearchInput(query="pilot", ingested_after="2025-07-01", ingested_before="2025-08-01T12:00+02:00")
+    search_filter = SearchFilter.create(ingested_after=tool_input.ingested_after, ingested_before=tool_input.ingested_before)
+
+    assert search_filter.ingested_after == datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp()
+    assert search_filter.ingested_before == datetime(2025, 8, 1, 10, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("value", ["last week", "July 2025"])
+def test_tool_input_rejects_other_dates(value):
+    with pytest.raises(ValidationError):
+        DocSearchInput(query="pilot", ingested_after=value)
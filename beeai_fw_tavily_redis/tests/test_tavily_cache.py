@@ -0,0 +1,24 @@
+import asyncio
+
+from tavily_cache import TavilyResponseCache
+
+
+def test_searches_waiting_for_the_same_search_are_not_misses():
+    async def main():
+        cache = TavilyResponseCache(max_entries=8, enabled=True)
+
+        async def search():
+            await asyncio.sleep(0.05)
+            return {"results": [{"url": "https://example.com"}]}
+
+        params = {"query": "store count", "max_results": 5}
+        await asyncio.gather(*(cache.get_or_search(params, search) for _ in range(5)))
+        await cache.get_or_search(params, search)
+        return cache.metrics()
+
+    metrics = asyncio.run(main())
+
+    assert (metrics["api_calls"], metrics["shared_calls"], metrics["hits"]) == (1, 4, 1)
+    assert metrics["misses"] == 1
+    assert metrics["hit_rate"] == 0.5
+    assert metrics["saved_rate"] == 0.8333
@@ -0,0 +1,60 @@
+from mcp.types import CallToolResult, TextContent
+
+from tavily_results import decode_search_result, parse_text
+
+
+def text_result(text: str) -> CallToolResult:
+    return CallToolResult(content=[TextContent(type="text", text=text)])
+
+
+def test_field_lines_in_the_content_are_content():
+    text = (
+        "Detailed Results:\n\n"
+        "Title: Review\n"
+        "URL: https://example.com/review\n"
+        "Content: Tested over two weeks.\n"
+        "Score: 4.5\n"
+        "URL: https://example.com/shop\n"
+        "Raw Content: the full page\n"
+    )
+    decoded = decode_search_result(text_result(text), "review")
+
+    assert decoded["total_results"] == 1
+    result = decoded["results"][0]
+    assert result["url"] == "https://example.com/review"
+    assert result["content"] == "Tested over two weeks. Score: 4.5 URL: https://example.com/shop"
+    assert result["score"] == 1.0
+
+
+def test_score_line_before_the_content_is_the_score():
+    text = (
+        "Title: Review\n"
+        "URL: https://example.com/review\n"
+        "Score: 0.87\n"
+        "Content: Tested over two weeks.\n"
+    )
+    decoded = decode_search_result(text_result(text), "review")
+
+    assert decoded["results"] == [
+        {"title": "Review", "url": "https://example.com/review", "content": "Tested over two weeks.", "score": 0.87}
+    ]
+
+
+def test_raw_content_and_favicon_after_multiline_content():
+    text = (
+        "Title: Earnings\n"
+        "URL: https://example.com/earnings\n"
+        "Content: Revenue grew.\n"
+        "Margins held.\n"
+        "Raw Content: Revenue grew by 4%.\n"
+        "Favicon: https://example.com/favicon.ico\n"
+    )
+    _, records = parse_text(text)
+
+    assert records == [{
+        "title": "Earnings",
+        "url": "https://example.com/earnings",
+        "content": "Revenue grew. Margins held.",
+        "raw_content": "Revenue grew by 4%.",
+        "favicon": "https://example.com/favicon.ico",
+    }]